@@ -0,0 +1,31 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+logger = logging.getLogger("cve_advisory")
+_listener = None
+
+
+def setup_logging() -> logging.Logger:
+    """
+    Journalisation par niveaux et non bloquante : les requêtes déposent les messages dans une file,
+    un thread dédié les écrit sur la sortie standard. Niveau réglable par LOG_LEVEL.
+    """
+    global _listener
+    if _listener is not None:
+        return logger
+
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    return logger
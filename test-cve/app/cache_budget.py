@@ -0,0 +1,235 @@
+"""
+Admission dans le cache selon la taille et budgets mémoire par famille de clés.
+
+Chaque écriture de CacheManager passe par l'admission : la taille du JSON sérialisé est relevée
+par famille, les valeurs de plus de CACHE_COMPRESS_MIN_BYTES sont stockées compressées (zlib), et
+une valeur qui dépasse encore la taille admise (CACHE_MAX_ENTRY_BYTES, ou CACHE_MAX_BUDGET_SHARE du
+budget de sa famille) n'est stockée que si sa clé a déjà été demandée : un résultat ponctuel géant
+n'évince plus les petites entrées très consultées.
+
+Budgets par famille (celles de default_ttls) : CACHE_BUDGETS="cve_list=128mb,epss_data=64mb".
+Les entrées des familles budgétées sont suivies dans Redis (échéance et taille) ; le leader relève
+périodiquement l'occupation par lots (HSCAN) et, dans la famille qui dépasse son budget, vérifie
+que les entrées existent encore puis évince celles qui expirent le plus tôt. allkeys-lru
+(redis.conf) reste le dernier recours.
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Callable
+
+from app_logging import logger
+from leader import leader
+from metrics import cache_prefix
+from redis_client import compress_payload, redis_client
+
+# Préfixe de clé -> famille
+KEY_FAMILIES = {
+    "get_cves": "cve_list",
+    "get_recent_cves": "cve_list",
+    "search_cves": "cve_list",
+    "search_cursor": "cve_list",
+    "recent_day": "cve_list",
+    "cve_detail": "cve_detail",
+    "get_cve_by_id": "cve_detail",
+    "nvd_raw": "nvd_raw",
+    "kev_catalog": "kev_data",
+    "get_all_kev": "kev_data",
+    "get_recent_kevs": "kev_data",
+    "get_kevs_in_range": "kev_data",
+    "search_kev": "kev_data",
+    "get_kev_by_cve": "kev_data",
+    "get_epss_data_safe": "epss_data",
+    "evidence_github": "github_pocs",
+    "evidence_reddit": "reddit_posts",
+    "evidence_exploit_db": "exploit_db",
+    "fetch_cve_description": "description",
+    "get_cve_description": "description",
+    "get_global_stats": "stats",
+    "stats_week": "stats",
+}
+
+# Total sous maxmemory (1gb) ; nvd_raw (ingestion hors ligne) n'est pas budgété par défaut
+DEFAULT_BUDGETS = (
+    "cve_list=64mb,cve_detail=384mb,kev_data=64mb,epss_data=64mb,github_pocs=32mb,"
+    "reddit_posts=32mb,exploit_db=32mb,description=64mb,stats=16mb"
+)
+USAGE_KEY = "cve_advisory:budget:usage"
+# Entrées suivies lues par commande Redis lors d'un relevé (HSCAN, EXISTS, ZRANGEBYSCORE)
+SWEEP_BATCH = int(os.getenv("CACHE_BUDGET_SWEEP_BATCH", 1000))
+SIZE_UNITS = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    """"64mb" -> octets"""
+    match = re.fullmatch(r"\s*(\d+)\s*([kmg]?b?)\s*", str(value).lower())
+    if not match:
+        raise ValueError(f"Taille invalide : {value}")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2)]
+
+
+def parse_budgets(spec: str) -> dict:
+    budgets = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        family, _, size = part.partition("=")
+        budgets[family.strip()] = parse_size(size)
+    return budgets
+
+
+class CacheBudgets:
+    def __init__(self):
+        self.budgets = parse_budgets(os.getenv("CACHE_BUDGETS", DEFAULT_BUDGETS))
+        self.compress_min = parse_size(os.getenv("CACHE_COMPRESS_MIN_BYTES", "256kb"))
+        self.max_entry = parse_size(os.getenv("CACHE_MAX_ENTRY_BYTES", "1mb"))  # mesurée après compression
+        self.max_share = float(os.getenv("CACHE_MAX_BUDGET_SHARE", 0.05))  # part du budget pour une entrée
+        self.low_watermark = float(os.getenv("CACHE_BUDGET_LOW_WATERMARK", 0.9))  # cible après éviction
+        self.interval = int(os.getenv("CACHE_BUDGET_INTERVAL", 60))
+        # clé -> déjà demandée ; fourni par cache_utils (suivi des accès)
+        self.is_repeated: Callable[[str], bool] = lambda key: False
+        self.counters: dict = {}
+        self.task: asyncio.Task | None = None
+
+    def family(self, key: str) -> str:
+        return KEY_FAMILIES.get(cache_prefix(key), "other")
+
+    def zset_key(self, family: str) -> str:
+        return f"cve_advisory:budget:{family}:expiry"
+
+    def sizes_key(self, family: str) -> str:
+        return f"cve_advisory:budget:{family}:sizes"
+
+    def limit(self, family: str) -> int:
+        budget = self.budgets.get(family)
+        return min(self.max_entry, int(budget * self.max_share)) if budget else self.max_entry
+
+    def _count(self, family: str) -> dict:
+        counters = self.counters.get(family)
+        if counters is None:
+            counters = self.counters[family] = {
+                "writes": 0, "writtenBytes": 0, "compressed": 0, "savedBytes": 0, "refused": 0, "refusedBytes": 0,
+            }
+        return counters
+
+    def prepare(self, key: str, serialized: str) -> str | None:
+        """Valeur à stocker (compressée au-delà du seuil), ou None si elle est refusée"""
+        family = self.family(key)
+        counters = self._count(family)
+        payload = serialized
+        if len(serialized) >= self.compress_min:
+            payload = compress_payload(serialized)
+            counters["compressed"] += 1
+            counters["savedBytes"] += len(serialized) - len(payload)
+        if len(payload) > self.limit(family) and not self.is_repeated(key):
+            counters["refused"] += 1
+            counters["refusedBytes"] += len(payload)
+            return None
+        counters["writes"] += 1
+        counters["writtenBytes"] += len(payload)
+        return payload
+
+    def track(self, pipe, key: str, size: int, ttl: int = None) -> None:
+        """Ajouter au pipeline d'écriture le suivi (échéance, taille) d'une entrée budgétée"""
+        family = self.family(key)
+        if family in self.budgets:
+            pipe.zadd(self.zset_key(family), {key: time.time() + (ttl or 10 * 365 * 86400)})
+            pipe.hset(self.sizes_key(family), key, size)
+
+    async def sweep(self, family: str) -> dict:
+        """Relever l'occupation d'une famille et évincer au-delà de son budget"""
+        # Import tardif : cache_utils importe ce module
+        from cache_utils import ERROR_SUFFIX, META_SUFFIX
+
+        zset_key, sizes_key = self.zset_key(family), self.sizes_key(family)
+        now = time.time()
+        await redis_client.forget_members(zset_key, sizes_key, await redis_client.zrange_by_score(zset_key, "-inf", now))
+
+        budget = self.budgets[family]
+        usage, count = await self._scan_sizes(zset_key, sizes_key)
+        if usage > budget:
+            # Dépassement apparent : écarter d'abord les entrées supprimées ou évincées par Redis
+            # (allkeys-lru) avant leur échéance, pour ne pas évincer sur une occupation périmée
+            usage, count = await self._scan_sizes(zset_key, sizes_key, verify=True)
+
+        victims = []
+        if usage > budget:
+            target = budget * self.low_watermark
+            while usage > target:
+                batch = await redis_client.zrange_by_score(zset_key, count=SWEEP_BATCH)
+                if not batch:
+                    break
+                evicted = []
+                for key, size in zip(batch, await redis_client.hmget_json(sizes_key, batch)):
+                    if usage <= target:
+                        break
+                    usage -= size or 0
+                    evicted.append(key)
+                await redis_client.delete_many([k + suffix for k in evicted for suffix in ("", META_SUFFIX, ERROR_SUFFIX)])
+                await redis_client.forget_members(zset_key, sizes_key, evicted)
+                victims.extend(evicted)
+            count -= len(victims)
+            logger.info("Budget %s dépassé : %s entrées évincées", family, len(victims))
+        return {"budgetBytes": budget, "usedBytes": usage, "keys": count, "evicted": len(victims), "checkedAt": now}
+
+    async def _scan_sizes(self, zset_key: str, sizes_key: str, verify: bool = False) -> tuple:
+        """
+        (octets, entrées) suivis d'une famille, lus par lots de SWEEP_BATCH.
+        verify : oublier au passage les entrées dont la clé n'existe plus (EXISTS par lot)
+        """
+        usage = count = 0
+        async for sizes in redis_client.hscan_json(sizes_key, SWEEP_BATCH):
+            if verify:
+                keys = list(sizes)
+                gone = [k for k, alive in zip(keys, await redis_client.exists_many(keys)) if not alive]
+                await redis_client.forget_members(zset_key, sizes_key, gone)
+                for key in gone:
+                    del sizes[key]
+            usage += sum(sizes.values())
+            count += len(sizes)
+        return usage, count
+
+    async def run_cycle(self) -> dict:
+        usage = {family: await self.sweep(family) for family in self.budgets}
+        await redis_client.hset_json(USAGE_KEY, usage)
+        return usage
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if leader.is_leader:  # un seul worker relève et évince
+                    await self.run_cycle()
+            except Exception as e:
+                logger.warning("Erreur contrôle des budgets du cache: %s", e)
+
+    def start(self):
+        if self.budgets and self.task is None:
+            self.task = asyncio.create_task(self._loop())
+            logger.info("Budgets du cache actifs (%s)", ', '.join(self.budgets))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def stats(self) -> dict:
+        """Occupation par famille (dernier relevé du leader) et admission de ce worker"""
+        usage = await redis_client.hgetall_json(USAGE_KEY)
+        families = sorted(set(self.budgets) | set(self.counters))
+        return {
+            family: {
+                "budgetBytes": self.budgets.get(family),
+                "maxEntryBytes": self.limit(family),
+                **{k: v for k, v in usage.get(family, {}).items() if k != "budgetBytes"},
+                **self.counters.get(family, {}),
+            }
+            for family in families
+        }
+
+
+# Instance globale
+cache_budgets = CacheBudgets()
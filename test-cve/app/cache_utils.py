@@ -1,8 +1,61 @@
 import hashlib
-from typing import Any, Optional, Callable
+from contextvars import ContextVar
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Optional, Callable, Awaitable
+from fastapi import Response
 from redis_client import redis_client
+from cache_budget import cache_budgets
+from app_logging import logger
+from metrics import cache_prefix, record_cache_read
+from timing import stage
 import inspect
 import functools
+import time
+import os
+
+META_SUFFIX = ":meta"  # validateurs HTTP (ETag, date de stockage) de chaque entrée
+ERROR_SUFFIX = ":error"  # dernier échec de la source : repli servi jusqu'à la prochaine tentative
+
+# Résultat négatif confirmé (CVE inconnu de la source) : conservé plus longtemps qu'une valeur
+NEGATIVE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", 6 * 3600))
+# Échec d'une source : nouvelle tentative après ERROR_TTL, doublé à chaque échec consécutif
+ERROR_TTL = int(os.getenv("CACHE_ERROR_TTL", 30))
+ERROR_TTL_MAX = int(os.getenv("CACHE_ERROR_TTL_MAX", 900))
+
+# Requête HTTP en cours : en-têtes conditionnels reçus et validateurs de la réponse
+http_validators: ContextVar[Optional[dict]] = ContextVar("http_validators", default=None)
+# Sources en erreur dont un repli a servi au calcul en cours (un ensemble par appel mis en cache)
+degraded_sources: ContextVar[Optional[set]] = ContextVar("degraded_sources", default=None)
+
+
+class UpstreamError(Exception):
+    """Échec d'une source externe : fallback est servi à la place du résultat, sans être mis en cache comme valeur"""
+
+    def __init__(self, source: str, message: str, fallback: Any = None):
+        super().__init__(f"{source}: {message}")
+        self.source = source
+        self.fallback = fallback
+
+
+def error_backoff(attempts: int) -> int:
+    return min(ERROR_TTL * 2 ** max(attempts - 1, 0), ERROR_TTL_MAX)
+
+
+async def run_tracked(call: Callable[[], Awaitable[Any]]) -> tuple:
+    """Exécuter call() en relevant les sources dont un repli a servi : (résultat, sources dégradées)"""
+    degraded = set()
+    token = degraded_sources.set(degraded)
+    try:
+        return await call(), degraded
+    finally:
+        degraded_sources.reset(token)
+
+
+def mark_degraded(source: str) -> None:
+    """Signaler l'usage d'un repli : les résultats englobants ne sont conservés que brièvement"""
+    current = degraded_sources.get()
+    if current is not None:
+        current.add(source)
 
 class CacheManager:
     def __init__(self):
@@ -13,6 +66,7 @@ class CacheManager:
             "epss_data": 3600,  # 1 heure
             "github_pocs": 1800,  # 30 minutes
             "reddit_posts": 1800,  # 30 minutes
+            "exploit_db": 3600,  # 1 heure
             "description": 3600,  # 1 heure
             "stats": 3600,  # 1 heure
         }
@@ -39,12 +93,64 @@ class CacheManager:
 
     async def get_cached_data(self, key: str) -> Optional[Any]:
         """Récupérer des données du cache"""
-        return await redis_client.get_json(key)
+        with stage(f"cache.{cache_prefix(key)}"):
+            data = await redis_client.get_json(key)
+        record_cache_read(key, data is not None)
+        return data
+
+    async def get_cached_many(self, keys: list) -> list:
+        """Récupérer plusieurs entrées du cache en une seule requête"""
+        with stage(f"cache.{cache_prefix(keys[0])}" if keys else "cache"):
+            values = await redis_client.get_json_many(keys)
+        for key, value in zip(keys, values):
+            record_cache_read(key, value is not None)
+        return values
+
+    async def get_cached_entry(self, key: str, with_validators: bool = False) -> tuple:
+        """(valeur, validateurs HTTP, dernier échec) en un seul aller-retour"""
+        keys = [key, key + META_SUFFIX, key + ERROR_SUFFIX] if with_validators else [key, key + ERROR_SUFFIX]
+        with stage(f"cache.{cache_prefix(key)}"):
+            values = await redis_client.get_json_many(keys)
+        record_cache_read(key, values[0] is not None)
+        if with_validators:
+            return tuple(values)
+        return values[0], None, values[1]
+
+    async def record_error(self, key: str, previous: Optional[dict], error: UpstreamError) -> dict:
+        """Mémoriser un échec ; la prochaine tentative est repoussée (backoff exponentiel)"""
+        attempts = (previous or {}).get("attempts", 0) + 1
+        entry = {
+            "source": error.source,
+            "message": str(error),
+            "attempts": attempts,
+            "retryAt": time.time() + error_backoff(attempts),
+            "fallback": error.fallback,
+        }
+        # Conservé au-delà de retryAt : un nouvel échec prolonge le backoff au lieu de repartir de zéro
+        await redis_client.set_json(key + ERROR_SUFFIX, entry, 2 * ERROR_TTL_MAX)
+        return entry
+
+    async def clear_error(self, key: str) -> None:
+        await redis_client.delete(key + ERROR_SUFFIX)
+
+    async def get_validators(self, key: str) -> Optional[dict]:
+        """Validateurs HTTP d'une entrée encore présente, sans lire ni décoder son contenu"""
+        with stage(f"cache.{cache_prefix(key)}"):
+            return await redis_client.get_json_if_exists(key + META_SUFFIX, key)
 
     async def set_cached_data(self, key: str, data: Any, ttl: int = None) -> bool:
-        """Stocker des données dans le cache"""
+        """
+        Stocker des données dans le cache (les validateurs HTTP sont réécrits avec elles).
+        False si la valeur est refusée par l'admission (trop volumineuse pour une clé demandée une fois)
+        """
         cache_ttl = ttl or self.default_ttls.get(key.split(":")[1], 3600)
-        return await redis_client.set_json(key, data, cache_ttl)
+        with stage(f"cache.{cache_prefix(key)}.set"):
+            return await redis_client.set_json(key, data, cache_ttl, meta_key=key + META_SUFFIX,
+                                               admission=cache_budgets)
+
+    async def set_cached_many(self, mapping: dict, ttl: int) -> bool:
+        """Stocker plusieurs entrées du cache en une seule requête"""
+        return await redis_client.set_json_many(mapping, ttl, meta_suffix=META_SUFFIX, admission=cache_budgets)
 
     async def invalidate_pattern(self, pattern: str) -> None:
         """Invalider les clés selon un pattern"""
@@ -55,6 +161,92 @@ class CacheManager:
 # Instance globale
 cache_manager = CacheManager()
 
+
+class AccessTracker:
+    """Suivi de la fréquence d'accès aux clés de cache, utilisé par le pré-chauffage"""
+
+    def __init__(self):
+        # Demi-vie du score d'accès : une clé non consultée perd la moitié de son score
+        self.half_life = int(os.getenv("PREWARM_HALF_LIFE", 3600))
+        self.max_keys = int(os.getenv("PREWARM_MAX_TRACKED_KEYS", 5000))
+        self.entries: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _decayed_score(self, entry: dict, now: float) -> float:
+        elapsed = now - entry["last_access"]
+        return entry["score"] * 0.5 ** (elapsed / self.half_life)
+
+    def record(self, key: str, refresher: Callable[[], Awaitable[Any]], ttl=None, hit: bool = True,
+               writes_cache: bool = False) -> None:
+        """
+        Enregistrer un accès à une clé ainsi que la façon de la recalculer.
+        ttl : durée fixe, ou fonction valeur -> durée (négatifs confirmés conservés plus longtemps)
+        writes_cache : le recalcul écrit lui-même la clé, le pré-chauffage ne la réécrit pas
+        """
+        now = time.time()
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_keys:
+                self.evict_cold(keep=self.max_keys - 1)
+            entry = {"score": 0.0, "last_access": now, "hits": 0}
+            self.entries[key] = entry
+
+        entry["score"] = self._decayed_score(entry, now) + 1
+        entry["last_access"] = now
+        entry["hits"] += 1
+        entry["refresher"] = refresher
+        entry["ttl"] = ttl
+        entry["writes_cache"] = writes_cache
+
+    def requested(self, key: str) -> int:
+        """Nombre de demandes enregistrées pour une clé"""
+        entry = self.entries.get(key)
+        return entry["hits"] if entry else 0
+
+    def hot_keys(self, n: int, min_score: float = 0.0) -> list:
+        """Retourner les n clés les plus consultées (score décroissant) encore chaudes"""
+        now = time.time()
+        scored = []
+        for key, entry in self.entries.items():
+            score = self._decayed_score(entry, now)
+            if score >= min_score:
+                scored.append((score, key, entry))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [(key, entry) for _, key, entry in scored[:n]]
+
+    def evict_cold(self, min_score: float = None, keep: int = None) -> int:
+        """Oublier les clés froides (score sous le seuil ou au-delà des `keep` plus chaudes)"""
+        now = time.time()
+        ranked = sorted(self.entries.items(), key=lambda kv: self._decayed_score(kv[1], now), reverse=True)
+        removed = 0
+        for rank, (key, entry) in enumerate(ranked):
+            too_cold = min_score is not None and self._decayed_score(entry, now) < min_score
+            over_limit = keep is not None and rank >= keep
+            if too_cold or over_limit:
+                del self.entries[key]
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "tracked_keys": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
+
+# Instance globale
+access_tracker = AccessTracker()
+# Admission : une valeur trop volumineuse n'est conservée que pour une clé déjà demandée
+cache_budgets.is_repeated = lambda key: access_tracker.requested(key) > 1
+
 # Décorateur pour cache automatique - VERSION COMPLÈTEMENT CORRIGÉE
 def cached(ttl: int = None, key_prefix: str = None):
     def decorator(func: Callable):
@@ -79,11 +271,14 @@ def cached(ttl: int = None, key_prefix: str = None):
             
             # Essayer de récupérer du cache
             cached_result = await cache_manager.get_cached_data(cache_key)
+            access_tracker.record(
+                cache_key, functools.partial(func, *args, **kwargs), ttl, hit=cached_result is not None
+            )
             if cached_result is not None:
-                print(f"✅ Cache HIT: {cache_key}")
+                logger.debug("Cache HIT: %s", cache_key)
                 return cached_result
             
-            print(f"❌ Cache MISS: {cache_key}")
+            logger.debug("Cache MISS: %s", cache_key)
             # Exécuter la fonction si cache miss
             result = await func(*args, **kwargs)
             
@@ -94,8 +289,52 @@ def cached(ttl: int = None, key_prefix: str = None):
         return wrapper
     return decorator
 
+def not_modified(request_headers: dict, meta: dict) -> bool:
+    """If-None-Match (prioritaire) puis If-Modified-Since, comparés aux validateurs stockés"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/").strip('"') for t in if_none_match.split(",")]
+        return "*" in tags or meta["etag"] in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(meta["storedAt"]) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def validator_headers(meta: dict) -> dict:
+    return {"ETag": f'"{meta["etag"]}"', "Last-Modified": formatdate(meta["storedAt"], usegmt=True)}
+
+def _endpoint_context(wrapper) -> Optional[dict]:
+    """Contexte HTTP si ce wrapper est l'endpoint de la requête en cours (pas un appel imbriqué)"""
+    ctx = http_validators.get()
+    if ctx is None or ctx["scope"].get("endpoint") is not wrapper:
+        return None
+    return ctx
+
+def error_aware_ttl(ttl: int, negative_ttl: int = None, is_negative: Callable[[Any], bool] = None) -> Callable[[Any], int]:
+    """Durée de cache d'un résultat : négatif confirmé (is_negative) conservé negative_ttl"""
+    def ttl_for(result) -> int:
+        if is_negative is not None and is_negative(result):
+            return negative_ttl or NEGATIVE_TTL
+        return ttl
+    return ttl_for
+
 # Alternative plus simple - décorateur sans gestion complexe des arguments
-def simple_cached(ttl: int = 3600):
+def simple_cached(ttl: int = 3600, negative_ttl: int = None, is_negative: Callable[[Any], bool] = None,
+                  documents=None):
+    """
+    Cache Redis d'une coroutine, distinguant trois issues :
+    - valeur : conservée ttl secondes
+    - négatif confirmé (is_negative(valeur) vrai) : conservé negative_ttl (CACHE_NEGATIVE_TTL par défaut)
+    - UpstreamError levée : son repli est servi sans rappeler la source jusqu'à la fin du backoff,
+      et les résultats englobants calculés avec ce repli ne sont conservés que CACHE_ERROR_TTL
+    documents : codec (cve_store.DocumentRefs) ne gardant dans l'entrée que les identifiants des CVE
+    enrichis, stockés une seule fois et réassemblés à la lecture
+    """
+    ttl_for = error_aware_ttl(ttl, negative_ttl, is_negative)
+
     def decorator(func: Callable):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
@@ -111,17 +350,59 @@ def simple_cached(ttl: int = 3600):
                 key_parts.append(f"{k}:{v}")
             
             cache_key = f"cve_advisory:{':'.join(key_parts)}"
+            ctx = _endpoint_context(wrapper)
+            refresher = functools.partial(func, *args, **kwargs)
+            tracked = documents.refresher(refresher, kwargs) if documents else refresher
+
+            # Requête conditionnelle : 304 sur les seuls validateurs, sans charger le contenu
+            # (entrée normalisée : les validateurs dépendent aussi des documents, vus après assemblage)
+            if ctx and ctx["conditional"] and not documents:
+                meta = await cache_manager.get_validators(cache_key)
+                if meta and not_modified(ctx["headers"], meta):
+                    access_tracker.record(cache_key, tracked, ttl_for, hit=True)
+                    record_cache_read(cache_key, True)
+                    return Response(status_code=304, headers=validator_headers(meta))
             
             # Vérifier le cache
-            cached_result = await cache_manager.get_cached_data(cache_key)
+            cached_result, meta, error = await cache_manager.get_cached_entry(cache_key, with_validators=bool(ctx))
+            if cached_result is not None and documents:
+                # Documents évincés en trop grand nombre : l'entrée est recalculée
+                cached_result, meta = await documents.unpack(cached_result, meta, documents.compact(kwargs))
+            access_tracker.record(cache_key, tracked, ttl_for, hit=cached_result is not None)
             if cached_result is not None:
+                if ctx and meta:
+                    if documents and ctx["conditional"] and not_modified(ctx["headers"], meta):
+                        return Response(status_code=304, headers=validator_headers(meta))
+                    ctx["response_headers"] = validator_headers(meta)
                 return cached_result
+
+            # Source en échec récent : repli servi sans la rappeler avant la fin du backoff
+            if error and error["retryAt"] > time.time():
+                mark_degraded(error["source"])
+                return error["fallback"]
             
             # Exécuter la fonction
-            result = await func(*args, **kwargs)
-            
-            # Mettre en cache
-            await cache_manager.set_cached_data(cache_key, result, ttl)
+            try:
+                result, degraded = await run_tracked(refresher)
+            except UpstreamError as e:
+                logger.warning("Repli servi pour %s: %s", cache_key, e)
+                await cache_manager.record_error(cache_key, error, e)
+                mark_degraded(e.source)
+                return e.fallback
+
+            # Mettre en cache (brièvement si un repli a servi au calcul)
+            for source in degraded:
+                mark_degraded(source)
+            stored = await documents.pack(result, ERROR_TTL if degraded else None) if documents else result
+            await cache_manager.set_cached_data(cache_key, stored, ERROR_TTL if degraded else ttl_for(result))
+            if error:
+                await cache_manager.clear_error(cache_key)
+            if ctx:
+                meta = await cache_manager.get_validators(cache_key)
+                if meta and documents:
+                    meta = await documents.validators(stored, meta)
+                if meta:
+                    ctx["response_headers"] = validator_headers(meta)
             
             return result
         return wrapper
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from app_logging import logger
+from leader import leader
+from redis_client import redis_client
+
+CHANGES_STREAM_KEY = "cve_advisory:changes:log"
+CHANGES_STATE_KEY = "cve_advisory:changes:state"
+CHANGES_KEV_KEY = "cve_advisory:changes:kev_ids"
+CHANGES_LAST_CHECK_KEY = "cve_advisory:changes:last_check"
+STREAM_ID_RE = re.compile(r"^\d+-\d+$")
+NVD_PAGE_SIZE = 2000
+MAX_RANGE_DAYS = 120  # plage lastModified maximale acceptée par NVD
+
+
+def evidence_fingerprint(evidence: list) -> str:
+    """Empreinte stable d'une liste de preuves d'exploit (source, url)"""
+    keys = sorted(f"{e.get('source')}|{e.get('url')}" for e in evidence or [])
+    return hashlib.md5("\n".join(keys).encode()).hexdigest()[:12]
+
+
+def fingerprint(record: dict) -> dict:
+    """Champs suivis d'un CVE ; seuls ceux présents dans l'enregistrement sont retenus"""
+    current = {}
+    if record.get("lastModified") is not None:
+        current["lastModified"] = str(record["lastModified"])
+    if "isExploited" in record:
+        current["isExploited"] = bool(record["isExploited"])
+    if record.get("epss_score") is not None:
+        current["epss_score"] = float(record["epss_score"])
+    if "evidence" in record:
+        current["evidence"] = evidence_fingerprint(record["evidence"])
+    return current
+
+
+class ChangeFeed:
+    """
+    Journal des changements (stream Redis append-only avec rétention) : date de modification NVD,
+    statut KEV, score EPSS et preuves d'exploit. L'identifiant d'entrée du stream sert de curseur.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("CHANGES_ENABLED", "true").lower() == "true"
+        self.interval = int(os.getenv("CHANGES_INTERVAL", 300))  # secondes entre deux relevés NVD
+        self.retention_days = int(os.getenv("CHANGES_RETENTION_DAYS", 7))
+        self.epss_delta = float(os.getenv("CHANGES_EPSS_DELTA", 0.01))  # variation EPSS minimale signalée
+        self.kev_version = None
+        self.fetch_page = None
+        self.task: asyncio.Task | None = None
+
+    def _min_id(self) -> str:
+        return f"{int((time.time() - self.retention_days * 86400) * 1000)}-0"
+
+    def _differs(self, field: str, old, new) -> bool:
+        if field == "epss_score":
+            return abs((old or 0) - (new or 0)) >= self.epss_delta
+        return old != new
+
+    # --- Écriture ---
+    async def observe(self, records: list, source: str, first_seen: list = None) -> int:
+        """
+        Comparer des CVE observés à leur dernier état connu et journaliser les différences.
+        Lecture de l'état, journal et mise à jour forment une transaction (WATCH/MULTI) : deux workers
+        observant le même CVE ne journalisent pas deux fois le même changement.
+        """
+        by_id = {r["id"]: r for r in records if r.get("id")}
+        if not by_id:
+            return 0
+        ids = list(by_id)
+        entries = await redis_client.hupdate_json(
+            CHANGES_STATE_KEY, ids, lambda states: self._diff(by_id, states, source, first_seen),
+            stream_key=CHANGES_STREAM_KEY, minid=self._min_id(),
+        )
+        return len(entries or [])
+
+    def _diff(self, by_id: dict, states: list, source: str, first_seen: list) -> tuple:
+        """(états à mettre à jour, entrées du journal) des CVE observés face à leurs états connus"""
+        entries = []
+        updates = {}
+        for cve_id, state in zip(by_id, states):
+            current = fingerprint(by_id[cve_id])
+            if state is None:
+                changed = list(first_seen or ["new"])
+                new_state = current
+            else:
+                changed = [f for f, v in current.items() if f in state and self._differs(f, state[f], v)]
+                new_state = {**state, **current}
+                # Variation EPSS sous le seuil : garder la référence pour que la dérive finisse par compter
+                if "epss_score" in current and "epss_score" not in changed and "epss_score" in state:
+                    new_state["epss_score"] = state["epss_score"]
+            if changed:
+                entries.append({
+                    "cveId": cve_id,
+                    "changed": changed,
+                    "source": source,
+                    **{k: v for k, v in new_state.items() if k != "evidence"},
+                })
+            if new_state != state:
+                updates[cve_id] = new_state
+        return updates, entries
+
+    async def observe_kev(self, catalog: dict) -> int:
+        """Journaliser les entrées et sorties du catalogue KEV quand sa version change"""
+        version = catalog.get("catalogVersion")
+        if version == self.kev_version:
+            return 0
+        self.kev_version = version
+
+        current = {v.get("cveID") for v in catalog.get("vulnerabilities", []) if v.get("cveID")}
+        previous = await redis_client.get_json(CHANGES_KEV_KEY)
+        await redis_client.set_json(CHANGES_KEV_KEY, sorted(current))
+        if previous is None:
+            return 0  # premier catalogue connu : référence, pas de changement
+
+        previous = set(previous)
+        records = [{"id": c, "isExploited": True} for c in sorted(current - previous)]
+        records += [{"id": c, "isExploited": False} for c in sorted(previous - current)]
+        return await self.observe(records, "kev", first_seen=["isExploited"])
+
+    # --- Lecture ---
+    def parse_cursor(self, since: str | None) -> str:
+        """Curseur (identifiant de stream) ou horodatage ISO -> borne basse XRANGE"""
+        if not since:
+            return "-"
+        if STREAM_ID_RE.match(since):
+            cursor_ms = int(since.split("-")[0])
+            bound = f"({since}"
+        else:
+            try:
+                dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError("since doit être un curseur ou un horodatage ISO 8601")
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            cursor_ms = int(dt.timestamp() * 1000)
+            bound = f"{cursor_ms}-0"
+        if cursor_ms < int((time.time() - self.retention_days * 86400) * 1000):
+            raise LookupError(f"Curseur antérieur à la rétention du journal ({self.retention_days} jours)")
+        return bound
+
+    async def read(self, since: str | None, limit: int) -> dict:
+        rows = await redis_client.xrange_json(CHANGES_STREAM_KEY, self.parse_cursor(since), "+", count=limit + 1)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "changes": [{"cursor": entry_id, **entry} for entry_id, entry in rows],
+            "nextCursor": rows[-1][0] if rows else since,
+            "hasMore": has_more,
+        }
+
+    # --- Relevé périodique NVD (lastModified) ---
+    async def run_cycle(self) -> int:
+        """
+        Relever les CVE modifiés depuis le dernier relevé, par fenêtres d'au plus MAX_RANGE_DAYS
+        (après une longue interruption) ; le relevé avance fenêtre par fenêtre.
+        """
+        now = datetime.now(timezone.utc)
+        last_check = await redis_client.get_json(CHANGES_LAST_CHECK_KEY)
+        since = datetime.fromisoformat(last_check) if last_check else now - timedelta(seconds=self.interval)
+
+        observed = 0
+        start = since
+        while start < now:
+            end = min(start + timedelta(days=MAX_RANGE_DAYS), now)
+            observed += await self._observe_range(start, end)
+            await redis_client.set_json(CHANGES_LAST_CHECK_KEY, end.isoformat())
+            start = end
+        logger.info("Journal des changements : %s changements NVD depuis %s", observed, since.isoformat())
+        return observed
+
+    async def _observe_range(self, start: datetime, end: datetime) -> int:
+        params = {"lastModStartDate": start, "lastModEndDate": end}
+        observed = 0
+        start_index = 0
+        while True:
+            page = await self.fetch_page(params, start_index, NVD_PAGE_SIZE)
+            records = [{"id": c.id, "lastModified": getattr(c, "lastModified", None)} for c in page["cves"]]
+            observed += await self.observe(records, "nvd")
+            start_index += len(page["cves"])
+            if not page["cves"] or start_index >= page["total"]:
+                break
+        return observed
+
+    async def _loop(self):
+        while True:
+            try:
+                if leader.is_leader:  # un seul worker rafraîchit
+                    await self.run_cycle()
+            except Exception as e:
+                logger.warning("Erreur relevé des changements NVD: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self, fetch_page):
+        """Démarrer le relevé périodique ; fetch_page(params, start_index, size) interroge NVD"""
+        self.fetch_page = fetch_page
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Arrêter la tâche de fond"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+# Instance globale
+change_feed = ChangeFeed()
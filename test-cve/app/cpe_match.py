@@ -0,0 +1,286 @@
+import asyncio
+import gc
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from app_logging import logger
+from index_updates import publish_updates, read_updates
+from redis_client import redis_client
+
+CPE_ENTRIES_KEY = "cve_advisory:cpe_index:entries"
+CPE_UPDATES_KEY = "cve_advisory:cpe_index:updates"  # journal des critères écrits (index_updates)
+CPE_FIELDS = ("part", "vendor", "product", "version", "update", "edition", "language",
+              "sw_edition", "target_sw", "target_hw", "other")
+RANGE_FIELDS = ("versionStartIncluding", "versionStartExcluding", "versionEndIncluding", "versionEndExcluding")
+ANY = ("*", "")
+VERSION_TOKEN_RE = re.compile(r"\d+|[a-z]+")
+# Chargement au démarrage : CVE indexés entre deux reprises de la boucle d'événements
+CPE_LOAD_BATCH = int(os.getenv("CPE_LOAD_BATCH", 500))
+CPE_SYNC_ENTRIES = 100  # entrées du journal des écritures lues par requête
+
+
+def split_cpe(uri: str) -> list:
+    """Découper une CPE 2.3 formatée en champs (les ':' échappés restent dans la valeur)"""
+    parts, current, escaped = [], [], False
+    for ch in uri:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == "\\":
+            current.append(ch)
+            escaped = True
+        elif ch == ":":
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def parse_cpe(uri: str) -> dict | None:
+    """cpe:2.3:a:apache:log4j:2.14.1:*:... -> {"part": "a", "vendor": "apache", ...}"""
+    parts = split_cpe((uri or "").strip().lower())
+    if len(parts) < 5 or parts[0] != "cpe" or parts[1] != "2.3":
+        return None
+    values = parts[2:] + ["*"] * (len(CPE_FIELDS) - len(parts[2:]))
+    return dict(zip(CPE_FIELDS, values[:len(CPE_FIELDS)]))
+
+
+@lru_cache(maxsize=65536)
+def version_tokens(version: str) -> tuple:
+    """
+    Découper une version en segments numériques / alphabétiques.
+    "2.14.1" -> (2, 14, 1) ; "1.0rc1" -> (1, 0, "rc", 1)
+    """
+    return tuple(int(t) if t.isdigit() else t for t in VERSION_TOKEN_RE.findall((version or "").lower()))
+
+
+def _tail_order(tail: tuple) -> int:
+    """Segments restants d'une seule version : zéros neutres, puis suffixe -> pré-version, numéro -> plus grande"""
+    for token in tail:
+        if token == 0:
+            continue
+        return -1 if isinstance(token, str) else 1
+    return 0
+
+
+def compare_versions(a: str, b: str) -> int:
+    """
+    Ordre des versions : numérique segment par segment, un numéro l'emporte sur un suffixe
+    alphabétique, et un suffixe alphabétique après la partie numérique marque une pré-version
+    (1.0rc1 < 1.0 == 1.0.0 < 1.0.1). Un zéro face à un suffixe est un remplissage (2.0-beta == 2.0.0-beta).
+    """
+    ta, tb = version_tokens(a), version_tokens(b)
+    i = j = 0
+    while i < len(ta) and j < len(tb):
+        x, y = ta[i], tb[j]
+        if x == y:
+            i, j = i + 1, j + 1
+            continue
+        if isinstance(x, int) and isinstance(y, int):
+            return -1 if x < y else 1
+        if isinstance(x, str) and isinstance(y, str):
+            return -1 if x < y else 1
+        # Numéro face à un suffixe : un zéro n'est qu'un remplissage, sinon le numéro l'emporte
+        if x == 0:
+            i += 1
+        elif y == 0:
+            j += 1
+        else:
+            return 1 if isinstance(x, int) else -1
+    if i < len(ta):
+        return _tail_order(ta[i:])
+    return -_tail_order(tb[j:])
+
+
+def version_in_range(version: str, entry: dict) -> bool:
+    """Tester une version installée contre la version exacte ou les bornes d'un critère NVD"""
+    criteria_version = entry["cpe"]["version"]
+    if criteria_version not in ANY and criteria_version != "-":
+        return compare_versions(version, criteria_version) == 0
+
+    start_inc = entry.get("versionStartIncluding")
+    start_exc = entry.get("versionStartExcluding")
+    end_inc = entry.get("versionEndIncluding")
+    end_exc = entry.get("versionEndExcluding")
+    if start_inc and compare_versions(version, start_inc) < 0:
+        return False
+    if start_exc and compare_versions(version, start_exc) <= 0:
+        return False
+    if end_inc and compare_versions(version, end_inc) > 0:
+        return False
+    if end_exc and compare_versions(version, end_exc) >= 0:
+        return False
+    return True
+
+
+def attributes_match(installed: dict, criteria: dict) -> bool:
+    """Champs secondaires (update, target_sw, ...) : un joker d'un côté ou de l'autre correspond"""
+    for field in CPE_FIELDS[4:]:
+        a, b = installed[field], criteria[field]
+        if a in ANY or b in ANY or a == b:
+            continue
+        return False
+    return True
+
+
+class CpeIndex:
+    """
+    Critères CPE vulnérables des CVE connus, indexés par part -> vendor -> product.
+    Un actif n'est comparé qu'aux critères de son produit, jamais à l'ensemble des CVE.
+    """
+
+    def __init__(self):
+        self.tree = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self.by_cve: dict = {}  # cve_id -> entrées indexées (pour la mise à jour incrémentale)
+        self.loaded = False  # critères persistés entièrement rechargés
+        self.updates_cursor = "0-0"  # dernière entrée du journal des écritures appliquée
+
+    def __len__(self) -> int:
+        return len(self.by_cve)
+
+    def remove(self, cve_id: str) -> None:
+        for entry in self.by_cve.pop(cve_id, ()):
+            cpe = entry["cpe"]
+            bucket = self.tree[cpe["part"]][cpe["vendor"]][cpe["product"]]
+            bucket[:] = [e for e in bucket if e["cveId"] != cve_id]
+
+    def add(self, cve_id: str, entries: list) -> None:
+        """Indexer (ou réindexer) les critères vulnérables d'un CVE"""
+        self.remove(cve_id)
+        kept = []
+        for entry in entries:
+            cpe = entry["cpe"]
+            self.tree[cpe["part"]][cpe["vendor"]][cpe["product"]].append(entry)
+            kept.append(entry)
+        self.by_cve[cve_id] = kept
+
+    def _candidates(self, installed: dict):
+        """Descendre l'arbre ; un joker dans la CPE installée parcourt tout le niveau"""
+        parts = self.tree.values() if installed["part"] in ANY else [self.tree.get(installed["part"], {})]
+        for vendors in parts:
+            vendor_nodes = vendors.values() if installed["vendor"] in ANY else [vendors.get(installed["vendor"], {})]
+            for products in vendor_nodes:
+                if installed["product"] in ANY:
+                    for bucket in products.values():
+                        yield from bucket
+                else:
+                    yield from products.get(installed["product"], ())
+                    # Critères NVD dont le produit est un joker (rare : toute la gamme d'un éditeur)
+                    yield from products.get("*", ())
+
+    def match(self, uri: str) -> list:
+        """Critères correspondant à une CPE installée"""
+        installed = parse_cpe(uri)
+        if installed is None:
+            return []
+        version = installed["version"]
+        matches = []
+        for entry in self._candidates(installed):
+            if not attributes_match(installed, entry["cpe"]):
+                continue
+            # Version installée inconnue : tout critère du produit est un candidat
+            if version not in ANY and version != "-" and not version_in_range(version, entry):
+                continue
+            matches.append(entry)
+        return matches
+
+    def match_many(self, uris: list) -> dict:
+        """CPE installée -> {cve_id: critère correspondant}, chaque CPE distincte évaluée une seule fois"""
+        results = {}
+        for uri in dict.fromkeys(uris):
+            per_cve = {}
+            for entry in self.match(uri):
+                per_cve.setdefault(entry["cveId"], entry)
+            results[uri] = per_cve
+        return results
+
+
+# Instance globale
+cpe_index = CpeIndex()
+
+
+def cve_cpe_entries(cve) -> list:
+    """Critères vulnérables d'un objet CVE nvdlib, sous forme de dictionnaires sérialisables"""
+    entries = []
+    for item in getattr(cve, "cpe", []) or []:
+        if not getattr(item, "vulnerable", True):
+            continue
+        criteria = getattr(item, "criteria", None)
+        cpe = parse_cpe(criteria)
+        if cpe is None:
+            continue
+        entry = {"cveId": cve.id, "criteria": criteria, "cpe": cpe}
+        for field in RANGE_FIELDS:
+            value = getattr(item, field, None)
+            if value:
+                entry[field] = value
+        entries.append(entry)
+    return entries
+
+
+async def ingest_cpe(cves) -> None:
+    """Indexer les critères CPE des CVE au fil de leur arrivée et les persister"""
+    docs = {}
+    for cve in cves:
+        cve_id = getattr(cve, "id", None)
+        if not cve_id:
+            continue
+        entries = cve_cpe_entries(cve)
+        cpe_index.add(cve_id, entries)
+        docs[cve_id] = entries
+    await persist_cpe_entries(docs)
+
+
+async def store_cpe_entries(cves) -> None:
+    """Persister les critères CPE sans les indexer en mémoire (ingestion hors ligne)"""
+    docs = {getattr(cve, "id", None): cve_cpe_entries(cve) for cve in cves}
+    docs.pop(None, None)
+    await persist_cpe_entries(docs)
+
+
+async def persist_cpe_entries(docs: dict) -> None:
+    """Persister les critères {cve_id: entrées} et journaliser l'écriture pour les autres workers"""
+    await redis_client.hset_json(CPE_ENTRIES_KEY, docs)
+    await publish_updates(CPE_UPDATES_KEY, list(docs))
+
+
+async def load_cpe_index() -> int:
+    """Reconstruire l'index CPE depuis les critères persistés, par lots (HSCAN) sans bloquer la boucle"""
+    # Écritures pendant le chargement : rejouées ensuite par sync_cpe_index
+    cpe_index.updates_cursor = await redis_client.stream_last_id(CPE_UPDATES_KEY) or "0-0"
+    pending = 0
+    async for docs in redis_client.hscan_json(CPE_ENTRIES_KEY, CPE_LOAD_BATCH):
+        for cve_id, entries in docs.items():
+            cpe_index.add(cve_id, entries)
+            pending += 1
+            if pending >= CPE_LOAD_BATCH:
+                pending = 0
+                await asyncio.sleep(0)
+    # Index chargé une fois : ses objets sont exclus des passes complètes du ramasse-miettes
+    gc.freeze()
+    cpe_index.loaded = True
+    logger.info("Index CPE chargé (%s CVE)", len(cpe_index))
+    return len(cpe_index)
+
+
+async def sync_cpe_index() -> int:
+    """Appliquer les critères écrits depuis le dernier relevé par les autres workers et l'ingestion hors ligne"""
+    if not cpe_index.loaded:
+        return 0
+    applied = 0
+    while True:
+        ids, cursor = await read_updates(CPE_UPDATES_KEY, cpe_index.updates_cursor, CPE_SYNC_ENTRIES)
+        if cursor == cpe_index.updates_cursor:
+            return applied
+        for start in range(0, len(ids), CPE_LOAD_BATCH):
+            chunk = ids[start:start + CPE_LOAD_BATCH]
+            for cve_id, entries in zip(chunk, await redis_client.hmget_json(CPE_ENTRIES_KEY, chunk)):
+                if entries is not None:
+                    cpe_index.add(cve_id, entries)
+            applied += len(chunk)
+            await asyncio.sleep(0)
+        cpe_index.updates_cursor = cursor
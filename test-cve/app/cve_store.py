@@ -0,0 +1,154 @@
+"""
+Magasin normalisé des CVE enrichis : chaque document est stocké une seule fois, en forme compacte,
+sous cve_advisory:cve_detail:{id}. Les entrées des endpoints (listes, recherche, détail) ne gardent
+que les identifiants ordonnés et leurs métadonnées ; les documents sont réassemblés en un MGET.
+Réécrire un CVE le met donc à jour dans toutes les réponses qui le contiennent.
+
+Un document évincé (allkeys-lru) est recalculé par le chargeur enregistré par l'application, dans
+la limite de CVE_STORE_REBUILD_MAX documents par entrée ; au-delà, l'entrée est recalculée en entier.
+"""
+import hashlib
+import os
+from typing import Awaitable, Callable, Optional
+
+from app_logging import logger
+from cache_utils import ERROR_TTL, META_SUFFIX, cache_manager, degraded_sources
+from records import expand_wire, to_wire
+
+CVE_DOC_TTL = int(os.getenv("CVE_DOC_TTL", cache_manager.default_ttls["cve_detail"]))
+CVE_STORE_REBUILD_MAX = int(os.getenv("CVE_STORE_REBUILD_MAX", 50))
+
+
+def doc_key(cve_id: str) -> str:
+    return f"cve_advisory:cve_detail:{cve_id}"
+
+
+class CveStore:
+    def __init__(self):
+        # identifiants -> documents enrichis (forme complète), fourni par l'application
+        self.loader: Optional[Callable[[list], Awaitable[list]]] = None
+        self.rebuilt = 0
+        self.incomplete = 0
+
+    async def put_many(self, docs: list, ttl: int = None) -> bool:
+        """Écrire des documents enrichis ; brièvement si un repli a servi à leur calcul"""
+        if ttl is None:
+            ttl = ERROR_TTL if degraded_sources.get() else CVE_DOC_TTL
+        return await cache_manager.set_cached_many(
+            {doc_key(d["id"]): to_wire(d) for d in docs if d.get("id")}, ttl
+        )
+
+    async def get_many(self, cve_ids: list, with_validators: bool = False) -> tuple:
+        """(documents compacts ou None, validateurs ou None) dans l'ordre des identifiants, un seul MGET"""
+        if not with_validators:
+            return await cache_manager.get_cached_many([doc_key(c) for c in cve_ids]), [None] * len(cve_ids)
+        keys = [k for c in cve_ids for k in (doc_key(c), doc_key(c) + META_SUFFIX)]
+        values = await cache_manager.get_cached_many(keys)
+        return values[0::2], values[1::2]
+
+    async def get_metas(self, cve_ids: list) -> list:
+        return await cache_manager.get_cached_many([doc_key(c) + META_SUFFIX for c in cve_ids])
+
+    async def assemble(self, cve_ids: list, compact: bool = False, with_validators: bool = False,
+                       rebuild_max: int = CVE_STORE_REBUILD_MAX) -> tuple:
+        """
+        (documents, validateurs) dans l'ordre des identifiants, documents évincés recalculés.
+        (None, None) si plus de rebuild_max documents manquent : l'appelant recalcule l'entrée.
+        """
+        docs, metas = await self.get_many(cve_ids, with_validators)
+        missing = [c for c, doc in zip(cve_ids, docs) if doc is None]
+        if missing:
+            if self.loader is None or len(missing) > rebuild_max:
+                self.incomplete += 1
+                return None, None
+            try:
+                rebuilt = await self.loader(missing)
+            except Exception as e:
+                logger.warning("Reconstruction de %s documents CVE impossible: %s", len(missing), e)
+                self.incomplete += 1
+                return None, None
+            await self.put_many(rebuilt)
+            self.rebuilt += len(rebuilt)
+            by_id = {d["id"]: to_wire(d) for d in rebuilt}
+            docs = [doc if doc is not None else by_id.get(c) for c, doc in zip(cve_ids, docs)]
+            if with_validators:
+                fresh = dict(zip(missing, await self.get_metas(missing)))
+                metas = [fresh.get(c, meta) for c, meta in zip(cve_ids, metas)]
+            # CVE disparus de la source : retirés de la liste
+            kept = [i for i, doc in enumerate(docs) if doc is not None]
+            docs, metas = [docs[i] for i in kept], [metas[i] for i in kept]
+        return (docs if compact else [expand_wire(d) for d in docs]), metas
+
+    def stats(self) -> dict:
+        return {"docTtl": CVE_DOC_TTL, "rebuilt": self.rebuilt, "incomplete": self.incomplete}
+
+
+def combine_validators(meta: dict, doc_metas: list) -> dict:
+    """Validateurs d'une réponse assemblée : l'entrée et chacun de ses documents"""
+    doc_metas = [m for m in doc_metas if m]
+    etag = hashlib.md5("".join([meta["etag"], *(m["etag"] for m in doc_metas)]).encode()).hexdigest()
+    return {"etag": etag, "storedAt": max([meta["storedAt"], *(m["storedAt"] for m in doc_metas)])}
+
+
+class DocumentRefs:
+    """
+    Codec d'entrée pour simple_cached(documents=...) : le champ `field` (liste de CVE enrichis ou CVE
+    unique) est remplacé par les identifiants, les documents étant écrits dans le magasin.
+    compact_param : argument de l'endpoint demandant la forme compacte des documents.
+    """
+
+    def __init__(self, field: str, compact_param: str = None):
+        self.field = field
+        self.compact_param = compact_param
+
+    def compact(self, kwargs: dict) -> bool:
+        return bool(self.compact_param and kwargs.get(self.compact_param))
+
+    def refs(self, entry: dict) -> Optional[list]:
+        """Identifiants référencés par une entrée, None si elle n'est pas normalisée"""
+        value = entry.get(self.field) if isinstance(entry, dict) else None
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list) and all(isinstance(v, str) for v in value):
+            return value
+        return None
+
+    async def pack(self, result, ttl: int = None):
+        """Écrire les documents du résultat et retourner l'entrée à mettre en cache"""
+        if not isinstance(result, dict) or not isinstance(result.get(self.field), (dict, list)):
+            return result
+        value = result[self.field]
+        docs = [value] if isinstance(value, dict) else value
+        await cve_store.put_many(docs, ttl)
+        ids = value["id"] if isinstance(value, dict) else [d["id"] for d in docs]
+        # Ordre des clés conservé : la réponse réassemblée est identique à l'originale
+        return {k: (ids if k == self.field else v) for k, v in result.items()}
+
+    def refresher(self, call: Callable[[], Awaitable], kwargs: dict) -> Callable[[], Awaitable]:
+        """Recalcul pour le pré-chauffage : l'entrée écrite reste normalisée"""
+        async def packed():
+            return await self.pack(await call())
+        return packed
+
+    async def unpack(self, entry, meta: dict = None, compact: bool = False) -> tuple:
+        """(résultat réassemblé, validateurs combinés) ; (None, None) si l'entrée est à recalculer"""
+        ids = self.refs(entry)
+        if ids is None:
+            return None, None  # entrée non normalisée (format précédent)
+        docs, doc_metas = await cve_store.assemble(ids, compact, with_validators=meta is not None)
+        if docs is None or isinstance(entry[self.field], str) and not docs:
+            return None, None
+        value = docs[0] if isinstance(entry[self.field], str) else docs
+        result = {k: (value if k == self.field else v) for k, v in entry.items()}
+        return result, combine_validators(meta, doc_metas) if meta else meta
+
+    async def validators(self, entry, meta: dict) -> dict:
+        """Validateurs combinés d'une entrée que l'on vient d'écrire"""
+        ids = self.refs(entry)
+        if not ids:
+            return meta
+        return combine_validators(meta, await cve_store.get_metas(ids))
+
+
+# Instance globale
+cve_store = CveStore()
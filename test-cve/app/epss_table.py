@@ -0,0 +1,125 @@
+import asyncio
+import gzip
+import os
+
+import httpx
+import numpy as np
+
+from app_logging import logger
+from kev_index import encode_cve_id
+from metrics import track_upstream
+from snapshots import Snapshot, SnapshotFollower, publish
+
+EPSS_BULK_URL = os.getenv("EPSS_BULK_URL", "https://epss.cyentia.com/epss_scores-current.csv.gz")
+
+
+def parse_epss_csv(text: str) -> tuple:
+    """
+    Fichier quotidien FIRST : "#model_version:...,score_date:..." puis "cve,epss,percentile".
+    -> (identifiants encodés triés, scores, percentiles, métadonnées)
+    """
+    meta = {}
+    codes, scores, percentiles = [], [], []
+    for line in text.splitlines():
+        if line.startswith("#"):
+            for part in line[1:].split(","):
+                key, _, value = part.partition(":")
+                meta[key.strip()] = value.strip()
+            continue
+        cve_id, _, rest = line.partition(",")
+        code = encode_cve_id(cve_id)
+        if code < 0:
+            continue  # en-tête ou ligne invalide
+        score, _, percentile = rest.partition(",")
+        codes.append(code)
+        scores.append(float(score))
+        percentiles.append(float(percentile))
+
+    codes = np.array(codes, dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    return (codes[order], np.array(scores, dtype=np.float64)[order],
+            np.array(percentiles, dtype=np.float64)[order], meta)
+
+
+class EpssTable:
+    """
+    Table EPSS complète (fichier quotidien FIRST) en tableaux triés par identifiant encodé.
+    Le leader la télécharge et la publie en instantané ; les workers la projettent en mémoire.
+    Les CVE absents (publiés après le fichier) restent servis par l'API EPSS.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("EPSS_TABLE_ENABLED", "true").lower() == "true"
+        self.codes = np.empty(0, dtype=np.int64)
+        self.scores = np.empty(0, dtype=np.float64)
+        self.percentiles = np.empty(0, dtype=np.float64)
+        self.meta: dict = {}
+        self.follower = SnapshotFollower("epss")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _positions(self, codes: np.ndarray) -> np.ndarray:
+        pos = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return np.where((self.codes[pos] == codes) & (codes >= 0), pos, -1)
+
+    def get(self, cve_id: str) -> dict | None:
+        """{"epss_score", "epss_percentile", "epss_status"} ou None si le CVE n'est pas dans la table"""
+        if not len(self.codes):
+            return None
+        pos = int(self._positions(np.array([encode_cve_id(cve_id)], dtype=np.int64))[0])
+        if pos < 0:
+            return None
+        return {"epss_score": float(self.scores[pos]), "epss_percentile": float(self.percentiles[pos]),
+                "epss_status": "ok"}
+
+    def get_many(self, cve_ids: list) -> dict:
+        """Scores des identifiants présents dans la table"""
+        if not len(self.codes) or not cve_ids:
+            return {}
+        positions = self._positions(np.array([encode_cve_id(c) for c in cve_ids], dtype=np.int64))
+        return {
+            cve_id: {"epss_score": float(self.scores[p]), "epss_percentile": float(self.percentiles[p]),
+                     "epss_status": "ok"}
+            for cve_id, p in zip(cve_ids, positions.tolist()) if p >= 0
+        }
+
+    async def refresh(self) -> bool:
+        """Leader : télécharger le fichier du jour et le publier s'il est plus récent"""
+        async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
+            with track_upstream("epss"):
+                resp = await client.get(EPSS_BULK_URL)
+                resp.raise_for_status()
+        text = await asyncio.to_thread(lambda: gzip.decompress(resp.content).decode("utf-8"))
+        codes, scores, percentiles, meta = await asyncio.to_thread(parse_epss_csv, text)
+        if not len(codes) or meta.get("score_date") and meta.get("score_date") == self.meta.get("score_date"):
+            return False
+        await publish("epss", {"codes": codes, "scores": scores, "percentiles": percentiles}, {},
+                      {**meta, "count": len(codes)})
+        await self.sync()
+        logger.info("Table EPSS publiée (%s CVE, %s)", len(codes), meta.get('score_date'))
+        return True
+
+    def attach(self, snapshot: Snapshot) -> None:
+        self.codes = snapshot.arrays["codes"]
+        self.scores = snapshot.arrays["scores"]
+        self.percentiles = snapshot.arrays["percentiles"]
+        self.meta = snapshot.meta
+
+    def restore(self) -> bool:
+        """Démarrage : projeter la dernière génération locale (quelques millisecondes)"""
+        snapshot = self.follower.restore()
+        if snapshot is not None:
+            self.attach(snapshot)
+        return snapshot is not None
+
+    async def sync(self) -> bool:
+        """Projeter la dernière génération publiée ; True si la table est disponible"""
+        snapshot = await self.follower.poll()
+        if snapshot is not None:
+            self.attach(snapshot)
+        return len(self.codes) > 0
+
+
+# Instance globale
+epss_table = EpssTable()
@@ -0,0 +1,230 @@
+"""
+Registre des sources de preuves d'exploit public (références NVD, Exploit-DB, GitHub, Reddit).
+
+Chaque source déclare sa fonction ("module:fonction", importée au premier usage), sa concurrence
+maximale, son délai, la durée de cache de ses résultats (plus longue pour une absence confirmée de
+preuve), sa classe de coût et les variables d'environnement dont elle a besoin. Une source en échec
+n'est pas rappelée avant la fin de son backoff (voir cache_utils). Une source désactivée (EVIDENCE_<NOM>_ENABLED=false) ou non
+configurée n'est jamais importée ni appelée.
+
+Classe de coût maximale par endpoint : EVIDENCE_MAX_COST_BY_PATH="/cves/search=cheap,/cves/batch=free"
+(préfixe de chemin le plus long). Sans correspondance, toutes les sources actives sont interrogées.
+"""
+import asyncio
+import importlib
+import os
+import time
+from contextvars import ContextVar
+
+from app_logging import logger
+from cache_utils import ERROR_SUFFIX, NEGATIVE_TTL, UpstreamError, cache_manager, mark_degraded
+
+# Whitelist des tags NVD
+EXPLOIT_TAG_WHITELIST = {"exploit", "patch", "issue tracking", "issue-tracking", "issue"}
+
+COST_CLASSES = ("free", "cheap", "expensive")  # sans E/S, requête simple, API limitée en débit
+
+# Classe de coût maximale de la requête en cours (fixée par le middleware selon le chemin)
+evidence_max_cost: ContextVar = ContextVar("evidence_max_cost", default="expensive")
+
+
+def cost_rank(cost: str) -> int:
+    return COST_CLASSES.index(cost)
+
+
+class EvidenceSource:
+    def __init__(self, name: str, target: str, cost: str, concurrency: int = 4, timeout: float = 10.0,
+                 ttl: int = 1800, negative_ttl: int = NEGATIVE_TTL, requires: tuple = (),
+                 signals_exploit: bool = True):
+        self.name = name
+        self.target = target
+        self.cost = cost
+        self.concurrency = int(os.getenv(f"EVIDENCE_{name.upper()}_CONCURRENCY", concurrency))
+        self.timeout = float(os.getenv(f"EVIDENCE_{name.upper()}_TIMEOUT", timeout))
+        self.ttl = int(os.getenv(f"EVIDENCE_{name.upper()}_TTL", ttl))  # 0 : pas de cache (source locale)
+        self.negative_ttl = int(os.getenv(f"EVIDENCE_{name.upper()}_NEGATIVE_TTL", negative_ttl))
+        self.requires = requires
+        # False : preuves listées sans suffire à déclarer un exploit public
+        self.signals_exploit = signals_exploit
+        self.enabled = os.getenv(f"EVIDENCE_{name.upper()}_ENABLED", "true").lower() == "true"
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.func = None
+
+    @property
+    def configured(self) -> bool:
+        return all(os.getenv(var) for var in self.requires)
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.configured
+
+    def cache_key(self, cve_id: str) -> str:
+        return f"cve_advisory:evidence_{self.name}:{cve_id}"
+
+    def load(self):
+        """Importer la fonction de la source au premier appel"""
+        if self.func is None:
+            module, _, attr = self.target.partition(":")
+            self.func = getattr(importlib.import_module(module), attr)
+        return self.func
+
+    def ttl_for(self, evidence: list) -> int:
+        return self.ttl if evidence else self.negative_ttl
+
+    async def collect(self, cve_obj) -> list:
+        """Preuves de la source pour un CVE ; UpstreamError en cas d'échec ou de délai dépassé"""
+        func = self.load()
+        try:
+            async with self.semaphore:
+                return await asyncio.wait_for(func(cve_obj), self.timeout)
+        except Exception as e:
+            logger.warning("Source %s indisponible pour %s: %r", self.name, getattr(cve_obj, "id", None), e)
+            raise UpstreamError(self.name, repr(e), [])
+
+    async def close(self):
+        """Fermer les ressources de la source (client HTTP partagé) si elle a été chargée"""
+        if self.func is not None:
+            module = importlib.import_module(self.target.partition(":")[0])
+            if hasattr(module, "aclose"):
+                await module.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "configured": self.configured,
+            "loaded": self.func is not None,
+            "cost": self.cost,
+            "concurrency": self.concurrency,
+            "timeout": self.timeout,
+            "ttl": self.ttl,
+            "negativeTtl": self.negative_ttl,
+        }
+
+
+class EvidenceRegistry:
+    def __init__(self):
+        self.sources: dict = {}
+        self.cost_by_path = self._parse_paths(os.getenv("EVIDENCE_MAX_COST_BY_PATH", ""))
+
+    @staticmethod
+    def _parse_paths(spec: str) -> list:
+        """"/cves/search=cheap,..." -> [(préfixe, classe)] du plus long au plus court"""
+        rules = []
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            prefix, _, cost = part.partition("=")
+            if cost not in COST_CLASSES:
+                raise ValueError(f"Classe de coût inconnue pour {prefix} : {cost} ({', '.join(COST_CLASSES)})")
+            rules.append((prefix, cost))
+        return sorted(rules, key=lambda rule: len(rule[0]), reverse=True)
+
+    def register(self, source: EvidenceSource) -> EvidenceSource:
+        self.sources[source.name] = source
+        return source
+
+    def max_cost_for(self, path: str) -> str:
+        for prefix, cost in self.cost_by_path:
+            if path.startswith(prefix):
+                return cost
+        return "expensive"
+
+    def select(self, max_cost: str = None) -> list:
+        """Sources actives dont le coût ne dépasse pas max_cost (par défaut celui de la requête)"""
+        limit = cost_rank(max_cost or evidence_max_cost.get())
+        return [s for s in self.sources.values() if s.active and cost_rank(s.cost) <= limit]
+
+    def signals_exploit(self, found: dict) -> bool:
+        """Vrai si une source déclarant un exploit public a fourni au moins une preuve (résultat de collect)"""
+        return any(items and self.sources[name].signals_exploit for name, items in found.items())
+
+    async def collect(self, cve_obj, max_cost: str = None) -> dict:
+        """
+        {source: preuves, ou None si la source est en échec} des sources sélectionnées.
+        Entrées et échecs en cache lus en un MGET ; sources à interroger appelées en parallèle.
+        """
+        cve_id = getattr(cve_obj, "id", None)
+        sources = self.select(max_cost)
+        if not cve_id or not sources:
+            return {}
+
+        cached_sources = [s for s in sources if s.ttl]
+        keys = [k for s in cached_sources for k in (s.cache_key(cve_id), s.cache_key(cve_id) + ERROR_SUFFIX)]
+        values = await cache_manager.get_cached_many(keys) if keys else []
+        results, errors = {}, {}
+        now = time.time()
+        for i, source in enumerate(cached_sources):
+            value, error = values[2 * i], values[2 * i + 1]
+            if value is not None:
+                results[source.name] = value
+            elif error:
+                errors[source.name] = error
+                if error["retryAt"] > now:
+                    results[source.name] = None  # backoff en cours : source non rappelée
+
+        missing = [s for s in sources if s.name not in results]
+        fresh = await asyncio.gather(*(s.collect(cve_obj) for s in missing), return_exceptions=True)
+        writes = []
+        for source, evidence in zip(missing, fresh):
+            key = source.cache_key(cve_id)
+            if isinstance(evidence, UpstreamError):
+                results[source.name] = None
+                if source.ttl:
+                    writes.append(cache_manager.record_error(key, errors.get(source.name), evidence))
+                continue
+            if isinstance(evidence, BaseException):
+                raise evidence
+            results[source.name] = evidence
+            if source.ttl:
+                writes.append(cache_manager.set_cached_data(key, evidence, ttl=source.ttl_for(evidence)))
+                if source.name in errors:
+                    writes.append(cache_manager.clear_error(key))
+        if writes:
+            await asyncio.gather(*writes)
+
+        for name, evidence in results.items():
+            if evidence is None:
+                mark_degraded(name)
+        # Ordre de déclaration des sources
+        return {s.name: results[s.name] for s in sources if s.name in results}
+
+    async def close(self):
+        for source in self.sources.values():
+            await source.close()
+
+    def stats(self) -> dict:
+        return {name: source.stats() for name, source in self.sources.items()}
+
+
+async def nvd_reference_evidence(cve_obj) -> list:
+    """Références NVD portant un tag de la whitelist"""
+    evidence = []
+    for ref in getattr(cve_obj, "references", []) or []:
+        url = getattr(ref, "url", None)
+        tags = getattr(ref, "tags", []) or []
+
+        if not isinstance(tags, (list, tuple)):
+            tags = [tags]
+
+        for t in tags:
+            if t and t.strip().lower() in EXPLOIT_TAG_WHITELIST:
+                if url:
+                    evidence.append({"source": t, "url": url})
+                break
+    return evidence
+
+
+# Instance globale
+evidence_registry = EvidenceRegistry()
+evidence_registry.register(EvidenceSource(
+    "nvd_references", "evidence:nvd_reference_evidence", cost="free", ttl=0, signals_exploit=False,
+))
+evidence_registry.register(EvidenceSource(
+    "exploit_db", "evidence_exploitdb:search_exploit_db", cost="cheap", concurrency=16, timeout=5.0, ttl=3600,
+))
+evidence_registry.register(EvidenceSource(
+    "github", "evidence_github:fetch_github_pocs", cost="expensive", concurrency=8, timeout=30.0, ttl=1800,
+    requires=("GITHUB_TOKEN",),
+))
+evidence_registry.register(EvidenceSource(
+    "reddit", "evidence_reddit:fetch_reddit_posts", cost="expensive", concurrency=8, timeout=15.0, ttl=1800,
+    requires=("REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET"),
+))
@@ -0,0 +1,33 @@
+import httpx
+
+from metrics import track_upstream
+
+EXPLOIT_DB_SEARCH = "https://www.exploit-db.com/search"
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Client partagé : contexte TLS et connexions réutilisés d'un CVE à l'autre"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=5.0)
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def search_exploit_db(cve_obj) -> list:
+    """Présence du CVE dans la recherche Exploit-DB"""
+    exploit_query = cve_obj.id.upper().replace("CVE-", "", 1)
+    exploit_url = f"{EXPLOIT_DB_SEARCH}?cve={exploit_query}"
+    with track_upstream("exploit_db"):
+        r = await get_client().get(exploit_url)
+    if r.status_code == 200 and exploit_query in r.text:
+        return [{"source": "Exploit-DB", "url": exploit_url}]
+    return []
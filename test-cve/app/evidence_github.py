@@ -0,0 +1,78 @@
+import os
+from typing import Dict, List
+
+import httpx
+
+from metrics import track_upstream
+
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_API = "https://api.github.com"
+
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Client partagé : contexte TLS et connexions réutilisés d'un CVE à l'autre"""
+    global _client
+    if _client is None:
+        headers = {"Accept": "application/vnd.github.v3.star+json"}
+        if GITHUB_TOKEN:
+            headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+        _client = httpx.AsyncClient(timeout=15.0, headers=headers)
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_github_pocs(cve_obj, max_results: int = 5) -> List[Dict]:
+    """Chercher des PoC sur GitHub (dépôts puis issues/PR)"""
+    cve_id = cve_obj.id
+    client = get_client()
+
+    results = []
+    # Une réponse en erreur (limite de débit...) lève : le résultat partiel n'est pas mis en cache
+    # 1) Search repositories
+    q_repo = f'{cve_id} in:name,description'
+    with track_upstream("github"):
+        r_repo = await client.get(f"{GITHUB_API}/search/repositories", params={"q": q_repo, "per_page": max_results})
+        r_repo.raise_for_status()
+    for item in r_repo.json().get("items", [])[:max_results]:
+        results.append({
+            "source": "GitHub-POC",
+            "url": item.get("html_url"),
+            "stars": item.get("stargazers_count"),
+            "created_at": item.get("created_at"),
+            "type": "repo",
+            "name": item.get("full_name")
+        })
+
+    # 2) Search issues/PRs
+    q_issue = f'{cve_id} in:title,body'
+    with track_upstream("github"):
+        r_issue = await client.get(f"{GITHUB_API}/search/issues", params={"q": q_issue, "per_page": max_results})
+        r_issue.raise_for_status()
+    for it in r_issue.json().get("items", [])[:max_results]:
+        results.append({
+            "source": "GitHub-POC",
+            "url": it.get("html_url"),
+            "stars": None,
+            "created_at": it.get("created_at"),
+            "type": "issue",
+            "title": it.get("title")
+        })
+
+    # Dédupliquer
+    seen = set()
+    deduped = []
+    for r in results:
+        u = r.get("url")
+        if u and u not in seen:
+            seen.add(u)
+            deduped.append(r)
+    return deduped
@@ -0,0 +1,38 @@
+import os
+
+import asyncpraw
+
+from metrics import track_upstream
+
+REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
+REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
+REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT")
+
+
+async def fetch_reddit_posts(cve_obj, limit: int = 5) -> list[dict]:
+    """Posts r/netsec mentionnant le CVE"""
+    reddit = asyncpraw.Reddit(
+        client_id=REDDIT_CLIENT_ID,
+        client_secret=REDDIT_CLIENT_SECRET,
+        user_agent=REDDIT_USER_AGENT
+    )
+
+    evidence = []
+    query = cve_obj.id.upper()
+    try:
+        with track_upstream("reddit"):
+            subreddit = await reddit.subreddit("netsec", fetch=True)
+            async for submission in subreddit.search(query, limit=limit):
+                evidence.append({
+                    "source": "Reddit",
+                    "url": submission.url,
+                    "permalink": f"https://reddit.com{submission.permalink}",
+                    "score": submission.score,
+                    "nbr_comment": submission.num_comments,
+                    "title": submission.title,
+                    "created_utc": submission.created_utc
+                })
+    finally:
+        await reddit.close()
+
+    return evidence
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+
+from app_logging import logger
+from cpe_match import sync_cpe_index
+from epss_table import epss_table
+from kev_index import kev_membership
+from leader import leader
+from text_index import sync_index
+
+
+class HotDataSync:
+    """
+    Données chaudes partagées entre workers : le leader rafraîchit le catalogue KEV et la table EPSS
+    puis publie leurs instantanés ; chaque worker projette les dernières générations publiées et
+    applique à ses index plein texte et CPE les documents écrits ailleurs (journal index_updates).
+    """
+
+    def __init__(self):
+        self.kev_interval = int(os.getenv("KEV_REFRESH_INTERVAL", 1800))  # < TTL du catalogue (1h)
+        self.epss_interval = int(os.getenv("EPSS_TABLE_INTERVAL", 6 * 3600))  # fichier publié une fois par jour
+        self.sync_interval = int(os.getenv("SNAPSHOT_SYNC_INTERVAL", 10))
+        self.retry_interval = int(os.getenv("HOT_DATA_RETRY_INTERVAL", 300))  # après un échec de rafraîchissement
+        self.fetch_kev_catalog = None
+        self.last_kev = 0.0
+        self.last_epss = 0.0
+        self.task: asyncio.Task | None = None
+
+    def restore(self) -> bool:
+        """
+        Démarrage : projeter les derniers instantanés locaux sans attendre Redis ni le réseau.
+        Les sources ne sont retéléchargées qu'une fois leur instantané échu.
+        """
+        kev = kev_membership.restore()
+        if kev:
+            self.last_kev = time.time() - (kev_membership.follower.age() or self.kev_interval)
+        if epss_table.enabled and epss_table.restore():
+            self.last_epss = time.time() - (epss_table.follower.age() or self.epss_interval)
+        return kev
+
+    async def refresh(self):
+        """Leader : rafraîchir les sources échues et publier les instantanés qui ont changé"""
+        now = time.time()
+        if now - self.last_kev >= self.kev_interval:
+            try:
+                catalog = await self.fetch_kev_catalog(force_refresh=True)
+                version = (catalog.get("catalogVersion"), len(catalog.get("vulnerabilities", [])))
+                if kev_membership.follower.snapshot is None or version != kev_membership.version:
+                    await kev_membership.publish_snapshot(catalog)
+                self.last_kev = now
+            except Exception as e:
+                logger.warning("Erreur rafraîchissement KEV partagé: %s", e)
+                self.last_kev = now - self.kev_interval + self.retry_interval
+        if epss_table.enabled and now - self.last_epss >= self.epss_interval:
+            try:
+                await epss_table.refresh()
+                self.last_epss = now
+            except Exception as e:
+                logger.warning("Erreur téléchargement de la table EPSS: %s", e)
+                self.last_epss = now - self.epss_interval + self.retry_interval
+
+    async def run_cycle(self):
+        if leader.is_leader:
+            await self.refresh()
+        await kev_membership.sync()
+        if epss_table.enabled:
+            await epss_table.sync()
+        await sync_index()
+        await sync_cpe_index()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.warning("Erreur synchronisation des données partagées: %s", e)
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self, fetch_kev_catalog):
+        self.fetch_kev_catalog = fetch_kev_catalog
+        if self.task is None:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def freshness(self) -> dict:
+        """Disponibilité et âge des données chaudes (sonde de disponibilité)"""
+        kev_age = kev_membership.follower.age()
+        epss_age = epss_table.follower.age()
+        return {
+            "kev": {
+                "available": len(kev_membership) > 0,
+                "catalogVersion": kev_membership.meta.get("catalogVersion"),
+                "ageSeconds": round(kev_age) if kev_age is not None else None,
+                "stale": kev_age is not None and kev_age > 2 * self.kev_interval,
+            },
+            "epss": {
+                "available": len(epss_table) > 0,
+                "scoreDate": epss_table.meta.get("score_date"),
+                "ageSeconds": round(epss_age) if epss_age is not None else None,
+                "stale": epss_age is not None and epss_age > 2 * self.epss_interval,
+            },
+        }
+
+    def stats(self) -> dict:
+        return {
+            "kevGeneration": kev_membership.follower.generation,
+            "epssGeneration": epss_table.follower.generation,
+            "epssScoreDate": epss_table.meta.get("score_date"),
+            "epssCount": len(epss_table),
+        }
+
+
+# Instance globale
+hot_data = HotDataSync()
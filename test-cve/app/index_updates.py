@@ -0,0 +1,29 @@
+"""
+Journal des écritures des index en mémoire (plein texte, CPE) : chaque écriture persistée ajoute
+les identifiants concernés à un stream Redis, que tous les workers relisent à chaque cycle de
+hot_data pour appliquer les documents écrits ailleurs (autre worker, ingestion hors ligne).
+"""
+import os
+import time
+
+from leader import leader
+from redis_client import redis_client
+
+UPDATES_RETENTION = int(os.getenv("INDEX_UPDATES_RETENTION", 86400))  # secondes de journal conservées
+
+
+async def publish_updates(stream_key: str, doc_ids: list) -> None:
+    """Journaliser les identifiants écrits par ce processus"""
+    if doc_ids:
+        minid = f"{int((time.time() - UPDATES_RETENTION) * 1000)}-0"
+        await redis_client.xadd_json_many(stream_key, [{"worker": leader.worker_id, "ids": doc_ids}], minid=minid)
+
+
+async def read_updates(stream_key: str, cursor: str, count: int) -> tuple:
+    """
+    Identifiants écrits par les autres processus après cursor (au plus `count` entrées du journal) :
+    (identifiants, nouveau curseur). Les écritures de ce worker sont déjà appliquées en mémoire.
+    """
+    rows = await redis_client.xrange_json(stream_key, f"({cursor}", "+", count=count)
+    ids = list(dict.fromkeys(i for _, entry in rows if entry.get("worker") != leader.worker_id for i in entry["ids"]))
+    return ids, rows[-1][0] if rows else cursor
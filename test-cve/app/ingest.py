@@ -0,0 +1,188 @@
+"""
+Ingestion hors ligne des fichiers de données NVD 2.0 (JSON, .json.gz ou .json.zip).
+
+Les CVE sont lus un par un par un parseur incrémental (mémoire bornée par la taille d'un lot)
+puis écrits dans Redis par lots :
+- JSON brut (cve_advisory:nvd_raw:{id}), relu par la recherche et la consultation groupée,
+  conservé sans expiration sauf INGEST_TTL explicite
+- documents de l'index plein texte et critères CPE, chargés par l'API au démarrage, et la couverture
+  (dates de publication ingérées) qui permet à la recherche par mot-clé de s'y fier (keyword_source=auto)
+- avec --enrich : document enrichi par la transformation existante (KEV, EPSS, exploits, scoring),
+  ENRICH_CONCURRENCY CVE à la fois, écrit dans le magasin normalisé (cve_store) partagé par toutes les réponses (nécessite l'accès réseau aux sources d'enrichissement)
+
+Usage : python ingest.py nvdcve-2.0-2023.json.gz nvdcve-2.0-2024.json.gz [--kev kev.json]
+"""
+import argparse
+import asyncio
+import gzip
+import io
+import json
+import os
+import time
+import zipfile
+
+from cache_utils import cache_manager
+from cpe_match import store_cpe_entries
+from cve_store import cve_store
+from nvd_api import convert_raw
+from redis_client import redis_client
+from text_index import record_coverage, store_documents
+
+CHUNK_SIZE = 1 << 20  # caractères lus à chaque remplissage du tampon
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 500))
+# JSON brut ingéré conservé sans expiration (corpus de référence) ; INGEST_TTL > 0 pour le faire expirer
+INGEST_TTL = int(os.getenv("INGEST_TTL", 0))
+# --enrich : CVE enrichis simultanément (chaque enrichissement interroge EPSS, GitHub, Reddit, ...)
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", 8))
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def open_data_file(path: str) -> io.TextIOBase:
+    """Ouvrir un fichier NVD en texte, qu'il soit brut, gzip ou zip (premier membre .json)"""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if magic == b"PK\x03\x04":
+        archive = zipfile.ZipFile(path)
+        member = next(n for n in archive.namelist() if n.endswith(".json"))
+        return io.TextIOWrapper(archive.open(member), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_vulnerabilities(stream: io.TextIOBase, chunk_size: int = CHUNK_SIZE):
+    """
+    Parcourir le tableau "vulnerabilities" d'un document NVD 2.0 élément par élément.
+    Seul l'élément en cours de décodage (et le reste du morceau lu) est gardé en mémoire.
+    """
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    # Avancer jusqu'à l'ouverture du tableau "vulnerabilities"
+    while True:
+        start = buffer.find('"vulnerabilities"', pos)
+        if start >= 0:
+            bracket = buffer.find("[", start)
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+            pos = start
+        else:
+            pos = max(pos, len(buffer) - len('"vulnerabilities"'))
+        if not fill():
+            raise ValueError("Tableau 'vulnerabilities' introuvable")
+
+    while True:
+        # Séparateurs entre éléments
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ",":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                break
+        if pos >= len(buffer):
+            raise ValueError("Fin de fichier inattendue dans 'vulnerabilities'")
+        if buffer[pos] == "]":
+            return
+
+        # Décoder un élément complet, en relisant tant qu'il est tronqué
+        while True:
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+        pos = end
+        yield item.get("cve", item)
+
+
+def iter_batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ingest_batch(raws: list, kev_map: dict = None, enrich: bool = False) -> int:
+    """Écrire un lot de CVE bruts : JSON brut, documents d'index, puis documents enrichis (optionnel)"""
+    cves = [convert_raw(raw) for raw in raws]
+    await cache_manager.set_cached_many({f"cve_advisory:nvd_raw:{raw['id']}": raw for raw in raws}, ttl=INGEST_TTL or None)
+    await store_documents(cves)
+    await store_cpe_entries(cves)
+
+    if enrich:
+        # Import tardif : la transformation et ses sources d'enrichissement vivent dans l'application
+        from main import cve_to_dict_full
+
+        semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+        async def enrich_one(cve):
+            async with semaphore:
+                return await cve_to_dict_full(cve, kev_map)
+
+        docs = await asyncio.gather(*(enrich_one(cve) for cve in cves))
+        await cve_store.put_many(list(docs))
+    return len(cves)
+
+
+async def ingest_files(paths: list, kev_path: str = None, enrich: bool = False,
+                       batch_size: int = INGEST_BATCH_SIZE) -> int:
+    await redis_client.connect()
+
+    kev_map = None
+    if kev_path:
+        with open_data_file(kev_path) as f:
+            kev_map = {v["cveID"]: v for v in json.load(f).get("vulnerabilities", [])}
+    elif enrich:
+        from main import fetch_kev_catalog
+        kev_map = {v["cveID"]: v for v in (await fetch_kev_catalog()).get("vulnerabilities", [])}
+
+    total = 0
+    published = set()  # dates de publication ingérées : couverture de l'index plein texte
+    started = time.perf_counter()
+    for path in paths:
+        count = 0
+        with open_data_file(path) as stream:
+            for raws in iter_batches(iter_vulnerabilities(stream), batch_size):
+                count += await ingest_batch(raws, kev_map, enrich)
+                published.update(raw["published"][:10] for raw in raws if raw.get("published"))
+        total += count
+        print(f"✅ {path} : {count} CVE ingérés")
+    coverage = await record_coverage(published)
+    print(f"✅ Index plein texte couvrant les publications du {coverage.get('from')} au {coverage.get('to')}")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Ingestion terminée : {total} CVE en {elapsed:.1f} s ({total / max(elapsed, 1e-9):.0f} CVE/s)")
+    await redis_client.disconnect()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion hors ligne des fichiers de données NVD 2.0")
+    parser.add_argument("files", nargs="+", help="Fichiers NVD 2.0 (.json, .json.gz, .json.zip)")
+    parser.add_argument("--kev", help="Catalogue KEV local pour --enrich (sinon téléchargé)")
+    parser.add_argument("--enrich", action="store_true", help="Produire aussi les documents enrichis (réseau requis)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="CVE écrits par lot")
+    args = parser.parse_args()
+    asyncio.run(ingest_files(args.files, args.kev, args.enrich, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import json
+
+import numpy as np
+
+from app_logging import logger
+from snapshots import Snapshot, SnapshotFollower, publish
+
+CVE_NUMBER_SPAN = 10 ** 9  # numéro de séquence CVE (au plus 9 chiffres) sous l'année
+
+
+def encode_cve_id(cve_id: str) -> int:
+    """CVE-2021-44228 -> 2021 * 10^9 + 44228 ; -1 si l'identifiant est invalide"""
+    try:
+        if cve_id[:4] != "CVE-":
+            cve_id = cve_id.strip().upper()
+            if cve_id[:4] != "CVE-":
+                return -1
+        number = int(cve_id[9:])
+        if cve_id[8] != "-" or not 0 <= number < CVE_NUMBER_SPAN:
+            return -1
+        return int(cve_id[4:8]) * CVE_NUMBER_SPAN + number
+    except (ValueError, IndexError, TypeError, AttributeError):
+        return -1
+
+
+class KevMembership:
+    """
+    Appartenance au catalogue KEV : identifiants encodés en entiers dans un tableau trié,
+    interrogé par recherche dichotomique vectorisée. Reconstruit à chaque changement de catalogue.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.codes = np.empty(0, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int64)  # position dans catalog["vulnerabilities"]
+        self.vulnerabilities: list = []
+        self.meta: dict = {}  # catalogVersion, dateReleased du catalogue indexé
+        self.follower = SnapshotFollower("kev")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def ensure(self, catalog: dict) -> None:
+        """Reconstruire la structure si la version du catalogue a changé"""
+        version = (catalog.get("catalogVersion"), len(catalog.get("vulnerabilities", [])))
+        if version == self.version:
+            return
+        vulns = catalog.get("vulnerabilities", [])
+        self.codes, self.rows = self._build(vulns)
+        self.vulnerabilities = vulns
+        self.version = version
+        self.meta = {"catalogVersion": catalog.get("catalogVersion"), "dateReleased": catalog.get("dateReleased")}
+        logger.info("Index d'appartenance KEV reconstruit (%s entrées)", len(vulns))
+
+    @staticmethod
+    def _build(vulns: list) -> tuple:
+        codes = np.array([encode_cve_id(v.get("cveID", "")) for v in vulns], dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+        return codes[order], order
+
+    # --- Instantané partagé entre workers ---
+    async def publish_snapshot(self, catalog: dict) -> None:
+        """Leader : publier l'index et les entrées du catalogue (JSON par entrée) en instantané"""
+        vulns = catalog.get("vulnerabilities", [])
+        if not vulns:
+            return
+        codes, rows = self._build(vulns)
+        encoded = [json.dumps(v, separators=(",", ":")).encode() for v in vulns]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        await publish(
+            "kev",
+            {"codes": codes, "rows": rows, "offsets": offsets},
+            {"entries": b"".join(encoded)},
+            {"catalogVersion": catalog.get("catalogVersion"), "dateReleased": catalog.get("dateReleased"),
+             "count": len(vulns)},
+        )
+        await self.sync()
+
+    def attach(self, snapshot: Snapshot) -> None:
+        meta = snapshot.meta
+        self.codes = snapshot.arrays["codes"]
+        self.rows = snapshot.arrays["rows"]
+        self.vulnerabilities = SnapshotRows(snapshot.blobs["entries"], snapshot.arrays["offsets"])
+        self.version = (meta["catalogVersion"], meta["count"])
+        self.meta = {"catalogVersion": meta["catalogVersion"], "dateReleased": meta.get("dateReleased")}
+
+    def restore(self) -> bool:
+        """Démarrage : projeter la dernière génération locale (quelques millisecondes)"""
+        snapshot = self.follower.restore()
+        if snapshot is not None:
+            self.attach(snapshot)
+        return snapshot is not None
+
+    async def sync(self) -> bool:
+        """Projeter la dernière génération publiée ; True si un instantané est attaché"""
+        snapshot = await self.follower.poll()
+        if snapshot is not None:
+            self.attach(snapshot)
+        return self.follower.snapshot is not None
+
+    def check(self, cve_ids: list) -> np.ndarray:
+        """Position dans le catalogue de chaque identifiant, -1 si absent"""
+        queries = np.array([encode_cve_id(c) for c in cve_ids], dtype=np.int64)
+        if not len(self.codes):
+            return np.full(len(queries), -1, dtype=np.int64)
+        pos = np.searchsorted(self.codes, queries)
+        pos = np.minimum(pos, len(self.codes) - 1)
+        found = (self.codes[pos] == queries) & (queries >= 0)
+        return np.where(found, self.rows[pos], -1)
+
+    def lookup(self, cve_id: str) -> list:
+        """Entrées KEV d'un identifiant (liste vide si absent)"""
+        code = encode_cve_id(cve_id)
+        if code < 0:
+            return []
+        start, end = np.searchsorted(self.codes, [code, code + 1])
+        return [self.vulnerabilities[i] for i in self.rows[start:end]]
+
+
+class SnapshotRows:
+    """Entrées du catalogue stockées en JSON dans un bloc projeté en mémoire, décodées à la demande"""
+
+    def __init__(self, blob, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i) -> dict:
+        return json.loads(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+
+# Instance globale
+kev_membership = KevMembership()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import socket
+import uuid
+
+from app_logging import logger
+from redis_client import redis_client
+
+LEADER_KEY = "cve_advisory:leader"
+
+
+class LeaderElection:
+    """
+    Élection d'un processus leader parmi les workers via un verrou Redis à expiration.
+    Seul le leader exécute les rafraîchissements (KEV, EPSS, pré-chauffage, rollups, journal des
+    changements) ; s'il disparaît, le verrou expire et un autre worker prend le relais.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("LEADER_ELECTION_ENABLED", "true").lower() == "true"
+        self.ttl = int(os.getenv("LEADER_LOCK_TTL", 30))  # secondes avant reprise par un autre worker
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Sans élection : processus unique, toujours leader
+        self.is_leader = not self.enabled
+        self.task: asyncio.Task | None = None
+
+    async def campaign(self) -> bool:
+        """Acquérir ou prolonger le verrou ; retourne le statut de leader"""
+        if not self.enabled:
+            return True
+        # Prolonger le verrou s'il est à notre nom, sinon le prendre s'il est libre (expiré ou perdu)
+        held = (await redis_client.expire_if_owner(LEADER_KEY, self.worker_id, self.ttl)
+                or await redis_client.set_if_absent(LEADER_KEY, self.worker_id, self.ttl))
+        if held != self.is_leader:
+            status = "élu leader" if held else "n'est plus leader"
+            logger.info("Worker %s %s", self.worker_id, status)
+        self.is_leader = held
+        return held
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self.campaign()
+            except Exception as e:
+                logger.warning("Erreur élection du leader: %s", e)
+
+    async def start(self) -> bool:
+        """Première candidature (attendue : le démarrage en dépend), puis renouvellement périodique"""
+        await self.campaign()
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._loop())
+        return self.is_leader
+
+    async def stop(self):
+        """Arrêter le renouvellement et libérer le verrou pour une reprise immédiate"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.enabled and self.is_leader:
+            await redis_client.delete_if_owner(LEADER_KEY, self.worker_id)
+            self.is_leader = False
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "workerId": self.worker_id, "isLeader": self.is_leader}
+
+
+# Instance globale
+leader = LeaderElection()
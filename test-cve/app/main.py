@@ -1,19 +1,52 @@
-from fastapi import FastAPI, Query, HTTPException
-from nvdlib import searchCVE,searchCVE_V2
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from nvdlib import searchCVE
 from datetime import datetime, timedelta, timezone
 import requests
 import httpx
 import os
+import base64
+import hashlib
+import json
+import re
+import time
 
 import asyncio
 from typing import Optional
 
-from typing import List, Dict
-import asyncpraw
+from typing import List
+import numpy as np
 
 # Import des modules Redis
 from redis_client import redis_client
-from cache_utils import cache_manager, simple_cached
+from cache_utils import (
+    cache_manager, simple_cached, access_tracker, http_validators, degraded_sources, mark_degraded, UpstreamError
+)
+from prewarm import cache_prewarmer
+from cache_budget import cache_budgets
+from stats_engine import compute_window_stats, fetch_epss_scores
+from rollups import rollup_store, window_start
+from records import expand_wire
+from cve_store import DocumentRefs, cve_store
+from recent_days import RECENT_TODAY_TTL, recent_partitions
+from nvd_api import fetch_all_cves, fetch_cve_page, convert_raw
+from text_index import text_index, ingest_cves, ingest_kev, load_index
+from cpe_match import cpe_index, ingest_cpe, load_cpe_index, parse_cpe
+from kev_index import kev_membership
+from epss_table import epss_table
+from leader import leader
+from hot_data import hot_data
+from evidence import evidence_max_cost, evidence_registry
+from changes import change_feed
+from app_logging import logger, setup_logging
+from upstream_archive import upstream_archive
+from timing import RequestTiming, SERVER_TIMING_ENABLED, request_timing, stage, timed
+from metrics import (
+    enrichment_in_flight, http_request_duration, track_in_flight, track_upstream
+)
+from types import SimpleNamespace
+from worker_metrics import worker_metrics
 
 app = FastAPI(
     title="CVE Advisory API",
@@ -24,33 +57,154 @@ app = FastAPI(
 )
 
 # Configuration
-REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
-REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
-REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT")
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-GITHUB_API = "https://api.github.com"
 KEV_URL = "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json"
 API_KEY = os.getenv("API_KEY")
 DEFAULT_DAYS = 30
-EXPLOIT_DB_SEARCH = "https://www.exploit-db.com/search"
 
-# Whitelist des tags NVD
-EXPLOIT_TAG_WHITELIST = {"exploit", "patch", "issue tracking", "issue-tracking", "issue"}
+# Recherche filtrée : taille des pages NVD parcourues et nombre max de candidats examinés par requête
+SEARCH_SCAN_PAGE = 200
+SEARCH_MAX_SCAN = 2000
+# Filtre exploit : détections simultanées au plus
+SEARCH_EXPLOIT_CONCURRENCY = int(os.getenv("SEARCH_EXPLOIT_CONCURRENCY", 8))
+
+# Correspondance d'inventaire : nombre max de CPE installées par requête
+INVENTORY_MAX_CPES = int(os.getenv("INVENTORY_MAX_CPES", 10000))
+
+# Consultation groupée : nombre max d'identifiants et de requêtes NVD simultanées
+CVE_BATCH_MAX = int(os.getenv("CVE_BATCH_MAX", 5000))
+CVE_BATCH_CONCURRENCY = int(os.getenv("CVE_BATCH_CONCURRENCY", 8))
+CVE_ID_RE = re.compile(r"^CVE-\d{4}-\d{4,}$")
+
+# Vérification d'appartenance KEV : nombre max d'identifiants par requête
+KEV_CHECK_MAX = int(os.getenv("KEV_CHECK_MAX", 200000))
+
+setup_logging()
+
+# Requêtes conditionnelles (ETag / Last-Modified) sur les endpoints en cache
+@app.middleware("http")
+async def conditional_requests(request: Request, call_next):
+    """Exposer les en-têtes conditionnels à simple_cached et ajouter ses validateurs à la réponse"""
+    headers = {k: request.headers[k] for k in ("if-none-match", "if-modified-since") if k in request.headers}
+    ctx = {
+        "scope": request.scope,
+        "headers": headers,
+        "conditional": bool(headers) and request.method in ("GET", "HEAD"),
+        "response_headers": None,
+    }
+    degraded = set()
+    token = http_validators.set(ctx)
+    degraded_token = degraded_sources.set(degraded)
+    try:
+        response = await call_next(request)
+    finally:
+        http_validators.reset(token)
+        degraded_sources.reset(degraded_token)
+    if ctx["response_headers"] and response.status_code == 200:
+        response.headers.update(ctx["response_headers"])
+    # Réponse calculée avec un repli (source externe en erreur)
+    if degraded:
+        response.headers["X-Degraded-Sources"] = ",".join(sorted(degraded))
+    return response
+
+@app.middleware("http")
+async def evidence_cost(request: Request, call_next):
+    """Classe de coût maximale des sources de preuves d'exploit pour cet endpoint (EVIDENCE_MAX_COST_BY_PATH)"""
+    if not evidence_registry.cost_by_path:
+        return await call_next(request)
+    token = evidence_max_cost.set(evidence_registry.max_cost_for(request.url.path))
+    try:
+        return await call_next(request)
+    finally:
+        evidence_max_cost.reset(token)
+
+# Chronométrage par étape (SERVER_TIMING_ENABLED) : en-tête Server-Timing, détail par CVE avec ?debug=timing
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    if not SERVER_TIMING_ENABLED:
+        return await call_next(request)
+    debug = request.query_params.get("debug") == "timing"
+    timing = RequestTiming(per_cve=debug)
+    token = request_timing.set(timing)
+    try:
+        response = await call_next(request)
+    finally:
+        request_timing.reset(token)
+
+    if debug and response.headers.get("content-type", "").startswith("application/json"):
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            payload["timing"] = timing.report()
+            body = json.dumps(payload, default=str).encode()
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-length", "etag")}
+        response = Response(body, status_code=response.status_code, headers=headers, media_type="application/json")
+    response.headers["Server-Timing"] = timing.server_timing()
+    return response
+
+# Latence par route (gabarit de chemin, pas l'URL, pour borner le nombre de séries)
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - start,
+            route=getattr(route, "path", "unmatched"), method=request.method, status=str(status),
+        )
 
 # Events de démarrage/arrêt
+startup_state = {"startedAt": time.time(), "backgroundReady": False, "task": None}
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialiser Redis et précharger les données au démarrage"""
+    """Servir immédiatement depuis les instantanés locaux ; élection et rafraîchissements en arrière-plan"""
     await redis_client.connect()
-    await preload_kev_cache()
+    if hot_data.restore():
+        logger.info("Données chaudes restaurées depuis le disque (KEV %s)", kev_membership.meta.get('catalogVersion'))
+    else:
+        logger.info("Aucun instantané local : données chaudes chargées en arrière-plan")
     #await preload_recent_cves_cache()
-    print("✅ Application démarrée avec Redis")
+    startup_state["task"] = asyncio.create_task(start_background_services())
+    asyncio.create_task(load_index())
+    asyncio.create_task(load_cpe_index())
+    logger.info("Application démarrée avec Redis")
+
+async def start_background_services():
+    """Élection du leader puis tâches de fond (les cycles de rafraîchissement en dépendent)"""
+    try:
+        await leader.start()
+        hot_data.start(fetch_kev_catalog)
+        cache_prewarmer.start()
+        cache_budgets.start()
+        rollup_store.start(fetch_kev_catalog)
+        change_feed.start(fetch_nvd_page)
+        worker_metrics.start()
+        startup_state["backgroundReady"] = True
+    except Exception as e:
+        logger.warning("Erreur démarrage des tâches de fond: %s", e)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Fermer les connexions à l'arrêt"""
+    if startup_state["task"]:
+        startup_state["task"].cancel()
+    await cache_prewarmer.stop()
+    await cache_budgets.stop()
+    await rollup_store.stop()
+    await change_feed.stop()
+    await hot_data.stop()
+    await worker_metrics.stop()
+    await leader.stop()
+    await evidence_registry.close()
     await redis_client.disconnect()
-    print("🔴 Application arrêtée")
+    if upstream_archive:
+        upstream_archive.close()
+    logger.info("Application arrêtée")
 
 
 
@@ -58,103 +212,42 @@ async def shutdown_event():
 # --- Préchargement des CVE récents Gestion du preload cves ( 2000 data ) ---
 
 async def preload_recent_cves_cache():
-    """Précharger les CVE des 30 derniers jours avec limite 2000"""
+    """Précharger les partitions journalières des 30 derniers jours (limite 2000)"""
     try:
-        print("🔄 Préchargement des CVE récents (30 jours, limite 2000)...")
-        
-        # Calcul des dates
-        end_date = datetime.now(timezone.utc)
-        start_date = end_date - timedelta(days=30)
-        
-        # Recherche des CVE
-        results = searchCVE(
-            pubStartDate=start_date, 
-            pubEndDate=end_date, 
-            key=API_KEY, 
-            limit=2000
-        )
-        
-        # Transformation des CVE
-        cves_output = [await cve_to_dict_full(cve) for cve in results]
-        
-        # Mise en cache
-        cache_key = "cve_advisory:recent_cves:30:2000"
-        await cache_manager.set_cached_data(cache_key, cves_output, ttl=3600)
-        
-        print(f"✅ CVE récents préchargés ({len(cves_output)} CVE mis en cache)")
-        return cves_output
-        
+        logger.info("Préchargement des CVE récents (30 jours, limite 2000)...")
+        window = await fetch_recent_cves_with_cache(2000, 30)
+        logger.info("CVE récents préchargés (%s CVE mis en cache)", window['total'])
+        return window["cves"]
     except Exception as e:
-        print(f"⚠️ Erreur lors du préchargement des CVE récents: {e}")
-        # Essayer de récupérer du cache même en cas d'erreur
-        try:
-            cached_data = await cache_manager.get_cached_data("cve_advisory:recent_cves:30:2000")
-            if cached_data:
-                print("✅ Récupération des CVE récents depuis le cache de secours")
-                return cached_data
-        except:
-            pass
+        logger.warning("Erreur lors du préchargement des CVE récents: %s", e)
         return []
 
 # --- Recherche des CVE récents avec cache ---
-async def fetch_recent_cves_with_cache(limit: int, days: int) -> dict:
-    """Récupérer les CVE récents avec gestion du cache Redis"""
-    cache_key = f"cve_advisory:recent_cves:{days}:{limit}"
-    
-    # Vérifier le cache d'abord
-    cached_data = await cache_manager.get_cached_data(cache_key)
-    if cached_data:
-        print(f"✅ CVE récents chargés depuis le cache (jours={days}, limite={limit})")
-        return cached_data
-    
-    # Si pas en cache, exécuter la recherche
-    print(f"🔄 Recherche des CVE récents (jours={days}, limite={limit})...")
-    
-    start = datetime.now(timezone.utc) - timedelta(days=days)
-    end = datetime.now(timezone.utc)
-
+async def fetch_recent_cves_with_cache(limit: int, days: int, force_refresh: bool = False, compact: bool = False) -> dict:
+    """
+    Récupérer les CVE récents : fenêtre assemblée depuis les partitions journalières en cache
+    (seuls les jours absents sont demandés à NVD), documents enrichis lus dans le magasin normalisé
+    """
+    logger.debug("CVE récents (jours=%s, limite=%s)", days, limit)
     try:
-        # Charger KEV une seule fois pour tous les CVE
-        kev_data = await fetch_kev_catalog()
-        kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
-        
-        results = searchCVE(pubStartDate=start, pubEndDate=end, key=API_KEY, limit=limit)
-        
-        # Transformer tous les CVE avec le même kev_map
-        cves_output = []
-        for cve in results:
-            cve_data = await cve_to_dict_full(cve, kev_map)
-            cves_output.append(cve_data)
-        
-        response_data = {
-            "total": len(cves_output),
+        start, end, entries = await recent_partitions.window(days, limit, force_refresh)
+        # Documents expirés recalculés depuis le JSON brut conservé avec les partitions
+        ids = [cve_id for cve_id, _ in entries]
+        cves, _ = await cve_store.assemble(ids, compact, rebuild_max=len(ids))
+        if cves is None:
+            raise HTTPException(status_code=500, detail="Documents des CVE récents indisponibles")
+        return {
+            "total": len(cves),
             "startDate": start.isoformat(),
             "endDate": end.isoformat(),
-            "cves": cves_output
+            "cves": cves
         }
-        
-        # Mettre en cache pour 1 heure
-        await cache_manager.set_cached_data(cache_key, response_data, ttl=3600)
-        
-        print(f"✅ Recherche CVE récents terminée ({len(cves_output)} CVE trouvés et mis en cache)")
-        return response_data
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Erreur lors de la recherche des CVE récents: {e}")
-        
-        # Fallback sur le préchargement si les paramètres correspondent
-        if days == 30 and limit == 2000:
-            cached_preload = await cache_manager.get_cached_data("cve_advisory:recent_cves:30:2000")
-            if cached_preload:
-                print("✅ Utilisation des CVE préchargés comme fallback")
-                return {
-                    "total": len(cached_preload),
-                    "startDate": (datetime.now(timezone.utc) - timedelta(days=30)).isoformat(),
-                    "endDate": datetime.now(timezone.utc).isoformat(),
-                    "cves": cached_preload
-                }
-        
+        logger.error("Erreur lors de la recherche des CVE récents: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des CVE récents: {e}")
+
 # --- Gestion du cache KEV ---
 async def fetch_kev_catalog(force_refresh: bool = False) -> dict:
     """Récupérer le catalogue KEV avec cache Redis"""
@@ -162,232 +255,84 @@ async def fetch_kev_catalog(force_refresh: bool = False) -> dict:
     
     if not force_refresh:
         cached_data = await cache_manager.get_cached_data(cache_key)
+        access_tracker.record(
+            cache_key, lambda: fetch_kev_catalog(force_refresh=True), 3600, hit=bool(cached_data),
+            writes_cache=True
+        )
         if cached_data:
-            print(f"✅ KEV chargé depuis le cache ({len(cached_data.get('vulnerabilities', []))} vulnérabilités)")
+            logger.debug("KEV chargé depuis le cache (%s vulnérabilités)", len(cached_data.get('vulnerabilities', [])))
             return cached_data
 
     try:
-        print("🔄 Téléchargement du catalogue KEV...")
+        logger.info("Téléchargement du catalogue KEV...")
         async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get(KEV_URL)
+            with track_upstream("kev"):
+                resp = await client.get(KEV_URL)
             resp.raise_for_status()
             data = resp.json()
             
             # Stocker dans Redis
             await cache_manager.set_cached_data(cache_key, data, ttl=3600)
-            print(f"✅ KEV téléchargé et mis en cache ({len(data.get('vulnerabilities', []))} vulnérabilités)")
+
+            # Indexer les champs texte KEV si le catalogue a changé
+            if data.get("catalogVersion") != text_index.kev_version:
+                await ingest_kev(data.get("vulnerabilities", []))
+                text_index.kev_version = data.get("catalogVersion")
+            await change_feed.observe_kev(data)
+            logger.info("KEV téléchargé et mis en cache (%s vulnérabilités)", len(data.get('vulnerabilities', [])))
             return data
     except httpx.HTTPError as e:
         # Fallback sur cache expiré si disponible
         cached_data = await cache_manager.get_cached_data(cache_key)
         if cached_data:
-            print(f"⚠️ Utilisation du cache expiré suite à erreur: {e}")
+            logger.warning("Utilisation du cache expiré suite à erreur: %s", e)
             return cached_data
-        print(f"❌ Erreur critique KEV: {e}")
+        logger.error("Erreur critique KEV: %s", e)
         raise HTTPException(status_code=502, detail=f"Impossible de récupérer le catalogue KEV: {e}")
 
-async def preload_kev_cache():
-    """Précharger le catalogue KEV au démarrage ET le mettre en cache"""
-    try:
-        print("🔄 Préchargement du catalogue KEV...")
-        # Forcer le téléchargement et la mise en cache
-        data = await fetch_kev_catalog(force_refresh=True)
-        
-        # Vérifier que les données sont bien présentes
-        vulns = data.get("vulnerabilities", [])
-        if vulns:
-            print(f"✅ KEV préchargé et mis en cache ({len(vulns)} vulnérabilités)")
-        else:
-            print("⚠️ Aucune vulnérabilité trouvée dans le catalogue KEV")
-            
-        return data
-    except Exception as e:
-        print(f"⚠️ Erreur lors du préchargement KEV: {e}")
-        # Essayer de récupérer du cache même en cas d'erreur
-        try:
-            cached_data = await cache_manager.get_cached_data("cve_advisory:kev_catalog")
-            if cached_data:
-                print("✅ Récupération depuis le cache de secours")
-                return cached_data
-        except:
-            pass
-        return {"vulnerabilities": []}
-    
-
 # --- Cache EPSS avec Redis ---
-@simple_cached(ttl=3600)
+@simple_cached(ttl=3600, is_negative=lambda epss: epss.get("epss_status") == "not_found")
 async def get_epss_data_safe(cve_id: str) -> dict:
-    """Récupérer les données EPSS avec cache Redis"""
+    """
+    Récupérer les données EPSS avec cache Redis.
+    epss_status : "ok", "not_found" (CVE non scoré, conservé plus longtemps) ou "error" (repli à 0, bref)
+    """
     url = f"https://api.first.org/data/v1/epss?cve={cve_id}"
-    epss_data = {"epss_score": 0.0, "epss_percentile": 0.0}
 
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
+        with track_upstream("epss"):
+            r = requests.get(url, timeout=10)
+            r.raise_for_status()
         data = r.json().get("data", [])
-        if data:
-            epss_score = float(data[0].get("epss") or 0)
-            epss_percentile = float(data[0].get("percentile") or 0)
-            epss_data = {"epss_score": epss_score, "epss_percentile": epss_percentile}
-    except Exception as e:
-        print(f"⚠️ Erreur récupération EPSS pour {cve_id}: {e}")
-
-    return epss_data
-
-# --- Cache GitHub avec Redis ---
-@simple_cached(ttl=1800)
-async def fetch_github_pocs(cve_id: str, max_results: int = 5) -> List[Dict]:
-    """Chercher des PoC sur GitHub avec cache Redis"""
-    if not cve_id:
-        return []
-
-    headers = {}
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-    headers["Accept"] = "application/vnd.github.v3.star+json"
-
-    results = []
-    async with httpx.AsyncClient(timeout=15.0, headers=headers) as client:
-        # 1) Search repositories
-        try:
-            q_repo = f'{cve_id} in:name,description'
-            r_repo = await client.get(f"{GITHUB_API}/search/repositories", params={"q": q_repo, "per_page": max_results})
-            if r_repo.status_code == 200:
-                data = r_repo.json()
-                for item in data.get("items", [])[:max_results]:
-                    results.append({
-                        "source": "GitHub-POC",
-                        "url": item.get("html_url"),
-                        "stars": item.get("stargazers_count"),
-                        "created_at": item.get("created_at"),
-                        "type": "repo",
-                        "name": item.get("full_name")
-                    })
-        except Exception:
-            pass
-
-        # 2) Search issues/PRs
-        try:
-            q_issue = f'{cve_id} in:title,body'
-            r_issue = await client.get(f"{GITHUB_API}/search/issues", params={"q": q_issue, "per_page": max_results})
-            if r_issue.status_code == 200:
-                data = r_issue.json()
-                for it in data.get("items", [])[:max_results]:
-                    results.append({
-                        "source": "GitHub-POC",
-                        "url": it.get("html_url"),
-                        "stars": None,
-                        "created_at": it.get("created_at"),
-                        "type": "issue",
-                        "title": it.get("title")
-                    })
-        except Exception:
-            pass
-
-    # Dédupliquer
-    seen = set()
-    deduped = []
-    for r in results:
-        u = r.get("url")
-        if u and u not in seen:
-            seen.add(u)
-            deduped.append(r)
-    return deduped
-
-# --- Cache Reddit avec Redis ---
-@simple_cached(ttl=1800)
-async def fetch_reddit_posts(cve_id: str, limit: int = 5) -> list[dict]:
-    """Récupérer les posts Reddit avec cache Redis"""
-    reddit = asyncpraw.Reddit(
-        client_id=REDDIT_CLIENT_ID,
-        client_secret=REDDIT_CLIENT_SECRET,
-        user_agent=REDDIT_USER_AGENT
-    )
-
-    posts = []
-    query = cve_id.upper()
-    try:
-        subreddit = await reddit.subreddit("netsec", fetch=True)
-        async for submission in subreddit.search(query, limit=limit):
-            posts.append({
-                "title": submission.title,
-                "url": submission.url,
-                "score": submission.score,
-                "created_utc": submission.created_utc,
-                "num_comments": submission.num_comments,
-                "permalink": f"https://reddit.com{submission.permalink}"
-            })
     except Exception as e:
-        print(f"⚠️ Erreur Reddit pour {cve_id}: {e}")
-    finally:
-        await reddit.close()
+        raise UpstreamError("epss", str(e), {"epss_score": 0.0, "epss_percentile": 0.0, "epss_status": "error"})
 
-    return posts
+    if not data:
+        return {"epss_score": 0.0, "epss_percentile": 0.0, "epss_status": "not_found"}
+    epss_score = float(data[0].get("epss") or 0)
+    epss_percentile = float(data[0].get("percentile") or 0)
+    return {"epss_score": epss_score, "epss_percentile": epss_percentile, "epss_status": "ok"}
 
 # --- Détection d'exploit public ---
-async def detect_public_exploit(cve_obj, kev_map: dict = None) -> dict:
-    """Détecter les preuves d'exploit public"""
+@timed("exploit", cve_of=lambda cve_obj, *args, **kwargs: getattr(cve_obj, "id", None))
+async def detect_public_exploit(cve_obj, kev_map: dict = None, max_cost: str = None) -> dict:
+    """
+    Détecter les preuves d'exploit public via les sources du registre (evidence.py).
+    max_cost limite les sources interrogées (par défaut : classe de coût de l'endpoint).
+    """
     cve_id = getattr(cve_obj, "id", None)
-    evidence = []
-    exploit_db_found = False
-    github_found = False
-    reddit_found = False
-
-    # Références NVD filtrées
-    for ref in getattr(cve_obj, "references", []) or []:
-        url = getattr(ref, "url", None)
-        tags = getattr(ref, "tags", []) or []
-
-        if not isinstance(tags, (list, tuple)):
-            tags = [tags]
-
-        for t in tags:
-            if t and t.strip().lower() in EXPLOIT_TAG_WHITELIST:
-                if url:
-                    evidence.append({"source": t, "url": url})
-                break
-
-    # Vérifier Exploit-DB
-    try:
-        if cve_id:
-            exploit_query = cve_id.upper().replace("CVE-", "", 1)
-            exploit_url = f"{EXPLOIT_DB_SEARCH}?cve={exploit_query}"
-            r = requests.get(exploit_url, timeout=5)
-            if r.status_code == 200 and exploit_query in r.text:
-                exploit_db_found = True
-                evidence.append({"source": "Exploit-DB", "url": exploit_url})
-    except Exception:
-        pass
+    found = await evidence_registry.collect(cve_obj, max_cost)
 
-    # GitHub search
-    try:
-        if cve_id:
-            gh_pocs = await fetch_github_pocs(cve_id, max_results=5)
-            if gh_pocs:
-                github_found = True
-                for g in gh_pocs:
-                    evidence.append(g)
-    except Exception:
-        pass
-
-    # Reddit posts
-    try:
-        if cve_id:
-            reddit_posts = await fetch_reddit_posts(cve_id, limit=5)
-            if reddit_posts:
-                reddit_found = True
-                for post in reddit_posts:
-                    evidence.append({
-                        "source": "Reddit",
-                        "url": post["url"],
-                        "permalink": post["permalink"],
-                        "score": post["score"],
-                        "nbr_comment": post["num_comments"],
-                        "title": post["title"],
-                        "created_utc": post["created_utc"]
-                    })
-    except Exception:
-        pass
+    # Statut par source interrogée : "found", "none" (absence confirmée) ou "error" (source en échec)
+    evidence = []
+    evidence_status = {}
+    for name, items in found.items():
+        if items is None:
+            evidence_status[name] = "error"
+            continue
+        evidence_status[name] = "found" if items else "none"
+        evidence.extend(items)
+    exploit_found = evidence_registry.signals_exploit(found)
 
     # KEV presence
     in_kev = bool(kev_map and cve_id in kev_map)
@@ -402,9 +347,33 @@ async def detect_public_exploit(cve_obj, kev_map: dict = None) -> dict:
             deduped.append(ev)
 
     # Déterminer exploit_public
-    exploit_public = in_kev or exploit_db_found or github_found or reddit_found
+    exploit_public = in_kev or exploit_found
 
-    return {"exploit_public": exploit_public, "evidence": deduped}
+    return {"exploit_public": exploit_public, "evidence": deduped, "evidence_status": evidence_status}
+
+async def scan_exploit_filter(cves: list, kev_map: dict, has_exploit: bool, needed: int) -> tuple:
+    """
+    Filtre exploit sur des CVE pris dans l'ordre, jusqu'à `needed` correspondances.
+    Détections en parallèle (au plus SEARCH_EXPLOIT_CONCURRENCY à la fois), par vagues dimensionnées
+    sur les correspondances encore nécessaires. Retourne (CVE retenus, leurs infos exploit, CVE examinés).
+    """
+    semaphore = asyncio.Semaphore(SEARCH_EXPLOIT_CONCURRENCY)
+
+    async def detect(cve):
+        async with semaphore:
+            return await detect_public_exploit(cve, kev_map)
+
+    matched, infos, examined = [], {}, 0
+    while examined < len(cves) and len(matched) < needed:
+        wave = cves[examined:examined + max(needed - len(matched), SEARCH_EXPLOIT_CONCURRENCY)]
+        for cve, info in zip(wave, await asyncio.gather(*(detect(cve) for cve in wave))):
+            examined += 1
+            if info["exploit_public"] == has_exploit:
+                matched.append(cve)
+                infos[cve.id] = info
+                if len(matched) >= needed:
+                    break
+    return matched, infos, examined
 
 # --- Fonctions utilitaires ---
 def compute_confidence_level(cve_dict: dict) -> str:
@@ -529,29 +498,41 @@ def generate_vulnerability_profile(cve_dict: dict) -> dict:
     }
 
 # --- Cache descriptions avec Redis ---
-@simple_cached(ttl=3600)
+@simple_cached(ttl=3600, is_negative=lambda desc: desc.startswith("No description found for "))
 async def fetch_cve_description(cve_id: str) -> str:
     """Récupérer la description d'un CVE avec cache Redis"""
     try:
-        results = searchCVE(cveId=cve_id, key=API_KEY)
-        if not results:
-            return f"No description found for {cve_id}"
+        with track_upstream("nvd"):
+            results = searchCVE(cveId=cve_id, key=API_KEY)
+    except Exception as e:
+        raise UpstreamError("nvd", str(e), f"Error retrieving description for {cve_id}: {e}")
+    if not results:
+        return f"No description found for {cve_id}"
+
+    cve = results[0]
+    descriptions = getattr(cve, "descriptions", [])
+    if descriptions:
+        desc_text = getattr(descriptions[0], "value", None) or cve_id
+    else:
+        desc_text = cve_id
 
-        cve = results[0]
-        descriptions = getattr(cve, "descriptions", [])
-        if descriptions:
-            desc_text = getattr(descriptions[0], "value", None) or cve_id
-        else:
-            desc_text = cve_id
+    return desc_text
 
-        return desc_text
-    except Exception as e:
-        print(f"⚠️ Erreur récupération description pour {cve_id}: {e}")
-        return f"Error retrieving description for {cve_id}: {e}"
+# --- Index locaux ---
+async def index_cves(cves):
+    """Alimenter les index locaux (plein texte, critères CPE) avec les CVE reçus de NVD"""
+    await ingest_cves(cves)
+    await ingest_cpe(cves)
 
 # --- Transformation CVE ---
-async def cve_to_dict_full(cve,kev_map: dict = None):
-    """Transforme un objet CVE en dictionnaire enrichi"""
+@track_in_flight(enrichment_in_flight)
+@timed("enrich", cve_of=lambda cve, *args, **kwargs: getattr(cve, "id", None))
+async def cve_to_dict_full(cve,kev_map: dict = None, with_scoring: bool = True, exploit_info: dict = None):
+    """
+    Transforme un objet CVE en dictionnaire enrichi.
+    Avec with_scoring=False, confiance et profil sont laissés à apply_scoring (appliqué après pagination).
+    exploit_info permet de réutiliser un résultat de detect_public_exploit déjà calculé.
+    """
     if hasattr(cve, "getvars"):
         cve.getvars()
 
@@ -620,8 +601,9 @@ async def cve_to_dict_full(cve,kev_map: dict = None):
 
     # Récupérer KEV_DATA une seule fois si non fourni
     if kev_map is None:
-        kev_data = await fetch_kev_catalog()
-        kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
+        with stage("enrich.kev"):
+            kev_data = await fetch_kev_catalog()
+            kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
     
     kev_info = kev_map.get(cve_dict["id"])
     if kev_info:
@@ -650,13 +632,22 @@ async def cve_to_dict_full(cve,kev_map: dict = None):
         })
 
     # EPSS
-    epss_data = await get_epss_data_safe(cve_dict["id"])
+    with stage("enrich.epss"):
+        epss_data = epss_table.get(cve_dict["id"]) or await get_epss_data_safe(cve_dict["id"])
     cve_dict.update(epss_data)
 
     # Exploit public
-    exploit_info = await detect_public_exploit(cve, kev_map)
+    if exploit_info is None:
+        exploit_info = await detect_public_exploit(cve, kev_map)
     cve_dict.update(exploit_info)
 
+    if not with_scoring:
+        return cve_dict
+    return apply_scoring(cve_dict)
+
+
+def apply_scoring(cve_dict: dict) -> dict:
+    """Ajouter confiance, exploitation active et profil à un CVE enrichi"""
     # Confidence level
     confidence = compute_confidence_level(cve_dict)
     cve_dict["confidenceLevel"] = confidence
@@ -676,7 +667,7 @@ async def cve_to_dict_full(cve,kev_map: dict = None):
 
 # --- Endpoints principaux ---
 @app.get("/cves", summary="Récupérer les CVE récents")
-@simple_cached(ttl=3600)
+@simple_cached(ttl=RECENT_TODAY_TTL, documents=DocumentRefs("cves"))
 async def get_cves(
     limit: int = Query(5, description="Nombre maximum de CVE à retourner", ge=1, le=2000),
     days: int = Query(DEFAULT_DAYS, description="Nombre de jours à couvrir", ge=1, le=365)
@@ -687,50 +678,41 @@ async def get_cves(
     - **limit**: Nombre de CVE à retourner (1-2000)
     - **days**: Période en jours à couvrir (1-365)
     """
-    start = datetime.now(timezone.utc) - timedelta(days=days)
-    end = datetime.now(timezone.utc)
-
-    results = searchCVE(pubStartDate=start, pubEndDate=end, key=API_KEY, limit=limit)
-    cves_output = [await cve_to_dict_full(cve) for cve in results]
-
-    return {
-        "total": len(cves_output),
-        "startDate": start.isoformat(),
-        "endDate": end.isoformat(),
-        "cves": cves_output
-    }
+    return await fetch_recent_cves_with_cache(limit, days)
 
 
 
 # --- Nouvel endpoint pour les CVE récents avec cache ---
 @app.get("/cves/recent", summary="CVE récents avec cache optimisé")
-@simple_cached(ttl=3600)
+@simple_cached(ttl=RECENT_TODAY_TTL, documents=DocumentRefs("cves", compact_param="compact"))
 async def get_recent_cves(
     limit: int = Query(2000, description="Nombre maximum de CVE à retourner", ge=1, le=2000),
-    days: int = Query(30, description="Nombre de jours à couvrir", ge=1, le=365)
+    days: int = Query(30, description="Nombre de jours à couvrir", ge=1, le=365),
+    compact: bool = Query(False, description="Omettre les champs nuls dans chaque CVE")
 ):
     """
     Récupère les CVE publiés récemment avec système de cache avancé.
     
     - **limit**: Nombre de CVE à retourner (1-2000, défaut: 2000)
     - **days**: Période en jours à couvrir (1-365, défaut: 30)
+    - **compact**: Forme compacte sans champs nuls (défaut: forme complète)
     
-    ⚡ Les résultats sont mis en cache pour des performances optimales.
-    🔄 Préchargement automatique des CVE des 30 derniers jours au démarrage.
+    ⚡ Fenêtre assemblée depuis des partitions journalières en cache : élargir la fenêtre ou
+    avancer dans le temps réutilise les jours déjà relevés, seul le jour en cours est rafraîchi.
     """
     try:
-        return await fetch_recent_cves_with_cache(limit, days)
+        return await fetch_recent_cves_with_cache(limit, days, compact=compact)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur critique dans /cves/recent: {e}")
+        logger.error("Erreur critique dans /cves/recent: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur interne: {e}")
 
 
 
 #----------------search advanced---------------
 @app.get("/cves/search", summary="Recherche avancée de CVE")
-@simple_cached(ttl=1800)
+@simple_cached(ttl=1800, documents=DocumentRefs("results"))
 async def search_cves(
     page: int = Query(1, description="Numéro de page", ge=1),
     limit: int = Query(50, description="Nombre d'éléments par page", ge=1, le=500),
@@ -740,22 +722,36 @@ async def search_cves(
     severity: str = Query(None, description="Filtrer par sévérité CVSS", enum=["LOW", "MEDIUM", "HIGH", "CRITICAL"]),
     source: str = Query(None, description="Source identifier"),
     has_kev: bool = Query(None, description="Filtrer les CVE présents dans KEV"),
-    has_exploit: bool = Query(None, description="Filtrer les CVE avec exploit public")
+    has_exploit: bool = Query(None, description="Filtrer les CVE avec exploit public"),
+    cursor: str = Query(None, description="Curseur de la page suivante (prioritaire sur page)"),
+    keyword_source: str = Query("auto", description="Recherche par mot-clé : index local, NVD, ou auto", enum=["auto", "local", "nvd"])
 ):
     """
     Recherche avancée de CVE avec pagination et filtres optimisés.
+    
+    Sans filtre local, la page est demandée directement à NVD (startIndex).
+    Avec filtres, un curseur parcourt une liste ordonnée d'identifiants mise en cache.
+    Seuls les CVE de la page retournée sont enrichis et scorés.
+    
+    Le mot-clé est résolu par l'index plein texte local (BM25, "phrases", préfixes*) quand
+    l'ingestion hors ligne couvre les dates demandées (keyword_source=auto), sinon par NVD ; sans
+    correspondance locale, NVD répond. keyword_source=local / nvd force l'une ou l'autre source.
     """
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "keyword": keyword,
+        "severity": severity,
+        "source": source,
+        "has_kev": has_kev,
+        "has_exploit": has_exploit
+    }
     try:
         # Validation de la plage de dates
         start_dt, end_dt = await validate_and_parse_dates(start_date, end_date)
         
-        # Construction des paramètres de recherche nvdlib
-        search_params = {
-            "key": API_KEY,
-            "limit": limit
-        }
-        
-        # Ajout des paramètres conditionnels nvdlib
+        # Construction des paramètres de recherche NVD
+        search_params = {}
         if start_dt:
             search_params["pubStartDate"] = start_dt
         if end_dt:
@@ -765,49 +761,293 @@ async def search_cves(
         if source:
             search_params["sourceIdentifier"] = source
 
-        print(f"🔍 Recherche CVE avec params: { {k: v for k, v in search_params.items() if k != 'key'} }")
+        logger.debug("Recherche CVE avec params: %s", search_params)
 
-        # Exécution de la recherche
-        results = await execute_nvdlib_search(search_params, limit)
-        
-        if not results:
-            return await build_empty_response(page, limit, {
-                "start_date": start_date,
-                "end_date": end_date,
-                "keyword": keyword,
-                "severity": severity,
-                "source": source,
-                "has_kev": has_kev,
-                "has_exploit": has_exploit
-            })
+        # Plan : filtres poussés vers NVD, prédicats locaux restants du moins au plus coûteux
+        plan = plan_search(search_params, severity, has_kev, has_exploit)
+        # auto : index local seulement s'il est amorcé (ingestion hors ligne) pour ces dates ; les seuls
+        # documents KEV et CVE vus en ligne ne représentent qu'une fraction de NVD
+        today = datetime.now(timezone.utc).date().isoformat()
+        use_local_index = bool(keyword) and (
+            keyword_source == "local"
+            or (keyword_source == "auto" and text_index.covers(start_date, end_date, today))
+        )
 
-        # Transformation des résultats
-        cves_output = await transform_cves_with_optimization(results)
-        
-        # Application des filtres post-traitement
-        filtered_cves = await apply_post_filters(cves_output, severity, has_kev, has_exploit)
-        
-        # Pagination
-        paginated_results, total_count = await paginate_results(filtered_cves, page, limit)
-        
-        return await build_success_response(
-            paginated_results, total_count, page, limit, {
-                "start_date": start_date,
-                "end_date": end_date,
-                "keyword": keyword,
-                "severity": severity,
-                "source": source,
-                "has_kev": has_kev,
-                "has_exploit": has_exploit
-            }
+        # Position dans la liste ordonnée des résultats
+        query_hash = search_query_hash(
+            {**plan["upstream"], "_index": "local" if use_local_index else "nvd"}, severity, has_kev, has_exploit
         )
+        offset = (page - 1) * limit
+        if cursor:
+            offset = decode_search_cursor(cursor, query_hash)
+            page = offset // limit + 1
+
+        kev_data = await fetch_kev_catalog()
+        kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
+
+        local_page = None
+        if use_local_index:
+            try:
+                local_page = await search_local_index_page(
+                    keyword, start_date, end_date, source, plan, severity, has_kev, has_exploit, offset, limit, kev_map
+                )
+            except HTTPException:
+                if keyword_source == "local":
+                    raise
+            # auto : aucune correspondance locale ou documents indisponibles -> NVD répond
+            if keyword_source == "auto" and (local_page is None or (not local_page[1] and not local_page[2])):
+                logger.debug("Index local sans réponse pour %r, recherche NVD", keyword)
+                use_local_index = False
+                query_hash = search_query_hash({**plan["upstream"], "_index": "nvd"}, severity, has_kev, has_exploit)
+
+        total_is_estimate = False
+        if use_local_index:
+            cves_output, total_count, has_more, total_is_estimate = local_page
+        elif not plan["local"]:
+            # Tous les filtres sont résolus par NVD : seule la page demandée est récupérée
+            page_data = await fetch_nvd_page(plan["upstream"], offset, limit)
+            total_count = page_data["total"]
+            has_more = offset + len(page_data["cves"]) < total_count
+            cves_output = await transform_cves_with_optimization(page_data["cves"], kev_map)
+        else:
+            cves_output, total_count, has_more, total_is_estimate = await search_filtered_page(
+                query_hash, plan, severity, has_kev, has_exploit, offset, limit, kev_map
+            )
+
+        if not cves_output:
+            return await build_empty_response(page, limit, filters)
+
+        # Scoring et profils calculés uniquement pour les CVE retournés
+        for cve_data in cves_output:
+            apply_scoring(cve_data)
+        await change_feed.observe(cves_output, "search")
+        
+        response = await build_success_response(cves_output, total_count, page, limit, filters)
+        # Parcours arrêté dès la page remplie : total = correspondances trouvées jusqu'ici (minorant)
+        response["totalIsEstimate"] = total_is_estimate
+        response["nextCursor"] = encode_search_cursor(query_hash, offset + limit) if has_more else None
+        if use_local_index:
+            response["queryPlan"] = {"keywordIndex": "local", "pushedDown": [], "local": local_index_filters(plan)}
+        else:
+            response["queryPlan"] = {"pushedDown": plan["pushed"], "local": plan["local"]}
+        return response
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur recherche CVE: {e}")
+        logger.error("Erreur recherche CVE: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la recherche: {e}")
 
+def plan_search(search_params: dict, severity: str, has_kev: bool, has_exploit: bool) -> dict:
+    """
+    Répartir les filtres entre NVD et l'évaluation locale.
+    - has_kev=True -> hasKev (exact, plus de contrôle local)
+    - severity=CRITICAL -> cvssV3Severity ; le contrôle local reste car le score retenu peut être V4/V2
+    - HIGH/MEDIUM/LOW sont inclusifs (>=), non exprimables en un seul paramètre NVD
+    Prédicats locaux, dans l'ordre d'évaluation : severity, kev (peu coûteux), exploit (coûteux).
+    """
+    upstream = dict(search_params)
+    pushed = []
+    local = []
+
+    if severity:
+        if severity.upper() == "CRITICAL":
+            upstream["cvssV3Severity"] = "CRITICAL"
+            pushed.append("severity")
+        local.append("severity")
+
+    if has_kev is True:
+        upstream["hasKev"] = True
+        pushed.append("has_kev")
+    elif has_kev is False:
+        local.append("has_kev")
+
+    if has_exploit is not None:
+        local.append("has_exploit")
+
+    return {"upstream": upstream, "pushed": pushed, "local": local}
+
+def matches_cheap_filters(cve, plan: dict, severity: str, has_kev: bool, kev_map: dict) -> bool:
+    """Prédicats locaux peu coûteux, évalués sur l'objet NVD brut avant tout enrichissement"""
+    if "severity" in plan["local"] and not matches_severity({"score": getattr(cve, "score", [])}, severity):
+        return False
+    if "has_kev" in plan["local"] and (getattr(cve, "id", None) in kev_map) != has_kev:
+        return False
+    return True
+
+def search_query_hash(search_params: dict, severity: str, has_kev: bool, has_exploit: bool) -> str:
+    """Empreinte stable d'une recherche (paramètres NVD + filtres locaux)"""
+    payload = json.dumps(
+        {"params": search_params, "severity": severity, "has_kev": has_kev, "has_exploit": has_exploit},
+        sort_keys=True, default=str
+    )
+    return hashlib.md5(payload.encode()).hexdigest()[:16]
+
+def encode_search_cursor(query_hash: str, offset: int) -> str:
+    """Curseur opaque : empreinte de la recherche + position dans la liste ordonnée"""
+    return base64.urlsafe_b64encode(f"{query_hash}:{offset}".encode()).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str, query_hash: str) -> int:
+    """Décoder un curseur et vérifier qu'il appartient bien à cette recherche"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_hash, offset = base64.urlsafe_b64decode(padded).decode().split(":")
+        offset = int(offset)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    if cursor_hash != query_hash or offset < 0:
+        raise HTTPException(status_code=400, detail="Curseur invalide pour ces critères de recherche")
+    return offset
+
+async def fetch_nvd_page(search_params: dict, start_index: int, results_per_page: int, raw_ttl: int = 3600) -> dict:
+    """Récupérer une page NVD et mémoriser le JSON brut de chaque CVE (raw_ttl secondes)"""
+    try:
+        page_data = await fetch_cve_page(search_params, start_index, results_per_page)
+    except httpx.HTTPStatusError as e:
+        logger.error("Erreur lors de la recherche NVD: %s", e)
+        if e.response.status_code in (403, 429):
+            raise HTTPException(status_code=429, detail="Limite de taux API NVD atteinte. Réessayez plus tard.")
+        raise
+
+    await cache_manager.set_cached_many({f"cve_advisory:nvd_raw:{raw['id']}": raw for raw in page_data["raw"]}, raw_ttl)
+    await index_cves(page_data["cves"])
+    return page_data
+
+async def load_cves_by_id(cve_ids: list) -> list:
+    """
+    Recharger des CVE depuis leur JSON brut en cache (un MGET) ; les absents sont demandés à NVD
+    en parallèle sous le limiteur de débit. Un CVE que NVD ne peut fournir est omis (source dégradée).
+    """
+    raws = await cache_manager.get_cached_many([f"cve_advisory:nvd_raw:{c}" for c in cve_ids])
+    missing = [c for c, raw in zip(cve_ids, raws) if raw is None]
+    semaphore = asyncio.Semaphore(CVE_BATCH_CONCURRENCY)
+
+    async def fetch(cve_id: str) -> Optional[dict]:
+        try:
+            async with semaphore:
+                page_data = await fetch_nvd_page({"cveId": cve_id}, 0, 1)
+        except Exception as e:
+            logger.warning("CVE %s absent du cache et NVD indisponible: %s", cve_id, e)
+            mark_degraded("nvd")
+            return None
+        return page_data["raw"][0] if page_data["raw"] else None
+
+    fetched = dict(zip(missing, await asyncio.gather(*(fetch(c) for c in missing))))
+    raws = [raw if raw is not None else fetched.get(c) for c, raw in zip(cve_ids, raws)]
+    return [convert_raw(raw) for raw in raws if raw is not None]
+
+async def load_documents(cve_ids: list) -> dict:
+    """Documents enrichis (forme complète) par identifiant : magasin, puis reconstruction groupée des absents"""
+    docs, _ = await cve_store.assemble(cve_ids, rebuild_max=len(cve_ids))
+    if docs is None:
+        raise HTTPException(status_code=503, detail="Documents CVE indisponibles, réessayez plus tard")
+    return {doc["id"]: doc for doc in docs}
+
+def local_index_filters(plan: dict) -> list:
+    """Avec l'index local rien n'est poussé vers NVD : tous les filtres sont évalués localement"""
+    return [f for f in ("severity", "has_kev", "has_exploit") if f in plan["local"] or f in plan["pushed"]]
+
+async def search_local_index_page(keyword: str, start_date: str, end_date: str, source: str, plan: dict, severity: str,
+                                  has_kev: bool, has_exploit: bool, offset: int, limit: int, kev_map: dict) -> tuple:
+    """
+    Page d'une recherche par mot-clé résolue par l'index plein texte local (aucun appel NVD
+    pour le classement). Dates, source, sévérité et KEV sont filtrés sur les métadonnées indexées,
+    les résultats servis depuis le magasin de documents (NVD seulement pour les absents du cache).
+    Retourne (CVE de la page, total, has_more, total estimé).
+    """
+    plan = {"local": local_index_filters(plan)}
+    ranked = text_index.search(keyword)
+
+    candidates = []
+    for cve_id, _ in ranked:
+        meta = text_index.meta.get(cve_id, {})
+        published = str(meta.get("published") or "")[:10]
+        if start_date and (not published or published < start_date):
+            continue
+        if end_date and (not published or published > end_date):
+            continue
+        if source and meta.get("sourceIdentifier") != source:
+            continue
+        if not matches_cheap_filters(SimpleNamespace(id=cve_id, score=meta.get("score") or []), plan, severity, has_kev, kev_map):
+            continue
+        candidates.append(cve_id)
+
+    if has_exploit is None:
+        page_ids = candidates[offset:offset + limit]
+        docs = await load_documents(page_ids)
+        cves_output = [docs[c] for c in page_ids if c in docs]
+        return cves_output, len(candidates), offset + limit < len(candidates), False
+
+    # Filtre exploit : lu sur les documents enrichis, dans l'ordre du classement jusqu'à remplir la page
+    matched = []
+    position = 0  # candidats examinés
+    while position < len(candidates) and len(matched) < offset + limit:
+        # Lots dimensionnés sur les correspondances manquantes : peu de documents à reconstruire à froid
+        size = min(SEARCH_SCAN_PAGE, max(offset + limit - len(matched), CVE_BATCH_CONCURRENCY))
+        chunk = candidates[position:position + size]
+        docs = await load_documents(chunk)
+        for cve_id in chunk:
+            position += 1
+            doc = docs.get(cve_id)
+            if doc is not None and doc["exploit_public"] == has_exploit:
+                matched.append(doc)
+                if len(matched) >= offset + limit:
+                    break
+
+    # Candidats restants non examinés : il peut en rester d'autres, le total n'est qu'un minorant
+    scanned_all = position >= len(candidates)
+    return matched[offset:offset + limit], len(matched), not scanned_all, not scanned_all
+
+async def search_filtered_page(query_hash: str, plan: dict, severity: str, has_kev: bool,
+                               has_exploit: bool, offset: int, limit: int, kev_map: dict) -> tuple:
+    """
+    Page d'une recherche filtrée localement.
+    La liste ordonnée des identifiants retenus est mise en cache et complétée au fil des pages :
+    prédicats peu coûteux d'abord, recherche d'exploit seulement sur les survivants,
+    arrêt dès que la page demandée est complète. Seuls les CVE retournés sont enrichis.
+    """
+    state_key = f"cve_advisory:search_cursor:{query_hash}"
+    state = await cache_manager.get_cached_data(state_key) or {"matched": [], "scanned": 0, "total": None, "exhausted": False}
+
+    exploit_infos = {}
+    candidates_by_id = {}
+    scanned_now = 0
+    while len(state["matched"]) < offset + limit and not state["exhausted"] and scanned_now < SEARCH_MAX_SCAN:
+        page_data = await fetch_nvd_page(plan["upstream"], state["scanned"], SEARCH_SCAN_PAGE)
+        state["total"] = page_data["total"]
+
+        cves = page_data["cves"]
+        positions = [i for i, cve in enumerate(cves) if matches_cheap_filters(cve, plan, severity, has_kev, kev_map)]
+        survivors = [cves[i] for i in positions]
+        needed = offset + limit - len(state["matched"])
+        if has_exploit is None:
+            kept, examined = survivors[:needed], min(needed, len(survivors))
+        else:
+            kept, infos, examined = await scan_exploit_filter(survivors, kev_map, has_exploit, needed)
+            exploit_infos.update(infos)
+        for cve in kept:
+            state["matched"].append(cve.id)
+            candidates_by_id[cve.id] = cve
+        # Page remplie : reprise juste après le dernier CVE examiné, sinon après toute la page NVD
+        advance = positions[examined - 1] + 1 if len(kept) >= needed else len(cves)
+        state["scanned"] += advance
+        scanned_now += advance
+
+        state["exhausted"] = not page_data["cves"] or state["scanned"] >= page_data["total"]
+
+    logger.debug("Filtres locaux %s: %s CVE retenus sur %s examinés", plan['local'], len(state['matched']), state['scanned'])
+    await cache_manager.set_cached_data(state_key, state, ttl=1800)
+
+    page_ids = state["matched"][offset:offset + limit]
+    to_load = [c for c in page_ids if c not in candidates_by_id]
+    for cve in await load_cves_by_id(to_load):
+        candidates_by_id[cve.id] = cve
+
+    page_cves = [candidates_by_id[c] for c in page_ids if c in candidates_by_id]
+    cves_output = await transform_cves_with_optimization(page_cves, kev_map, exploit_infos)
+    has_more = len(state["matched"]) > offset + limit or not state["exhausted"]
+    return cves_output, len(state["matched"]), has_more, not state["exhausted"]
+
 async def validate_and_parse_dates(start_date: str, end_date: str) -> tuple:
     """Valide et parse les dates pour nvdlib"""
     start_dt = None
@@ -836,81 +1076,34 @@ async def validate_and_parse_dates(start_date: str, end_date: str) -> tuple:
     
     return start_dt, end_dt
 
-async def execute_nvdlib_search(params: dict, limit: int):
-    """Exécute la recherche avec nvdlib"""
-    try:
-        if limit > 100:
-            print("🔍 Utilisation de searchCVE_V2 (recherche volumineuse)")
-            results_generator = searchCVE_V2(**params)
-            
-            results = []
-            for i, cve in enumerate(results_generator):
-                if i >= limit:
-                    break
-                results.append(cve)
-                if i % 100 == 0:
-                    print(f"🔍 {i+1} CVE récupérés...")
-            return results
-        else:
-            print("🔍 Utilisation de searchCVE (recherche standard)")
-            return searchCVE(**params)
-            
-    except Exception as e:
-        print(f"❌ Erreur lors de la recherche nvdlib: {e}")
-        if "rate limit" in str(e).lower():
-            raise HTTPException(status_code=429, detail="Limite de taux API NVD atteinte. Réessayez plus tard.")
-        raise
-
-async def transform_cves_with_optimization(cves) -> list:
-    """Transforme les CVE avec optimisation du cache KEV"""
+async def transform_cves_with_optimization(cves, kev_map: dict = None, exploit_infos: dict = None) -> list:
+    """Transforme les CVE avec optimisation du cache KEV (sans scoring, appliqué après pagination)"""
     if not cves:
         return []
     
-    print(f"🔄 Transformation de {len(cves)} CVE...")
+    logger.debug("Transformation de %s CVE...", len(cves))
     
-    kev_data = await fetch_kev_catalog()
-    kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
+    if kev_map is None:
+        kev_data = await fetch_kev_catalog()
+        kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
     
     cves_output = []
     for i, cve in enumerate(cves):
         try:
-            cve_data = await cve_to_dict_full(cve, kev_map)
+            exploit_info = (exploit_infos or {}).get(getattr(cve, "id", None))
+            cve_data = await cve_to_dict_full(cve, kev_map, with_scoring=False, exploit_info=exploit_info)
             cves_output.append(cve_data)
         except Exception as e:
             cve_id = getattr(cve, 'id', 'unknown')
-            print(f"⚠️ Erreur transformation CVE {cve_id}: {e}")
+            logger.warning("Erreur transformation CVE %s: %s", cve_id, e)
             continue
         
         if (i + 1) % 50 == 0:
-            print(f"🔄 {i+1}/{len(cves)} CVE transformés...")
+            logger.debug("%s/%s CVE transformés...", i+1, len(cves))
     
-    print(f"✅ Transformation terminée: {len(cves_output)} CVE traités avec succès")
+    logger.debug("Transformation terminée: %s CVE traités avec succès", len(cves_output))
     return cves_output
 
-async def apply_post_filters(cves: list, severity: str, has_kev: bool, has_exploit: bool) -> list:
-    """Applique les filtres post-traitement"""
-    if not cves:
-        return []
-    
-    filtered = cves
-    
-    # Filtre par sévérité (utilise l'attribut score)
-    if severity:
-        filtered = [cve for cve in filtered if matches_severity(cve, severity)]
-        print(f"🔍 Filtre sévérité ({severity}): {len(filtered)} CVE après filtrage")
-    
-    # Filtre KEV
-    if has_kev is not None:
-        filtered = [cve for cve in filtered if cve.get("isExploited") == has_kev]
-        print(f"🔍 Filtre KEV ({has_kev}): {len(filtered)} CVE après filtrage")
-    
-    # Filtre exploit public
-    if has_exploit is not None:
-        filtered = [cve for cve in filtered if cve.get("exploit_public") == has_exploit]
-        print(f"🔍 Filtre exploit ({has_exploit}): {len(filtered)} CVE après filtrage")
-    
-    return filtered
-
 def matches_severity(cve: dict, target_severity: str) -> bool:
     """
     Vérifie si un CVE correspond à la sévérité demandée en utilisant l'attribut score.
@@ -942,20 +1135,6 @@ def matches_severity(cve: dict, target_severity: str) -> bool:
     return cve_sev == target
 
 
-async def paginate_results(cves: list, page: int, limit: int) -> tuple:
-    """Applique la pagination aux résultats"""
-    total = len(cves)
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
-    
-    if start_idx >= total:
-        return [], total
-    
-    paginated = cves[start_idx:end_idx]
-    print(f"📄 Pagination: page {page}, résultats {start_idx+1}-{min(end_idx, total)} sur {total}")
-    
-    return paginated, total
-
 async def build_empty_response(page: int, limit: int, filters: dict) -> dict:
     """Construit une réponse pour aucun résultat"""
     return {
@@ -985,7 +1164,7 @@ async def build_success_response(results: list, total: int, page: int, limit: in
 
 
 @app.get("/cve/{cve_id}", summary="Détails complets pour un CVE donné")
-@simple_cached(ttl=3600)
+@simple_cached(ttl=3600, documents=DocumentRefs("cve"))
 async def get_cve_by_id(cve_id: str):
     """
     Recherche et retourne les informations détaillées d'un CVE spécifique.
@@ -994,12 +1173,25 @@ async def get_cve_by_id(cve_id: str):
     """
     cve_id_norm = cve_id.strip().upper()
     try:
-        results = searchCVE(cveId=cve_id_norm, key=API_KEY)
+        # Document déjà enrichi par une liste, une recherche ou une consultation groupée
+        docs, _ = await cve_store.get_many([cve_id_norm])
+        if docs[0] is not None:
+            return {
+                "total": 1,
+                "cve_id": cve_id_norm,
+                "retrievedAt": datetime.now(timezone.utc).isoformat(),
+                "cve": expand_wire(docs[0])
+            }
+
+        with track_upstream("nvd"):
+            results = searchCVE(cveId=cve_id_norm, key=API_KEY)
         if not results:
             raise HTTPException(status_code=404, detail=f"Aucun CVE trouvé pour {cve_id_norm}")
 
         cve = results[0]
+        await index_cves([cve])
         cve_data = await cve_to_dict_full(cve)
+        await change_feed.observe([cve_data], "cve")
 
         return {
             "total": 1,
@@ -1010,6 +1202,155 @@ async def get_cve_by_id(cve_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du CVE : {e}")
 
+async def rebuild_cve_documents(cve_ids: list) -> list:
+    """Recalculer les documents évincés du magasin (JSON brut en cache, NVD en dernier recours)"""
+    kev_data = await fetch_kev_catalog()
+    kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
+    cves = await load_cves_by_id(cve_ids)
+    semaphore = asyncio.Semaphore(CVE_BATCH_CONCURRENCY)
+
+    async def enrich(cve):
+        async with semaphore:
+            return await cve_to_dict_full(cve, kev_map)
+
+    docs = list(await asyncio.gather(*(enrich(cve) for cve in cves)))
+    await change_feed.observe(docs, "store")
+    return docs
+
+cve_store.loader = rebuild_cve_documents
+recent_partitions.fetch_page = fetch_nvd_page
+
+def project_cve(cve_data: dict, fields: Optional[List[str]]) -> dict:
+    """Ne garder que les champs demandés (l'identifiant est toujours inclus)"""
+    if not fields:
+        return cve_data
+    return {k: cve_data.get(k) for k in ["id", *fields] if k in cve_data}
+
+class CveBatchRequest(BaseModel):
+    ids: List[str] = Field(..., description="Identifiants CVE (ex: CVE-2021-44228)")
+    fields: Optional[List[str]] = Field(None, description="Champs à retourner (tous par défaut)")
+    stream: bool = Field(False, description="Réponse NDJSON, une ligne par identifiant dans l'ordre d'entrée")
+
+async def resolve_cve_batch(ids: list, kev_map: dict) -> dict:
+    """
+    Lancer la résolution de CVE distincts : documents du magasin (un MGET), puis JSON brut en cache
+    (un MGET), puis NVD en parallèle sous le limiteur de débit. Retourne identifiant -> future.
+    """
+    futures = {}
+    loop = asyncio.get_running_loop()
+
+    docs, _ = await cve_store.get_many(ids)
+    misses = []
+    for cve_id, doc in zip(ids, docs):
+        if doc is not None:
+            futures[cve_id] = loop.create_future()
+            futures[cve_id].set_result({"status": "ok", "source": "cache", "cve": expand_wire(doc)})
+        else:
+            misses.append(cve_id)
+
+    raws = await cache_manager.get_cached_many([f"cve_advisory:nvd_raw:{c}" for c in misses])
+    semaphore = asyncio.Semaphore(CVE_BATCH_CONCURRENCY)
+
+    async def resolve(cve_id: str, raw: Optional[dict]) -> dict:
+        source = "raw_cache" if raw is not None else "nvd"
+        try:
+            if raw is None:
+                async with semaphore:
+                    page_data = await fetch_nvd_page({"cveId": cve_id}, 0, 1)
+                if not page_data["cves"]:
+                    return {"status": "not_found"}
+                cve = page_data["cves"][0]
+            else:
+                cve = convert_raw(raw)
+            cve_data = await cve_to_dict_full(cve, kev_map)
+            await change_feed.observe([cve_data], "batch")
+            await cve_store.put_many([cve_data])
+            return {"status": "ok", "source": source, "cve": cve_data}
+        except HTTPException as e:
+            return {"status": "error", "detail": e.detail}
+        except Exception as e:
+            logger.warning("Erreur consultation groupée %s: %s", cve_id, e)
+            return {"status": "error", "detail": str(e)}
+
+    for cve_id, raw in zip(misses, raws):
+        futures[cve_id] = asyncio.ensure_future(resolve(cve_id, raw))
+    return futures
+
+@app.post("/cves/batch", summary="Consultation groupée de CVE")
+async def get_cves_batch(request: CveBatchRequest):
+    """
+    Retourne les CVE demandés dans l'ordre d'entrée, avec un statut par identifiant
+    (ok, not_found, invalid, error) et la source (cache, raw_cache, nvd).
+    
+    - **ids**: jusqu'à CVE_BATCH_MAX identifiants (doublons résolus une seule fois)
+    - **fields**: projection optionnelle des champs retournés
+    - **stream**: réponse NDJSON diffusée au fil de la résolution
+    """
+    if len(request.ids) > CVE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Maximum {CVE_BATCH_MAX} identifiants par requête")
+
+    normalized = [i.strip().upper() for i in request.ids]
+    valid = list(dict.fromkeys(i for i in normalized if CVE_ID_RE.match(i)))
+
+    kev_data = await fetch_kev_catalog()
+    kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
+    futures = await resolve_cve_batch(valid, kev_map)
+
+    async def result_for(cve_id: str) -> dict:
+        if cve_id not in futures:
+            return {"id": cve_id, "status": "invalid"}
+        result = dict(await futures[cve_id])
+        if "cve" in result:
+            result["cve"] = project_cve(result["cve"], request.fields)
+        return {"id": cve_id, **result}
+
+    if request.stream:
+        async def ndjson():
+            for cve_id in normalized:
+                yield json.dumps(await result_for(cve_id), default=str) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results = [await result_for(cve_id) for cve_id in normalized]
+    return {
+        "total": len(results),
+        "found": sum(1 for r in results if r["status"] == "ok"),
+        "retrievedAt": datetime.now(timezone.utc).isoformat(),
+        "results": results
+    }
+
+@app.get("/cves/changes", summary="Flux des CVE modifiés depuis un curseur")
+async def get_cve_changes(
+    since: str = Query(None, description="Curseur retourné par l'appel précédent, ou horodatage ISO 8601"),
+    limit: int = Query(500, description="Nombre maximum de changements", ge=1, le=5000),
+    include_cve: bool = Query(False, description="Joindre le document enrichi en cache de chaque CVE")
+):
+    """
+    Retourne uniquement les CVE dont la date de modification NVD, le statut KEV, le score EPSS
+    ou les preuves d'exploit ont changé depuis le curseur, avec le curseur suivant.
+    
+    - **changed**: champs modifiés ("new" pour un CVE observé pour la première fois)
+    - Sans document en cache (include_cve), utiliser /cves/batch avec les identifiants retournés
+    """
+    try:
+        feed = await change_feed.read(since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=410, detail=f"{e}. Resynchroniser via /cves/recent.")
+
+    if include_cve and feed["changes"]:
+        docs, _ = await cve_store.get_many([c["cveId"] for c in feed["changes"]])
+        for change, doc in zip(feed["changes"], docs):
+            change["cve"] = expand_wire(doc) if doc else None
+
+    return {
+        "since": since,
+        "count": len(feed["changes"]),
+        "nextCursor": feed["nextCursor"],
+        "hasMore": feed["hasMore"],
+        "changes": feed["changes"],
+    }
+
 
 # --- Endpoints KEV ---
 @app.get("/kev/all", summary="Liste complète du catalogue KEV")
@@ -1023,13 +1364,13 @@ async def get_all_kev(force_refresh: bool = Query(False, description="Forcer le
         vulns = kev_catalog.get("vulnerabilities", [])
         
         # Debug logging
-        print(f"🔍 Endpoint /kev/all - Vulnérabilités trouvées: {len(vulns)}")
+        logger.debug("Endpoint /kev/all - Vulnérabilités trouvées: %s", len(vulns))
         
         if not vulns:
-            print("⚠️ Aucune vulnérabilité dans la réponse KEV")
+            logger.warning("Aucune vulnérabilité dans la réponse KEV")
             # Essayer un refresh forcé
             if not force_refresh:
-                print("🔄 Tentative de refresh forcé...")
+                logger.info("Tentative de refresh forcé...")
                 kev_catalog = await fetch_kev_catalog(force_refresh=True)
                 vulns = kev_catalog.get("vulnerabilities", [])
         
@@ -1041,7 +1382,7 @@ async def get_all_kev(force_refresh: bool = Query(False, description="Forcer le
             "vulnerabilities": vulns,
         }
     except Exception as e:
-        print(f"❌ Erreur dans /kev/all: {e}")
+        logger.error("Erreur dans /kev/all: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur interne: {e}")
 
 
@@ -1062,7 +1403,6 @@ async def get_recent_kevs(days: int = Query(7, description="Nombre de jours", ge
         # Date de coupure
         cutoff = datetime.now(timezone.utc) - timedelta(days=days)
         
-        print(" alain")
         # Filtrer les vulnérabilités récentes
         recent = []
         for v in vulns:
@@ -1072,9 +1412,9 @@ async def get_recent_kevs(days: int = Query(7, description="Nombre de jours", ge
                     if date_added >= cutoff:
                         recent.append(v)
                 except ValueError as e:
-                    print(f"⚠️ Format de date invalide pour {v.get('cveID')}: {v.get('dateAdded')}")
+                    logger.warning("Format de date invalide pour %s: %s", v.get('cveID'), v.get('dateAdded'))
 
-        print(f"🔍 Endpoint /kev/recent - Vulnérabilités récentes: {len(recent)} sur {days} jours")
+        logger.debug("Endpoint /kev/recent - Vulnérabilités récentes: %s sur %s jours", len(recent), days)
 
         return {
             "status": "success" if recent else "empty",
@@ -1084,7 +1424,7 @@ async def get_recent_kevs(days: int = Query(7, description="Nombre de jours", ge
         }
     
     except Exception as e:
-        print(f"❌ Erreur dans /kev/recent: {e}")
+        logger.error("Erreur dans /kev/recent: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur interne: {e}")
 
 
@@ -1123,9 +1463,9 @@ async def get_kevs_in_range(
                     if start_dt <= date_added <= end_dt:
                         filtered.append(v)
                 except ValueError as e:
-                    print(f"⚠️ Format de date invalide pour {v.get('cveID')}: {v.get('dateAdded')}")
+                    logger.warning("Format de date invalide pour %s: %s", v.get('cveID'), v.get('dateAdded'))
 
-        print(f"🔍 Endpoint /kev/range - Vulnérabilités entre {start} et {end}: {len(filtered)}")
+        logger.debug("Endpoint /kev/range - Vulnérabilités entre %s et %s: %s", start, end, len(filtered))
 
         return {
             "status": "success" if filtered else "empty",
@@ -1137,7 +1477,7 @@ async def get_kevs_in_range(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur dans /kev/range: {e}")
+        logger.error("Erreur dans /kev/range: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur interne: {e}")
 
 @app.get("/kev/search", summary="Recherche avancée dans KEV")
@@ -1166,7 +1506,7 @@ async def search_kev(
         kev_catalog = await fetch_kev_catalog()
         vulns = kev_catalog.get("vulnerabilities", [])
         
-        print(f"🔍 Endpoint /kev/search - Total vulnérabilités: {len(vulns)}")
+        logger.debug("Endpoint /kev/search - Total vulnérabilités: %s", len(vulns))
         
         # Appliquer les filtres
         filtered_vulns = vulns.copy()
@@ -1179,7 +1519,7 @@ async def search_kev(
                     v for v in filtered_vulns 
                     if "dateAdded" in v and datetime.strptime(v["dateAdded"], "%Y-%m-%d").replace(tzinfo=timezone.utc) >= start_dt
                 ]
-                print(f"🔍 Après filtre start {start}: {len(filtered_vulns)}")
+                logger.debug("Après filtre start %s: %s", start, len(filtered_vulns))
             except ValueError:
                 raise HTTPException(status_code=400, detail="Format de date de début invalide")
 
@@ -1191,7 +1531,7 @@ async def search_kev(
                     v for v in filtered_vulns 
                     if "dateAdded" in v and datetime.strptime(v["dateAdded"], "%Y-%m-%d").replace(tzinfo=timezone.utc) <= end_dt
                 ]
-                print(f"🔍 Après filtre end {end}: {len(filtered_vulns)}")
+                logger.debug("Après filtre end %s: %s", end, len(filtered_vulns))
             except ValueError:
                 raise HTTPException(status_code=400, detail="Format de date de fin invalide")
 
@@ -1202,7 +1542,7 @@ async def search_kev(
                 v for v in filtered_vulns 
                 if cve_search in v.get("cveID", "").upper()
             ]
-            print(f"🔍 Après filtre CVE '{cve_id}': {len(filtered_vulns)}")
+            logger.debug("Après filtre CVE '%s': %s", cve_id, len(filtered_vulns))
 
         # Filtre par vendeur (recherche insensible à la casse et partielle)
         if vendor:
@@ -1211,7 +1551,7 @@ async def search_kev(
                 v for v in filtered_vulns 
                 if vendor_search in v.get("vendorProject", "").upper()
             ]
-            print(f"🔍 Après filtre vendor '{vendor}': {len(filtered_vulns)}")
+            logger.debug("Après filtre vendor '%s': %s", vendor, len(filtered_vulns))
 
         # Filtre par produit (recherche insensible à la casse et partielle)
         if product:
@@ -1220,7 +1560,7 @@ async def search_kev(
                 v for v in filtered_vulns 
                 if product_search in v.get("product", "").upper()
             ]
-            print(f"🔍 Après filtre product '{product}': {len(filtered_vulns)}")
+            logger.debug("Après filtre product '%s': %s", product, len(filtered_vulns))
 
         # Trier par date d'ajout (plus récent en premier)
         filtered_vulns.sort(
@@ -1239,7 +1579,7 @@ async def search_kev(
         else:
             paginated = filtered_vulns[start_idx:end_idx]
 
-        print(f"🔍 Endpoint /kev/search - Résultats: {len(paginated)}/{total} (page {page})")
+        logger.debug("Endpoint /kev/search - Résultats: %s/%s (page %s)", len(paginated), total, page)
 
         return {
             "status": "success" if paginated else "empty",
@@ -1260,7 +1600,7 @@ async def search_kev(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur dans /kev/search: {e}")
+        logger.error("Erreur dans /kev/search: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur interne: {e}")
 
 
@@ -1269,6 +1609,46 @@ async def search_kev(
 #----------------route parametre---------------------
 
 
+class KevCheckRequest(BaseModel):
+    ids: List[str] = Field(..., description="Identifiants CVE à vérifier")
+
+@app.post("/kev/check", summary="Vérification groupée d'appartenance au catalogue KEV")
+async def kev_check(request: KevCheckRequest):
+    """
+    Indique pour chaque identifiant s'il figure dans le catalogue KEV.
+    
+    - **inKev**: booléens dans l'ordre d'entrée
+    - **matches**: date d'échéance, date d'ajout et usage ransomware des seuls identifiants présents
+    """
+    if len(request.ids) > KEV_CHECK_MAX:
+        raise HTTPException(status_code=400, detail=f"Maximum {KEV_CHECK_MAX} identifiants par requête")
+
+    if kev_membership.follower.snapshot is None:
+        kev_membership.ensure(await fetch_kev_catalog())
+    rows = kev_membership.check(request.ids)
+
+    vulns = kev_membership.vulnerabilities
+    hits = np.flatnonzero(rows >= 0)
+    matches = []
+    for i in hits.tolist():
+        v = vulns[rows[i]]
+        matches.append({
+            "index": i,
+            "cveID": v.get("cveID"),
+            "dueDate": v.get("dueDate"),
+            "dateAdded": v.get("dateAdded"),
+            "knownRansomwareCampaignUse": v.get("knownRansomwareCampaignUse"),
+        })
+
+    # Réponse sérialisée directement : pas de passage par jsonable_encoder sur 100k éléments
+    return JSONResponse({
+        **kev_membership.meta,
+        "total": len(request.ids),
+        "matched": len(matches),
+        "inKev": (rows >= 0).tolist(),
+        "matches": matches,
+    })
+
 @app.get("/kev/{cve_id}", summary="Détails KEV pour un CVE donné")
 @simple_cached(ttl=3600)
 async def get_kev_by_cve(cve_id: str):
@@ -1277,22 +1657,21 @@ async def get_kev_by_cve(cve_id: str):
     """
     try:
         cve_id_norm = cve_id.strip().upper()
-        kev_catalog = await fetch_kev_catalog()
-        vulns = kev_catalog.get("vulnerabilities", [])
-        matches = [v for v in vulns if v.get("cveID", "").upper() == cve_id_norm]
+        if kev_membership.follower.snapshot is None:
+            kev_membership.ensure(await fetch_kev_catalog())
+        matches = kev_membership.lookup(cve_id_norm)
 
-        print(f"🔍 Endpoint /kev/{cve_id} - Corres: {len(matches)}")
+        logger.debug("Endpoint /kev/%s - Corres: %s", cve_id, len(matches))
 
         return {
             "status": "success" if matches else "empty",
-            "catalogVersion": kev_catalog.get("catalogVersion"),
-            "dateReleased": kev_catalog.get("dateReleased"),
+            **kev_membership.meta,
             "count": len(matches),
             "matches": matches,
         }
     
     except Exception as e:
-        print(f"❌ Erreur dans /kev/{cve_id}: {e}")
+        logger.error("Erreur dans /kev/%s: %s", cve_id, e)
         raise HTTPException(status_code=500, detail=f"Erreur interne: {e}")
 
 
@@ -1322,7 +1701,7 @@ async def get_cve_stats_from_nvd() -> dict:
     nvd_url = "https://services.nvd.nist.gov/rest/json/cves/2.0"
     
     try:
-        print("🔍 Récupération des statistiques CVE depuis l'API NVD...")
+        logger.debug("Récupération des statistiques CVE depuis l'API NVD...")
         
         headers = {}
         if API_KEY:
@@ -1335,8 +1714,9 @@ async def get_cve_stats_from_nvd() -> dict:
         }
         
         async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
-            response = await client.get(nvd_url, params=params)
-            response.raise_for_status()
+            with track_upstream("nvd"):
+                response = await client.get(nvd_url, params=params)
+                response.raise_for_status()
             
             data = response.json()
             
@@ -1345,19 +1725,19 @@ async def get_cve_stats_from_nvd() -> dict:
                 "resultsPerPage": data.get("resultsPerPage", 0),
             }
             
-            print(f"✅ Statistiques CVE récupérées: {stats['totalResults']} CVE au total")
+            logger.debug("Statistiques CVE récupérées: %s CVE au total", stats['totalResults'])
             return stats
             
    
     except Exception as e:
-        print(f"❌ Erreur lors de la récupération des stats CVE: {e}")
+        logger.error("Erreur lors de la récupération des stats CVE: %s", e)
 
 
 
 async def get_kev_stats() -> dict:
     """Récupère les statistiques du catalogue KEV"""
     try:
-        print("🔍 Récupération des statistiques KEV...")
+        logger.debug("Récupération des statistiques KEV...")
         
         kev_catalog = await fetch_kev_catalog()
         vulnerabilities = kev_catalog.get("vulnerabilities", [])
@@ -1368,11 +1748,11 @@ async def get_kev_stats() -> dict:
         
         }
         
-        print(f"✅ Statistiques KEV récupérées: {stats['total_vulnerabilities']} vulnérabilités")
+        logger.debug("Statistiques KEV récupérées: %s vulnérabilités", stats['total_vulnerabilities'])
         return stats
         
     except Exception as e:
-        print(f"❌ Erreur lors de la récupération des stats KEV: {e}")
+        logger.error("Erreur lors de la récupération des stats KEV: %s", e)
         return {
             "total_vulnerabilities": 0,
      
@@ -1388,7 +1768,7 @@ async def get_global_stats():
     Utilise l'API NVD directe pour les CVE et le catalogue KEV pour les vulnérabilités exploitées.
     """
     try:
-        print("🔄 Calcul des statistiques globales...")
+        logger.debug("Calcul des statistiques globales...")
         
         # Récupérer les stats KEV
         kev_stats = await get_kev_stats()
@@ -1405,12 +1785,73 @@ async def get_global_stats():
         }
         
     except Exception as e:
-        print(f"❌ Erreur lors du calcul des statistiques globales: {e}")
+        logger.error("Erreur lors du calcul des statistiques globales: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des statistiques: {e}")
 
 
 
 
+# --- Correspondance d'inventaire ---
+class InventoryMatchRequest(BaseModel):
+    cpes: List[str] = Field(..., description="CPE 2.3 installées (ex: cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*)")
+    include_epss: bool = Field(True, description="Ajouter les scores EPSS des CVE trouvés")
+
+@app.post("/inventory/match", summary="CVE affectant un inventaire de produits (CPE)")
+async def inventory_match(request: InventoryMatchRequest):
+    """
+    Retourne, pour chaque CPE installée, les CVE dont un critère vulnérable correspond
+    (éditeur/produit, puis version exacte ou bornes de version), avec le contexte KEV et EPSS.
+    
+    La correspondance porte sur les CVE présents dans l'index CPE local, alimenté par les CVE
+    déjà récupérés depuis NVD. Chaque actif n'est comparé qu'aux critères de son produit.
+    """
+    if len(request.cpes) > INVENTORY_MAX_CPES:
+        raise HTTPException(status_code=400, detail=f"Maximum {INVENTORY_MAX_CPES} CPE par requête")
+
+    matches = cpe_index.match_many(request.cpes)
+    cve_ids = sorted({cve_id for per_cve in matches.values() for cve_id in per_cve})
+
+    kev_data = await fetch_kev_catalog()
+    kev_map = {v["cveID"]: v for v in kev_data.get("vulnerabilities", [])}
+    epss_map = await fetch_epss_scores(cve_ids) if request.include_epss else {}
+
+    assets = []
+    invalid = []
+    for uri, per_cve in matches.items():
+        if parse_cpe(uri) is None:
+            invalid.append(uri)
+            continue
+        results = []
+        for cve_id, entry in per_cve.items():
+            kev = kev_map.get(cve_id)
+            epss = epss_map.get(cve_id) or {}
+            results.append({
+                "cveId": cve_id,
+                "criteria": entry["criteria"],
+                **{k: entry[k] for k in ("versionStartIncluding", "versionStartExcluding",
+                                         "versionEndIncluding", "versionEndExcluding") if k in entry},
+                "isExploited": kev is not None,
+                "knownRansomwareCampaignUse": kev.get("knownRansomwareCampaignUse") if kev else None,
+                "epss_score": epss.get("epss_score"),
+                "epss_percentile": epss.get("epss_percentile"),
+            })
+        # KEV d'abord, puis EPSS décroissant
+        results.sort(key=lambda r: (not r["isExploited"], -(r["epss_score"] or 0), r["cveId"]))
+        assets.append({"cpe": uri, "count": len(results), "matches": results})
+
+    return {
+        "assets": assets,
+        "invalidCpes": invalid,
+        "summary": {
+            "assets": len(assets),
+            "assetsMatched": sum(1 for a in assets if a["count"]),
+            "uniqueCves": len(cve_ids),
+            "kevCves": sum(1 for c in cve_ids if c in kev_map),
+        },
+        "indexedCves": len(cpe_index),
+        "indexLoading": not cpe_index.loaded,  # index encore partiel juste après le démarrage
+    }
+
 # --- Statistiques ---
 def get_cvss_score(cve: dict) -> float | None:
     """Retourne le score CVSS si disponible, sinon None."""
@@ -1431,33 +1872,49 @@ async def stats_week(days: int = Query(7, description="Nombre de jours", ge=1, l
     - **days**: Nombre de jours à analyser (1-365)
     """
     try:
+        # Réponse immédiate depuis les rollups journaliers s'ils couvrent toute la fenêtre
+        rollup = await rollup_store.window(days)
+        if rollup:
+            return {k: rollup[k] for k in ("startDate", "endDate", "totalCVE", "totalKEV", "totalCritical", "totalActivelyExploited")}
+
         end = datetime.now(timezone.utc)
-        start = end - timedelta(days=days)
+        start = window_start(days, end)  # mêmes jours calendaires que les rollups
         
-        # Récupérer les CVE publiées dans la période
-        results = searchCVE(pubStartDate=start, pubEndDate=end, key=API_KEY)
-        cves_output = [await cve_to_dict_full(cve) for cve in results]
-
-        total_cve = len(cves_output)
-        total_kev = sum(1 for cve in cves_output if cve.get("isExploited"))
-        total_actively_exploited = sum(1 for cve in cves_output if cve.get("activelyExploited"))
-        total_critical = sum(
-            1 for cve in cves_output
-            if (score := get_cvss_score(cve)) is not None and score >= 9
-        )
+        # Récupérer les CVE publiées dans la période, sans bloquer la boucle (fenêtres NVD de 120 jours au plus)
+        results = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=120), end)
+            results += await fetch_all_cves({"pubStartDate": chunk_start, "pubEndDate": chunk_end})
+            chunk_start = chunk_end + timedelta(milliseconds=1)  # bornes NVD incluses
+
+        # Agrégats calculés sur les seuls champs utiles (score, KEV, EPSS), sans enrichissement complet
+        kev_data = await fetch_kev_catalog()
+        kev_ids = {v["cveID"] for v in kev_data.get("vulnerabilities", [])}
+        stats = await compute_window_stats(results, kev_ids)
 
         return {
             "startDate": start.isoformat(),
             "endDate": end.isoformat(),
-            "totalCVE": total_cve,
-            "totalKEV": total_kev,
-            "totalCritical": total_critical,
-            "totalActivelyExploited": total_actively_exploited
+            **stats
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des statistiques : {e}")
 
+@app.get("/stats/rollup", summary="Statistiques détaillées depuis les rollups journaliers")
+async def stats_rollup(days: int = Query(7, description="Nombre de jours", ge=1, le=365)):
+    """
+    Retourne les compteurs agrégés (sévérité, KEV, exploitation active, niveau de confiance,
+    histogramme des scores) en sommant les rollups précalculés par jour de publication.
+    
+    - **days**: Nombre de jours à analyser (1-365)
+    """
+    rollup = await rollup_store.window(days)
+    if rollup is None:
+        raise HTTPException(status_code=503, detail="Rollups journaliers en cours de construction pour cette fenêtre")
+    return rollup
+
 # --- Gestion du cache ---
 @app.delete("/cache/clear", summary="Vider le cache")
 async def clear_cache(pattern: str = Query("*", description="Pattern des clés à supprimer")):
@@ -1489,7 +1946,13 @@ async def cache_info():
             "used_memory": info.get("used_memory_human"),
             "connected_clients": info.get("connected_clients"),
             "keyspace_hits": info.get("keyspace_hits"),
-            "keyspace_misses": info.get("keyspace_misses")
+            "keyspace_misses": info.get("keyspace_misses"),
+            "prewarm": cache_prewarmer.stats(),
+            "evidenceSources": evidence_registry.stats(),
+            "sharedData": hot_data.stats(),
+            "documentStore": cve_store.stats(),
+            "recentPartitions": recent_partitions.stats(),
+            "budgets": await cache_budgets.stats(),
         }
     except Exception as e:
         return {"error": str(e)}
@@ -1511,5 +1974,37 @@ async def health_check():
     return {
         "status": "healthy",
         "redis": redis_status,
+        "worker": leader.stats(),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
+
+@app.get("/health/live", summary="Sonde de vivacité")
+async def liveness():
+    """Le processus répond : aucune dépendance vérifiée (Redis, sources externes)."""
+    return {"status": "alive", "uptimeSeconds": round(time.time() - startup_state["startedAt"], 1)}
+
+@app.get("/health/ready", summary="Sonde de disponibilité")
+async def readiness():
+    """
+    Prêt à servir : Redis répond et l'index KEV est chargé (instantané local ou catalogue).
+    Retourne 503 sinon. L'âge des données est indiqué sans bloquer la disponibilité.
+    """
+    redis_ok = await redis_client.ping()
+    data = hot_data.freshness()
+    ready = redis_ok and data["kev"]["available"]
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "not_ready",
+            "redis": "connected" if redis_ok else "unreachable",
+            "backgroundServices": "running" if startup_state["backgroundReady"] else "starting",
+            "data": data,
+            "worker": leader.stats(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        status_code=200 if ready else 503,
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques au format texte Prometheus (latences, cache, sources externes), étiquetées par worker"""
+    return PlainTextResponse(await worker_metrics.render(), media_type="text/plain; version=0.0.4")
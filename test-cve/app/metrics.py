@@ -0,0 +1,179 @@
+import functools
+import time
+from contextlib import contextmanager
+
+from timing import record_stage
+
+# Bornes (secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.values: dict = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def export(self) -> list:
+        """Valeurs du processus, sérialisables en JSON : [[étiquettes], valeur]"""
+        return [[list(key), value] for key, value in self.values.items()]
+
+    def _series(self, workers: dict) -> tuple:
+        """(noms d'étiquettes, séries triées) de tous les workers, étiquetées par worker"""
+        series = [((worker, *key), value)
+                  for worker, exported in workers.items() for key, value in exported.get(self.name, [])]
+        return ("worker", *self.label_names), sorted(series, key=lambda s: s[0])
+
+    def render(self, workers: dict) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        names, series = self._series(workers)
+        for key, value in series:
+            lines.append(f"{self.name}{_format_labels(names, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state["counts"][i] += 1
+                break
+        state["sum"] += value
+        state["count"] += 1
+
+    def render(self, workers: dict) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        names, series = self._series(workers)
+        for key, state in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = _format_labels(names, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(names, key)} {state['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(names, key)} {state['count']}")
+        return lines
+
+
+REGISTRY: list = []
+
+
+def export_metrics() -> dict:
+    """Valeurs de toutes les métriques du processus : {nom: [[étiquettes], valeur]}"""
+    return {metric.name: metric.export() for metric in REGISTRY}
+
+
+def render_metrics(workers: dict) -> str:
+    """Métriques de plusieurs workers ({worker: export_metrics()}) au format texte Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(workers))
+    return "\n".join(lines) + "\n"
+
+
+# --- Métriques de l'application ---
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Latence des requêtes HTTP par route", ("route", "method", "status")
+)
+cache_requests = Counter("cache_requests_total", "Lectures du cache par préfixe de clé", ("prefix", "result"))
+cache_written_bytes = Counter("cache_written_bytes_total", "Octets JSON écrits dans le cache par préfixe", ("prefix",))
+upstream_duration = Histogram(
+    "upstream_request_duration_seconds", "Latence des appels aux sources externes", ("upstream",)
+)
+upstream_requests = Counter("upstream_requests_total", "Appels aux sources externes par issue", ("upstream", "outcome"))
+rate_limiter_wait = Histogram(
+    "nvd_rate_limiter_wait_seconds", "Attente imposée par le limiteur de débit NVD", (),
+    buckets=(0.0, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+)
+enrichment_in_flight = Gauge("enrichment_in_flight", "Enrichissements de CVE en cours")
+
+
+def cache_prefix(key: str) -> str:
+    """cve_advisory:get_cve_by_id:cve_id:X -> get_cve_by_id"""
+    parts = key.split(":", 2)
+    return parts[1] if len(parts) > 1 else key
+
+
+def record_cache_read(key: str, hit: bool) -> None:
+    cache_requests.inc(prefix=cache_prefix(key), result="hit" if hit else "miss")
+
+
+@contextmanager
+def track_upstream(upstream: str):
+    """Mesurer un appel externe ; une exception qui traverse le bloc compte comme une erreur"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        duration = time.perf_counter() - start
+        upstream_duration.observe(duration, upstream=upstream)
+        record_stage(f"upstream.{upstream}", duration)
+        upstream_requests.inc(upstream=upstream, outcome=outcome)
+
+
+def track_in_flight(gauge: Gauge):
+    """Décorateur : nombre d'exécutions en cours d'une coroutine"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            gauge.inc()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                gauge.dec()
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import httpx
+from nvdlib.classes import CVE
+
+from metrics import rate_limiter_wait, track_upstream
+
+NVD_API = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+API_KEY = os.getenv("API_KEY")
+NVD_MAX_PAGE = 2000  # resultsPerPage maximal accepté par NVD
+
+# Paramètres booléens NVD : présents sans valeur (ex: "hasKev")
+FLAG_PARAMS = {"hasKev", "hasCertAlerts", "hasCertNotes", "hasOval", "isVulnerable", "noRejected", "keywordExactMatch"}
+DATE_PARAMS = {"pubStartDate", "pubEndDate", "lastModStartDate", "lastModEndDate"}
+
+
+class NvdRateLimiter:
+    """Espacement minimal entre deux appels NVD (50 req/30 s avec clé, 5 req/30 s sans)"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self) -> float:
+        """Attendre le prochain créneau et retourner le temps d'attente"""
+        async with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.next_slot - now)
+            self.next_slot = max(now, self.next_slot) + self.min_interval
+        rate_limiter_wait.observe(delay)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+nvd_rate_limiter = NvdRateLimiter(float(os.getenv("NVD_MIN_INTERVAL", 0.6 if API_KEY else 6)))
+
+
+def _format_date(value) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Format accepté par nvdlib : "YYYY-MM-DD HH:MM"
+    return datetime.strptime(value, "%Y-%m-%d %H:%M").isoformat()
+
+
+def build_query(params: dict) -> str:
+    """Traduire des paramètres au format nvdlib (searchCVE) en query string NVD 2.0"""
+    parts = []
+    for k, v in params.items():
+        if v is None or k in ("key", "limit"):
+            continue
+        if k in FLAG_PARAMS:
+            if v:
+                parts.append(k)
+            continue
+        if k in DATE_PARAMS:
+            v = _format_date(v)
+        parts.append(f"{k}={quote(str(v), safe='')}")
+    return "&".join(parts)
+
+
+def _wrap(value):
+    """Objets imbriqués accessibles par attribut, comme les objets renvoyés par searchCVE"""
+    if isinstance(value, dict):
+        return CVE({k: _wrap(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_wrap(v) for v in value]
+    return value
+
+
+def convert_raw(raw: dict):
+    """Transformer le JSON brut d'un CVE en objet nvdlib.classes.CVE (mêmes attributs que searchCVE)"""
+    cve = _wrap(raw)
+    cve.getvars()  # score, v31vector, cwe, cpe, url... calculés par nvdlib
+    return cve
+
+
+async def fetch_cve_page(params: dict, start_index: int = 0, results_per_page: int = NVD_MAX_PAGE) -> dict:
+    """Récupérer une seule page de résultats NVD à partir de startIndex"""
+    query = build_query(params)
+    query += f"{'&' if query else ''}startIndex={start_index}&resultsPerPage={min(results_per_page, NVD_MAX_PAGE)}"
+
+    headers = {"apiKey": API_KEY} if API_KEY else {}
+    await nvd_rate_limiter.wait()
+    async with httpx.AsyncClient(timeout=30.0, headers=headers) as client:
+        with track_upstream("nvd"):
+            response = await client.get(f"{NVD_API}?{query}")
+            response.raise_for_status()
+        data = response.json()
+
+    raw = [item["cve"] for item in data.get("vulnerabilities", [])]
+    return {
+        "total": data.get("totalResults", 0),
+        "startIndex": data.get("startIndex", start_index),
+        "raw": raw,
+        "cves": [convert_raw(r) for r in raw],
+    }
+
+
+async def fetch_all_cves(params: dict) -> list:
+    """Tous les CVE d'une requête NVD (objets nvdlib), page par page via le limiteur de débit partagé"""
+    cves, index = [], 0
+    while True:
+        page = await fetch_cve_page(params, index)
+        cves.extend(page["cves"])
+        index += len(page["raw"])
+        if not page["raw"] or index >= page["total"]:
+            return cves
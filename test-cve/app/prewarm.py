@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+
+from app_logging import logger
+from leader import leader
+from redis_client import redis_client
+from cache_utils import cache_manager, access_tracker, run_tracked
+
+
+class CachePrewarmer:
+    """Recalcule en tâche de fond les clés de cache les plus consultées avant leur expiration"""
+
+    def __init__(self):
+        self.enabled = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+        self.interval = int(os.getenv("PREWARM_INTERVAL", 60))  # secondes entre deux cycles
+        self.top_n = int(os.getenv("PREWARM_TOP_N", 50))  # nombre de clés chaudes examinées
+        self.lead_time = int(os.getenv("PREWARM_LEAD_TIME", 300))  # rafraîchir si TTL restant < lead_time
+        self.budget = int(os.getenv("PREWARM_BUDGET", 10))  # recalculs (appels amont) max par cycle
+        self.min_score = float(os.getenv("PREWARM_MIN_SCORE", 1.0))  # en dessous : clé froide, ignorée
+        self.task: asyncio.Task | None = None
+        self.last_run: float | None = None
+        self.refreshed = 0
+        self.errors = 0
+
+    async def run_cycle(self) -> int:
+        """Exécuter un cycle de pré-chauffage et retourner le nombre de clés rafraîchies"""
+        # Les clés froides sont oubliées : elles ne coûteront plus d'appels amont
+        access_tracker.evict_cold(min_score=self.min_score)
+
+        refreshed = 0
+        for key, entry in access_tracker.hot_keys(self.top_n, self.min_score):
+            if refreshed >= self.budget:
+                logger.info("Budget de pré-chauffage atteint (%s recalculs)", self.budget)
+                break
+
+            remaining = await redis_client.ttl(key)
+            # None : Redis en erreur, clé ignorée plutôt que recalculée ; -1 : sans expiration
+            if remaining is None or remaining == -1 or remaining > self.lead_time:
+                continue
+
+            try:
+                value, degraded = await run_tracked(entry["refresher"])
+                if degraded:
+                    continue  # source en erreur : l'entrée actuelle vaut mieux qu'un repli
+                if not entry.get("writes_cache"):
+                    ttl = entry["ttl"](value) if callable(entry["ttl"]) else entry["ttl"]
+                    await cache_manager.set_cached_data(key, value, ttl)
+                refreshed += 1
+                self.refreshed += 1
+                logger.debug("Pré-chauffage: %s (TTL restant %ss)", key, remaining)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Erreur pré-chauffage %s: %s", key, e)
+
+        self.last_run = time.time()
+        return refreshed
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if leader.is_leader:  # un seul worker rafraîchit
+                    await self.run_cycle()
+            except Exception as e:
+                logger.warning("Erreur cycle de pré-chauffage: %s", e)
+
+    def start(self):
+        """Démarrer la tâche de fond"""
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._loop())
+            logger.info("Pré-chauffage du cache actif (top %s, budget %s/cycle)", self.top_n, self.budget)
+
+    async def stop(self):
+        """Arrêter la tâche de fond"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "interval": self.interval,
+            "top_n": self.top_n,
+            "budget_per_cycle": self.budget,
+            "last_run": self.last_run,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+            **access_tracker.stats(),
+        }
+
+
+# Instance globale
+cache_prewarmer = CachePrewarmer()
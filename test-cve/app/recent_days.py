@@ -0,0 +1,120 @@
+"""
+Cache des fenêtres de CVE récents par partitions journalières (date de publication UTC).
+
+Chaque jour est une partition : identifiants et dates de publication de ses CVE, dans l'ordre NVD.
+Un jour terminé (relevé après sa fin + RECENT_DAY_GRACE) est conservé RECENT_DAY_TTL ; le jour en
+cours n'est conservé que RECENT_TODAY_TTL et rafraîchi par le pré-chauffage. Une fenêtre
+(days, limit) réunit les `limit` CVE les plus récents en parcourant les partitions du jour en cours
+vers le plus ancien : seuls les jours absents sont demandés, par plages contiguës dont la longueur
+double à chaque plage (1, 2, 4... jours, au plus NVD_MAX_RANGE_DAYS), et le parcours s'arrête dès que
+`limit` CVE sont réunis. Le JSON brut est conservé aussi longtemps que la partition : les documents
+enrichis expirés sont recalculés sans rappeler NVD.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+from cache_utils import access_tracker, cache_manager
+from nvd_api import NVD_MAX_PAGE
+
+NVD_MAX_RANGE_DAYS = 120  # plage de publication maximale acceptée par NVD
+RECENT_DAY_TTL = int(os.getenv("RECENT_DAY_TTL", 14 * 86400))
+RECENT_TODAY_TTL = int(os.getenv("RECENT_TODAY_TTL", 900))
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+class RecentPartitions:
+    def __init__(self):
+        self.grace = int(os.getenv("RECENT_DAY_GRACE", 3600))  # publications tardives après minuit
+        self.fetch_page = None  # fetch_nvd_page de l'application (JSON brut mis en cache, index locaux)
+        self.fetched_days = 0
+        self.reused_days = 0
+
+    def key(self, day: date) -> str:
+        return f"cve_advisory:recent_day:{day.isoformat()}"
+
+    def ttl_for(self, partition: dict) -> int:
+        return RECENT_DAY_TTL if partition["complete"] else RECENT_TODAY_TTL
+
+    async def fetch_range(self, first: date, last: date) -> dict:
+        """Relever les jours first..last (une requête NVD paginée) et écrire leurs partitions"""
+        now = datetime.now(timezone.utc)
+        params = {"pubStartDate": day_start(first), "pubEndDate": min(day_start(last + timedelta(days=1)), now)}
+        by_day = {first + timedelta(days=i): [] for i in range((last - first).days + 1)}
+        index = 0
+        while True:
+            page = await self.fetch_page(params, index, NVD_MAX_PAGE, raw_ttl=RECENT_DAY_TTL)
+            for raw in page["raw"]:
+                entries = by_day.get(date.fromisoformat(raw["published"][:10]))
+                if entries is not None:
+                    entries.append([raw["id"], raw["published"]])
+            index += len(page["raw"])
+            if not page["raw"] or index >= page["total"]:
+                break
+
+        partitions = {}
+        for day, entries in by_day.items():
+            complete = now >= day_start(day + timedelta(days=1)) + timedelta(seconds=self.grace)
+            partitions[day] = {"date": day.isoformat(), "fetchedAt": now.timestamp(), "complete": complete,
+                               "cves": entries}
+        for complete in (True, False):
+            group = {self.key(d): p for d, p in partitions.items() if p["complete"] is complete}
+            if group:
+                await cache_manager.set_cached_many(group, RECENT_DAY_TTL if complete else RECENT_TODAY_TTL)
+        self.fetched_days += len(partitions)
+        return partitions
+
+    async def refresh_day(self, day: date) -> dict:
+        """Recalcul d'une partition (pré-chauffage du jour en cours)"""
+        return (await self.fetch_range(day, day))[day]
+
+    async def window(self, days: int, limit: int, force_refresh: bool = False) -> tuple:
+        """
+        (début, fin, [[identifiant, publication], ...]) : les `limit` CVE les plus récents publiés
+        depuis now - days, dans l'ordre de publication. force_refresh redemande les jours non terminés.
+        """
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=days)
+        all_days = [start.date() + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)]
+        cached = await cache_manager.get_cached_many([self.key(d) for d in all_days])
+
+        partitions = {}
+        for day, partition in zip(all_days, cached):
+            if partition is not None and not (force_refresh and not partition["complete"]):
+                partitions[day] = partition
+            if partition is None or not partition["complete"]:
+                # Seuls les jours non terminés sont à rafraîchir avant expiration
+                access_tracker.record(self.key(day), lambda day=day: self.refresh_day(day), self.ttl_for,
+                                      hit=partition is not None, writes_cache=True)
+
+        since = start.strftime("%Y-%m-%dT%H:%M:%S")
+        selected = []  # du plus récent au plus ancien
+        span = 1  # longueur de la prochaine plage demandée à NVD
+        for i in range(len(all_days) - 1, -1, -1):
+            if len(selected) >= limit:
+                break
+            day = all_days[i]
+            if day in partitions:
+                self.reused_days += 1
+            else:
+                # Jours absents contigus vers le passé, au plus `span` : une seule plage NVD
+                run = [day]
+                for earlier in reversed(all_days[:i]):
+                    if earlier in partitions or len(run) >= span:
+                        break
+                    run.append(earlier)
+                span = min(span * 2, NVD_MAX_RANGE_DAYS)
+                partitions.update(await self.fetch_range(run[-1], run[0]))
+            newest_first = sorted(partitions[day]["cves"], key=lambda e: e[1], reverse=True)
+            selected.extend(e for e in newest_first if e[1][:19] >= since)
+        return start, end, selected[:limit][::-1]
+
+    def stats(self) -> dict:
+        return {"dayTtl": RECENT_DAY_TTL, "todayTtl": RECENT_TODAY_TTL,
+                "fetchedDays": self.fetched_days, "reusedDays": self.reused_days}
+
+
+# Instance globale
+recent_partitions = RecentPartitions()
@@ -0,0 +1,97 @@
+"""
+Forme compacte des CVE enrichis, stockée dans le magasin de documents : les champs nuls sont omis.
+FULL_FIELDS ne fixe que l'ordre des clés et les valeurs nulles de la forme complète ; un champ
+ajouté par cve_to_dict_full sans y figurer est conservé tel quel, en fin de document.
+
+CVERecord est la représentation en mémoire correspondante : un objet à slots dont les champs nuls
+ne sont jamais affectés (voir bench/bench_records.py pour la mémoire d'une fenêtre de 30 jours).
+"""
+
+# Ordre des clés produites par cve_to_dict_full (forme complète historique)
+FULL_FIELDS = (
+    "id", "sourceIdentifier", "url", "published", "lastModified", "vulnStatus",
+    "descriptions", "references", "cwe", "cpe",
+    "v31vector", "v30vector", "v2vector",
+    "v31exploitability", "v30exploitability", "v2exploitability",
+    "v31impactScore", "v30impactScore", "v2impactScore",
+    "score",
+    "v31attackVector", "v30attackVector", "v2accessVector",
+    "v31attackComplexity", "v30attackComplexity", "v2accessComplexity",
+    "v31confidentialityImpact", "v30confidentialityImpact", "v2confidentialityImpact",
+    "v31integrityImpact", "v30integrityImpact", "v2integrityImpact",
+    "v31availabilityImpact", "v30availabilityImpact", "v2availabilityImpact",
+    "isExploited", "vendorProject", "product", "vulnerabilityName", "exploitAdd",
+    "actionDue", "requiredAction", "kevShortDescription", "knownRansomwareCampaignUse",
+    "epss_score", "epss_percentile", "epss_status",
+    "exploit_public", "evidence", "evidence_status",
+    "confidenceLevel", "activelyExploited",
+    "profileTitle", "profileDescription", "profileTags", "profileSynthScore",
+)
+
+_NULL_DOC = dict.fromkeys(FULL_FIELDS)
+
+
+class CVERecord:
+    """
+    CVE enrichi compact : un slot par champ de FULL_FIELDS, seuls les champs non nuls sont affectés.
+    Les champs hors FULL_FIELDS sont gardés dans _extra (None s'il n'y en a aucun).
+    """
+
+    __slots__ = FULL_FIELDS + ("_present", "_extra")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CVERecord":
+        """Construire depuis la forme complète ou compacte"""
+        record = cls.__new__(cls)
+        present = []
+        extra = None
+        for field, value in data.items():
+            if value is None:
+                continue
+            if field in _FIELD_SET:
+                setattr(record, field, value)
+                present.append(field)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[field] = value
+        # Peu de combinaisons de champs présents : un tuple partagé par combinaison
+        present = tuple(present)
+        record._present = _PRESENT_SETS.setdefault(present, present)
+        record._extra = extra
+        return record
+
+    def get(self, field: str, default=None):
+        if field in _FIELD_SET:
+            return getattr(self, field, default)
+        return self._extra.get(field, default) if self._extra else default
+
+    def to_wire(self) -> dict:
+        """Forme compacte : les champs nuls sont omis"""
+        out = {field: getattr(self, field) for field in self._present}
+        if self._extra:
+            out.update(self._extra)
+        return out
+
+    def to_dict(self) -> dict:
+        """Forme complète historique (toutes les clés, None inclus), pour compatibilité"""
+        out = dict(_NULL_DOC)
+        for field in self._present:
+            out[field] = getattr(self, field)
+        if self._extra:
+            out.update(self._extra)
+        return out
+
+
+_FIELD_SET = frozenset(FULL_FIELDS)
+_PRESENT_SETS: dict = {}
+
+
+def to_wire(doc: dict) -> dict:
+    """Forme compacte : les champs nuls sont omis"""
+    return {field: value for field, value in doc.items() if value is not None}
+
+
+def expand_wire(data: dict) -> dict:
+    """Reconstituer la forme complète depuis la forme compacte (aucun champ n'est perdu)"""
+    return {**_NULL_DOC, **data}
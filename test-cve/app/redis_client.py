@@ -1,8 +1,31 @@
 import redis.asyncio as redis
+import base64
+import hashlib
 import json
 import os
+import time
+import zlib
 from typing import Any, Optional
 
+from app_logging import logger
+from metrics import cache_prefix, cache_written_bytes
+
+COMPRESSED_PREFIX = "z:"  # JSON compressé (zlib) encodé en base64 ; un JSON ne commence jamais par "z"
+HUPDATE_RETRIES = 5  # tentatives d'une lecture-écriture atomique de hash avant abandon
+
+def validators_for(serialized: str) -> dict:
+    """ETag (empreinte du JSON stocké) et date de stockage d'une entrée"""
+    return {"etag": hashlib.md5(serialized.encode()).hexdigest(), "storedAt": time.time()}
+
+def compress_payload(serialized: str) -> str:
+    return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(serialized.encode(), 6)).decode("ascii")
+
+def decode_payload(data: str) -> Any:
+    """JSON stocké, compressé ou non"""
+    if data.startswith(COMPRESSED_PREFIX):
+        data = zlib.decompress(base64.b64decode(data[len(COMPRESSED_PREFIX):])).decode()
+    return json.loads(data)
+
 class RedisClient:
     def __init__(self):
         self.redis_url = os.getenv("REDIS_URL")
@@ -21,19 +44,75 @@ class RedisClient:
         if self.client:
             await self.client.close()
 
-    async def set_json(self, key: str, value: Any, ttl: int = None) -> bool:
-        """Stocker un objet JSON avec TTL optionnel"""
+    async def set_json(self, key: str, value: Any, ttl: int = None, meta_key: str = None, admission=None) -> bool:
+        """
+        Stocker un objet JSON avec TTL optionnel (et ses validateurs HTTP sous meta_key).
+        admission (cache_budget) : valeur éventuellement compressée ou refusée, taille suivie par famille
+        """
         if not self.client:
             await self.connect()
         
         try:
             serialized = json.dumps(value, default=str)
-            if ttl:
-                return await self.client.setex(key, ttl, serialized)
-            else:
-                return await self.client.set(key, serialized)
+            cache_written_bytes.inc(len(serialized), prefix=cache_prefix(key))
+            payload = admission.prepare(key, serialized) if admission else serialized
+            if payload is None:
+                return False
+            if meta_key:
+                meta = json.dumps(validators_for(serialized))
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for k, v in ((key, payload), (meta_key, meta)):
+                        if ttl:
+                            pipe.setex(k, ttl, v)
+                        else:
+                            pipe.set(k, v)
+                    if admission:
+                        admission.track(pipe, key, len(payload) + len(meta), ttl)
+                    return all(await pipe.execute())
+            if not admission:
+                if ttl:
+                    return await self.client.setex(key, ttl, payload)
+                return await self.client.set(key, payload)
+            async with self.client.pipeline(transaction=False) as pipe:
+                if ttl:
+                    pipe.setex(key, ttl, payload)
+                else:
+                    pipe.set(key, payload)
+                admission.track(pipe, key, len(payload), ttl)
+                return (await pipe.execute())[0]
+        except Exception as e:
+            logger.error("Erreur Redis set_json: %s", e)
+            return False
+
+    async def set_json_many(self, mapping: dict, ttl: int = None, meta_suffix: str = None, admission=None) -> bool:
+        """Stocker plusieurs objets JSON en un seul aller-retour (pipeline), admission comme set_json"""
+        if not mapping:
+            return True
+        if not self.client:
+            await self.connect()
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    serialized = json.dumps(value, default=str)
+                    cache_written_bytes.inc(len(serialized), prefix=cache_prefix(key))
+                    payload = admission.prepare(key, serialized) if admission else serialized
+                    if payload is None:
+                        continue
+                    writes = [(key, payload)]
+                    if meta_suffix:
+                        writes.append((f"{key}{meta_suffix}", json.dumps(validators_for(serialized))))
+                    for k, v in writes:
+                        if ttl:
+                            pipe.setex(k, ttl, v)
+                        else:
+                            pipe.set(k, v)
+                    if admission:
+                        admission.track(pipe, key, sum(len(v) for _, v in writes), ttl)
+                await pipe.execute()
+            return True
         except Exception as e:
-            print(f"❌ Erreur Redis set_json: {e}")
+            logger.error("Erreur Redis set_json_many: %s", e)
             return False
 
     async def get_json(self, key: str) -> Optional[Any]:
@@ -44,12 +123,222 @@ class RedisClient:
         try:
             data = await self.client.get(key)
             if data:
-                return json.loads(data)
+                return decode_payload(data)
+            return None
+        except Exception as e:
+            logger.error("Erreur Redis get_json: %s", e)
             return None
+
+    async def get_json_if_exists(self, key: str, guard_key: str) -> Optional[Any]:
+        """Récupérer un petit objet JSON seulement si guard_key existe (sans lire guard_key)"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.exists(guard_key)
+                pipe.get(key)
+                exists, data = await pipe.execute()
+            return json.loads(data) if exists and data else None
         except Exception as e:
-            print(f"❌ Erreur Redis get_json: {e}")
+            logger.error("Erreur Redis get_json_if_exists: %s", e)
             return None
 
+    async def get_json_many(self, keys: list) -> list:
+        """Récupérer plusieurs objets JSON en un seul aller-retour (MGET)"""
+        if not keys:
+            return []
+        if not self.client:
+            await self.connect()
+        
+        try:
+            values = await self.client.mget(keys)
+            return [decode_payload(v) if v else None for v in values]
+        except Exception as e:
+            logger.error("Erreur Redis get_json_many: %s", e)
+            return [None] * len(keys)
+
+    async def hset_json(self, key: str, mapping: dict) -> bool:
+        """Stocker plusieurs champs JSON dans un hash"""
+        if not mapping:
+            return True
+        if not self.client:
+            await self.connect()
+        
+        try:
+            await self.client.hset(key, mapping={k: json.dumps(v, default=str) for k, v in mapping.items()})
+            return True
+        except Exception as e:
+            logger.error("Erreur Redis hset_json: %s", e)
+            return False
+
+    async def hgetall_json(self, key: str) -> dict:
+        """Récupérer tous les champs JSON d'un hash"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            data = await self.client.hgetall(key)
+            return {k: json.loads(v) for k, v in data.items()}
+        except Exception as e:
+            logger.error("Erreur Redis hgetall_json: %s", e)
+            return {}
+
+    async def hdel(self, key: str, fields: list) -> int:
+        """Supprimer des champs d'un hash"""
+        if not fields:
+            return 0
+        if not self.client:
+            await self.connect()
+        
+        try:
+            return await self.client.hdel(key, *fields)
+        except Exception as e:
+            logger.error("Erreur Redis hdel: %s", e)
+            return 0
+
+    async def hscan_json(self, key: str, count: int = 500):
+        """Parcourir un hash par lots (HSCAN) : {champ: objet JSON} par lot, sans tout charger d'un coup"""
+        if not self.client:
+            await self.connect()
+        
+        cursor = 0
+        while True:
+            try:
+                cursor, data = await self.client.hscan(key, cursor, count=count)
+            except Exception as e:
+                logger.error("Erreur Redis hscan_json: %s", e)
+                return
+            if data:
+                yield {k: json.loads(v) for k, v in data.items()}
+            if cursor == 0:
+                return
+
+    async def hmget_json(self, key: str, fields: list) -> list:
+        """Récupérer plusieurs champs JSON d'un hash en un seul aller-retour"""
+        if not fields:
+            return []
+        if not self.client:
+            await self.connect()
+        
+        try:
+            values = await self.client.hmget(key, fields)
+            return [json.loads(v) if v else None for v in values]
+        except Exception as e:
+            logger.error("Erreur Redis hmget_json: %s", e)
+            return [None] * len(fields)
+
+    async def hupdate_json(self, key: str, fields: list, compute, stream_key: str = None, minid: str = None):
+        """
+        Lire des champs JSON d'un hash puis écrire atomiquement (WATCH/MULTI, rejoué si le hash change
+        entre la lecture et l'écriture) : compute(valeurs) -> (champs à écrire, entrées du stream stream_key).
+        Retourne les entrées ajoutées au stream, None en cas d'échec.
+        """
+        if not self.client:
+            await self.connect()
+
+        for _ in range(HUPDATE_RETRIES):
+            try:
+                async with self.client.pipeline(transaction=True) as pipe:
+                    await pipe.watch(key)
+                    values = await pipe.hmget(key, fields)
+                    updates, entries = compute([json.loads(v) if v else None for v in values])
+                    pipe.multi()
+                    if updates:
+                        pipe.hset(key, mapping={k: json.dumps(v, default=str) for k, v in updates.items()})
+                    for entry in entries:
+                        pipe.xadd(stream_key, {"data": json.dumps(entry, default=str)}, minid=minid,
+                                  approximate=minid is not None)
+                    await pipe.execute()
+                    return entries
+            except redis.WatchError:
+                continue
+            except Exception as e:
+                logger.error("Erreur Redis hupdate_json: %s", e)
+                return None
+        logger.warning("Redis hupdate_json: %s modifié en continu, écriture abandonnée", key)
+        return None
+
+    async def xadd_json_many(self, key: str, entries: list, minid: str = None) -> list:
+        """Ajouter des entrées JSON à un stream (pipeline), en purgeant celles antérieures à minid"""
+        if not entries:
+            return []
+        if not self.client:
+            await self.connect()
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for entry in entries:
+                    pipe.xadd(key, {"data": json.dumps(entry, default=str)}, minid=minid, approximate=minid is not None)
+                return await pipe.execute()
+        except Exception as e:
+            logger.error("Erreur Redis xadd_json_many: %s", e)
+            return []
+
+    async def xrange_json(self, key: str, min_id: str = "-", max_id: str = "+", count: int = None) -> list:
+        """Lire des entrées JSON d'un stream : [(id, entrée), ...]"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            rows = await self.client.xrange(key, min=min_id, max=max_id, count=count)
+            return [(entry_id, json.loads(fields["data"])) for entry_id, fields in rows]
+        except Exception as e:
+            logger.error("Erreur Redis xrange_json: %s", e)
+            return []
+
+    async def stream_last_id(self, key: str) -> Optional[str]:
+        """Identifiant de la dernière entrée d'un stream (None s'il est vide)"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            rows = await self.client.xrevrange(key, count=1)
+            return rows[0][0] if rows else None
+        except Exception as e:
+            logger.error("Erreur Redis stream_last_id: %s", e)
+            return None
+
+    async def set_if_absent(self, key: str, value: str, ttl: int) -> bool:
+        """SET NX avec expiration : True si la clé a été créée"""
+        if not self.client:
+            await self.connect()
+
+        try:
+            return bool(await self.client.set(key, value, nx=True, ex=ttl))
+        except Exception as e:
+            logger.error("Erreur Redis set_if_absent: %s", e)
+            return False
+
+    async def _if_owner(self, key: str, value: str, apply) -> bool:
+        """Appliquer apply(pipe) seulement si la clé vaut encore value (WATCH/MULTI, sans script Lua)"""
+        if not self.client:
+            await self.connect()
+
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                if await pipe.get(key) != value:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                apply(pipe)
+                await pipe.execute()
+                return True
+        except redis.WatchError:
+            return False
+        except Exception as e:
+            logger.error("Erreur Redis _if_owner: %s", e)
+            return False
+
+    async def expire_if_owner(self, key: str, value: str, ttl: int) -> bool:
+        """Prolonger une clé dont on est propriétaire (verrou)"""
+        return await self._if_owner(key, value, lambda pipe: pipe.expire(key, ttl))
+
+    async def delete_if_owner(self, key: str, value: str) -> bool:
+        """Supprimer une clé dont on est propriétaire (verrou)"""
+        return await self._if_owner(key, value, lambda pipe: pipe.delete(key))
+
     async def delete(self, key: str) -> bool:
         """Supprimer une clé"""
         if not self.client:
@@ -58,7 +347,77 @@ class RedisClient:
         try:
             return await self.client.delete(key) > 0
         except Exception as e:
-            print(f"❌ Erreur Redis delete: {e}")
+            logger.error("Erreur Redis delete: %s", e)
+            return False
+
+    async def delete_many(self, keys: list) -> int:
+        """Supprimer plusieurs clés en une commande"""
+        if not keys:
+            return 0
+        if not self.client:
+            await self.connect()
+        
+        try:
+            return await self.client.delete(*keys)
+        except Exception as e:
+            logger.error("Erreur Redis delete_many: %s", e)
+            return 0
+
+    async def exists_many(self, keys: list) -> list:
+        """Présence de chaque clé, en un seul aller-retour (pipeline)"""
+        if not keys:
+            return []
+        if not self.client:
+            await self.connect()
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.exists(key)
+                return [bool(n) for n in await pipe.execute()]
+        except Exception as e:
+            logger.error("Erreur Redis exists_many: %s", e)
+            return [True] * len(keys)
+
+    async def zrange_by_score(self, key: str, min_score="-inf", max_score="+inf", count: int = None) -> list:
+        """Membres d'un sorted set dont le score est dans l'intervalle, par score croissant (les count premiers)"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            if count is not None:
+                return await self.client.zrangebyscore(key, min_score, max_score, start=0, num=count)
+            return await self.client.zrangebyscore(key, min_score, max_score)
+        except Exception as e:
+            logger.error("Erreur Redis zrange_by_score: %s", e)
+            return []
+
+    async def forget_members(self, zset_key: str, hash_key: str, members: list) -> bool:
+        """Retirer des membres d'un sorted set et les champs correspondants d'un hash"""
+        if not members:
+            return True
+        if not self.client:
+            await self.connect()
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.zrem(zset_key, *members)
+                pipe.hdel(hash_key, *members)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error("Erreur Redis forget_members: %s", e)
+            return False
+
+    async def ping(self) -> bool:
+        """Vérifier que le serveur Redis répond"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            return bool(await self.client.ping())
+        except Exception as e:
+            logger.error("Erreur Redis ping: %s", e)
             return False
 
     async def exists(self, key: str) -> bool:
@@ -69,9 +428,20 @@ class RedisClient:
         try:
             return await self.client.exists(key) > 0
         except Exception as e:
-            print(f"❌ Erreur Redis exists: {e}")
+            logger.error("Erreur Redis exists: %s", e)
             return False
 
+    async def ttl(self, key: str) -> Optional[int]:
+        """Durée de vie restante d'une clé (-2 si absente, -1 si sans expiration, None si Redis est en erreur)"""
+        if not self.client:
+            await self.connect()
+        
+        try:
+            return await self.client.ttl(key)
+        except Exception as e:
+            logger.error("Erreur Redis ttl: %s", e)
+            return None
+
     async def keys(self, pattern: str = "*") -> list:
         """Lister les clés selon un pattern"""
         if not self.client:
@@ -80,7 +450,7 @@ class RedisClient:
         try:
             return await self.client.keys(pattern)
         except Exception as e:
-            print(f"❌ Erreur Redis keys: {e}")
+            logger.error("Erreur Redis keys: %s", e)
             return []
 
 # Instance globale
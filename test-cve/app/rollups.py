@@ -0,0 +1,282 @@
+import asyncio
+import os
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone
+
+import numpy as np
+
+from app_logging import logger
+from cache_utils import cache_manager
+from evidence import evidence_registry
+from leader import leader
+from nvd_api import fetch_all_cves
+from redis_client import redis_client
+from stats_engine import fetch_epss_scores
+from scoring import parse_score_field, score_batch
+
+ROLLUP_MAX_DAYS = 365
+
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW", "NONE"]
+CONFIDENCE_LEVELS = ["High", "Medium", "Low", "Unknown"]
+HISTOGRAM_BINS = 11  # scores CVSS 0 à 10, par tranche d'un point
+
+# Disposition fixe du vecteur de compteurs d'un jour : la somme d'une fenêtre est une somme de lignes
+FIELDS = (
+    ["total", "kev", "activelyExploited", "unscored"]
+    + [f"severity:{s}" for s in SEVERITIES]
+    + [f"confidence:{c}" for c in CONFIDENCE_LEVELS]
+    + [f"histogram:{b}" for b in range(HISTOGRAM_BINS)]
+)
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+
+ROLLUP_VERSION_KEY = "cve_advisory:rollup:version"
+ROLLUP_LAST_CHECK_KEY = "cve_advisory:rollup:last_check"
+MAX_RANGE_DAYS = 120  # plage lastModified maximale acceptée par NVD
+EXPLOIT_EPSS_THRESHOLD = 0.6  # hors KEV, une preuve d'exploit ne change la confiance qu'au-delà
+
+
+def rollup_key(day: str) -> str:
+    return f"cve_advisory:rollup:{day}"
+
+
+def window_days(days: int, end: datetime) -> list:
+    """Jours calendaires (UTC) d'une fenêtre, du plus récent au plus ancien : aujourd'hui et les days - 1 précédents"""
+    return [(end - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+
+def window_start(days: int, end: datetime) -> datetime:
+    """Début de la fenêtre : minuit UTC du plus ancien jour (mêmes bornes avec ou sans rollups)"""
+    return datetime.combine(end.date() - timedelta(days=days - 1), dt_time.min, tzinfo=timezone.utc)
+
+
+async def exploit_signals(cves, kev_ids: set, epss_map: dict) -> list:
+    """
+    exploit_public de chaque CVE, selon les règles de detect_public_exploit (KEV, ou preuve d'une source
+    déclarant un exploit). La preuve ne change la confiance que hors KEV avec un EPSS supérieur au seuil :
+    seuls ces CVE, peu nombreux, sont soumis aux sources de preuves.
+    """
+    flags = [getattr(c, "id", None) in kev_ids for c in cves]
+    candidates = [
+        i for i, c in enumerate(cves)
+        if not flags[i] and ((epss_map.get(getattr(c, "id", None)) or {}).get("epss_score") or 0) > EXPLOIT_EPSS_THRESHOLD
+    ]
+    found = await asyncio.gather(*(evidence_registry.collect(cves[i]) for i in candidates))
+    for i, sources in zip(candidates, found):
+        flags[i] = evidence_registry.signals_exploit(sources)
+    return flags
+
+
+def build_day_vector(cves, kev_ids: set, epss_map: dict, exploit_public: list) -> np.ndarray:
+    """Calculer le vecteur de compteurs d'un jour de publication"""
+    ids = [getattr(c, "id", None) for c in cves]
+    parsed = [parse_score_field(getattr(c, "score", None)) for c in cves]
+    n = len(ids)
+
+    # Mêmes règles que compute_confidence_level / compute_actively_exploited
+    batch = score_batch(
+        cvss_score=[p[0] for p in parsed],
+        cvss_severity=[p[1] for p in parsed],
+        epss=[(epss_map.get(cve_id) or {}).get("epss_score") for cve_id in ids],
+        is_kev=[cve_id in kev_ids for cve_id in ids],
+        exploit_public=exploit_public,
+        product=[None] * n,
+    )
+    scores = batch.cvss_score
+    severity = [str((getattr(c, "score", None) or [None, None, None])[2] or "NONE").upper() for c in cves]
+    severity = np.array(severity, dtype=object)
+
+    vector = np.zeros(len(FIELDS), dtype=np.int64)
+    vector[FIELD_INDEX["total"]] = n
+    vector[FIELD_INDEX["kev"]] = np.count_nonzero(batch.is_kev)
+    vector[FIELD_INDEX["activelyExploited"]] = np.count_nonzero(batch.actively_exploited)
+    vector[FIELD_INDEX["unscored"]] = np.count_nonzero(np.isnan(scores))
+    for s in SEVERITIES:
+        vector[FIELD_INDEX[f"severity:{s}"]] = np.count_nonzero(severity == s)
+    confidence = np.bincount(batch.confidence_code, minlength=len(CONFIDENCE_LEVELS))
+    for i, name in enumerate(CONFIDENCE_LEVELS):
+        vector[FIELD_INDEX[f"confidence:{name}"]] = confidence[i]
+
+    scored = scores[~np.isnan(scores)]
+    bins = np.clip(np.floor(scored).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    histogram = np.bincount(bins, minlength=HISTOGRAM_BINS)
+    vector[FIELD_INDEX["histogram:0"]:FIELD_INDEX["histogram:0"] + HISTOGRAM_BINS] = histogram
+    return vector
+
+
+def vector_to_summary(vector: np.ndarray) -> dict:
+    """Transformer un vecteur de compteurs en dictionnaire lisible"""
+    v = vector.tolist()
+    histogram = v[FIELD_INDEX["histogram:0"]:FIELD_INDEX["histogram:0"] + HISTOGRAM_BINS]
+    return {
+        "totalCVE": v[FIELD_INDEX["total"]],
+        "totalKEV": v[FIELD_INDEX["kev"]],
+        "totalCritical": histogram[9] + histogram[10],
+        "totalActivelyExploited": v[FIELD_INDEX["activelyExploited"]],
+        "unscored": v[FIELD_INDEX["unscored"]],
+        "bySeverity": {s: v[FIELD_INDEX[f"severity:{s}"]] for s in SEVERITIES},
+        "byConfidence": {c: v[FIELD_INDEX[f"confidence:{c}"]] for c in CONFIDENCE_LEVELS},
+        "scoreHistogram": histogram,
+    }
+
+
+class RollupStore:
+    """Un petit enregistrement de compteurs par jour de publication, sommé pour toute fenêtre"""
+
+    def __init__(self):
+        self.enabled = os.getenv("ROLLUP_ENABLED", "true").lower() == "true"
+        self.interval = int(os.getenv("ROLLUP_INTERVAL", 900))  # secondes entre deux cycles
+        self.backfill_per_cycle = int(os.getenv("ROLLUP_BACKFILL_PER_CYCLE", 10))  # jours passés construits par cycle
+        self.hot_days = int(os.getenv("ROLLUP_HOT_DAYS", 2))  # jours récents toujours recalculés
+        self.days: dict = {}  # jour -> {"vector": np.ndarray, "lastModified": str}
+        self.kev_loader = None
+        self.version = None  # dernière génération publiée par le leader, connue de ce worker
+        self.task: asyncio.Task | None = None
+
+    # --- Lecture ---
+    async def _sync_version(self) -> None:
+        """Worker suiveur : oublier les jours en mémoire dès que le leader en a recalculé"""
+        record = await cache_manager.get_cached_data(ROLLUP_VERSION_KEY)
+        version = record and record.get("version")
+        if version != self.version:
+            self.days.clear()
+            self.version = version
+
+    async def _load_days(self, days: list) -> None:
+        missing = [d for d in days if d not in self.days]
+        if not missing:
+            return
+        records = await cache_manager.get_cached_many([rollup_key(d) for d in missing])
+        for day, record in zip(missing, records):
+            if record:
+                self.days[day] = {
+                    "vector": np.array(record["vector"], dtype=np.int64),
+                    "lastModified": record.get("lastModified"),
+                }
+
+    async def window(self, days: int, end: datetime = None) -> dict | None:
+        """Agrégats des `days` derniers jours de publication, ou None si un jour manque encore"""
+        end = end or datetime.now(timezone.utc)
+        day_list = window_days(days, end)
+        await self._sync_version()
+        await self._load_days(day_list)
+        if any(d not in self.days for d in day_list):
+            return None
+
+        total = np.sum([self.days[d]["vector"] for d in day_list], axis=0)
+        return {
+            "startDate": window_start(days, end).isoformat(),
+            "endDate": end.isoformat(),
+            **vector_to_summary(total),
+        }
+
+    # --- Construction ---
+    async def build_day(self, day: str, kev_ids: set) -> None:
+        start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        end = start + timedelta(days=1) - timedelta(milliseconds=1)
+        cves = await fetch_all_cves({"pubStartDate": start, "pubEndDate": end})
+
+        epss_map = await fetch_epss_scores([getattr(c, "id", None) for c in cves])
+        exploit_public = await exploit_signals(cves, kev_ids, epss_map)
+        vector = build_day_vector(cves, kev_ids, epss_map, exploit_public)
+        last_modified = max((getattr(c, "lastModified", "") or "" for c in cves), default=None)
+
+        self.days[day] = {"vector": vector, "lastModified": last_modified}
+        record = {"day": day, "fields": FIELDS, "vector": vector.tolist(),
+                  "lastModified": last_modified, "computedAt": time.time()}
+        # Les jours passés sont immuables : conservés tant qu'ils entrent dans la fenêtre maximale
+        await cache_manager.set_cached_data(rollup_key(day), record, ttl=(ROLLUP_MAX_DAYS + 1) * 86400)
+
+    async def _modified_days(self, now: datetime) -> set:
+        """
+        Jours de publication contenant des CVE modifiés depuis la dernière vérification, relevée dans Redis
+        (reprise après redémarrage ou changement de leader), par fenêtres d'au plus MAX_RANGE_DAYS.
+        """
+        last_check = await redis_client.get_json(ROLLUP_LAST_CHECK_KEY)
+        if not last_check:
+            return set()  # premier cycle : les jours sont construits d'après les données courantes
+
+        dirty = set()
+        start = datetime.fromisoformat(last_check)
+        while start < now:
+            end = min(start + timedelta(days=MAX_RANGE_DAYS), now)
+            modified = await fetch_all_cves({"lastModStartDate": start, "lastModEndDate": end})
+            for cve in modified:
+                day = str(getattr(cve, "published", "") or "")[:10]
+                known = self.days.get(day)
+                if known and (getattr(cve, "lastModified", "") or "") > (known["lastModified"] or ""):
+                    dirty.add(day)
+            start = end
+        return dirty
+
+    async def _save_modified_check(self, now: datetime) -> None:
+        await redis_client.set_json(ROLLUP_LAST_CHECK_KEY, now.isoformat())
+
+    async def run_cycle(self) -> list:
+        """Recalculer les jours récents, les jours modifiés, puis compléter l'historique manquant"""
+        now = datetime.now(timezone.utc)
+        kev_data = await self.kev_loader()
+        kev_ids = {v["cveID"] for v in kev_data.get("vulnerabilities", [])}
+
+        all_days = window_days(ROLLUP_MAX_DAYS, now)
+        await self._sync_version()
+        await self._load_days(all_days)
+
+        modified = [d for d in sorted(await self._modified_days(now), reverse=True) if d in all_days]
+        todo = list(all_days[:self.hot_days])
+        todo += [d for d in modified if d not in todo]
+        todo += [d for d in all_days if d not in self.days and d not in todo][:self.backfill_per_cycle]
+
+        built = []
+        for day in todo:
+            try:
+                await self.build_day(day, kev_ids)
+                built.append(day)
+            except Exception as e:
+                logger.warning("Erreur construction rollup %s: %s", day, e)
+
+        # Le relevé n'avance que si tous les jours modifiés ont été recalculés (sinon repris au cycle suivant)
+        if all(d in built for d in modified):
+            await self._save_modified_check(now)
+
+        # Oublier les jours sortis de la fenêtre maximale
+        for day in [d for d in self.days if d not in all_days]:
+            del self.days[day]
+
+        if built:
+            # Nouvelle génération : les autres workers rechargent leurs jours depuis Redis
+            self.version = time.time()
+            await cache_manager.set_cached_data(ROLLUP_VERSION_KEY, {"version": self.version},
+                                                ttl=(ROLLUP_MAX_DAYS + 1) * 86400)
+
+        logger.info("Rollups journaliers mis à jour (%s jours recalculés)", len(built))
+        return built
+
+    async def _loop(self):
+        while True:
+            try:
+                if leader.is_leader:  # un seul worker rafraîchit
+                    await self.run_cycle()
+            except Exception as e:
+                logger.warning("Erreur cycle rollups: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self, kev_loader):
+        """Démarrer la tâche de fond"""
+        self.kev_loader = kev_loader
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Arrêter la tâche de fond"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+# Instance globale
+rollup_store = RollupStore()
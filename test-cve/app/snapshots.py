@@ -0,0 +1,133 @@
+"""
+Instantanés en lecture seule des structures chaudes immuables, partagés entre workers.
+
+Le leader écrit chaque génération dans un répertoire (tableaux NumPy .npy non compressés et blocs
+d'octets), renommé atomiquement une fois complet, puis publie son chemin dans Redis. Les workers
+projettent les fichiers en mémoire (mmap) : les pages sont partagées via le cache du noyau, rien
+n'est décodé ni copié par processus. Par défaut le répertoire est sous /dev/shm (mémoire partagée) ;
+sur un volume persistant, les générations survivent aux redémarrages et servent au démarrage à froid.
+"""
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app_logging import logger
+from redis_client import redis_client
+
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "cve_advisory_snapshots"),
+)
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", 2))  # générations conservées par structure
+
+
+def pointer_key(name: str) -> str:
+    return f"cve_advisory:snapshot:{name}"
+
+
+class Snapshot:
+    """Génération ouverte : tableaux projetés en mémoire, blocs d'octets et métadonnées"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in self.meta["arrays"]
+        }
+        self.blobs = {name: self._map(os.path.join(path, f"{name}.bin")) for name in self.meta["blobs"]}
+
+    @staticmethod
+    def _map(path: str):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            # Le descripteur peut être fermé : la projection reste valide
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_snapshot(name: str, arrays: dict, blobs: dict, meta: dict) -> str:
+    """Écrire une génération complète puis la rendre visible par renommage atomique"""
+    root = os.path.join(SNAPSHOT_DIR, name)
+    os.makedirs(root, exist_ok=True)
+    generation = f"{int(time.time() * 1000)}-{os.getpid()}"
+    tmp = tempfile.mkdtemp(prefix=f".{generation}.", dir=root)
+    for array_name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{array_name}.npy"), np.ascontiguousarray(array))
+    for blob_name, data in blobs.items():
+        with open(os.path.join(tmp, f"{blob_name}.bin"), "wb") as f:
+            f.write(data)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({**meta, "generation": generation, "publishedAt": time.time(),
+                   "arrays": list(arrays), "blobs": list(blobs)}, f)
+    final = os.path.join(root, generation)
+    os.rename(tmp, final)
+
+    # Les générations remplacées peuvent être supprimées même si un worker les projette encore :
+    # le noyau conserve les pages jusqu'à la fin de la dernière projection
+    generations = sorted(d for d in os.listdir(root) if not d.startswith("."))
+    for old in generations[:-SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return final
+
+
+def latest_local(name: str) -> Snapshot | None:
+    """Dernière génération complète présente sur disque, sans Redis ni réseau"""
+    root = os.path.join(SNAPSHOT_DIR, name)
+    if not os.path.isdir(root):
+        return None
+    for generation in sorted((d for d in os.listdir(root) if not d.startswith(".")), reverse=True):
+        try:
+            return Snapshot(os.path.join(root, generation))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Instantané %s/%s illisible: %s", name, generation, e)
+    return None
+
+
+async def publish(name: str, arrays: dict, blobs: dict, meta: dict) -> dict:
+    """Écrire une génération (hors boucle d'événements) et annoncer son chemin aux workers"""
+    path = await asyncio.to_thread(write_snapshot, name, arrays, blobs, meta)
+    pointer = {"path": path, "generation": os.path.basename(path), **meta}
+    await redis_client.set_json(pointer_key(name), pointer)
+    return pointer
+
+
+class SnapshotFollower:
+    """Suivre la génération publiée d'une structure et la rouvrir quand elle change"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.generation = None
+        self.snapshot: Snapshot | None = None
+
+    def restore(self) -> Snapshot | None:
+        """Démarrage : rouvrir la dernière génération locale en attendant la publication suivante"""
+        snapshot = latest_local(self.name)
+        if snapshot is not None:
+            self.snapshot = snapshot
+            self.generation = os.path.basename(snapshot.path)
+        return snapshot
+
+    def age(self) -> float | None:
+        """Secondes depuis la publication de la génération courante"""
+        if self.snapshot is None or "publishedAt" not in self.snapshot.meta:
+            return None
+        return time.time() - self.snapshot.meta["publishedAt"]
+
+    async def poll(self) -> Snapshot | None:
+        """Nouvelle génération si elle a changé depuis le dernier appel, sinon None"""
+        pointer = await redis_client.get_json(pointer_key(self.name))
+        if not pointer or pointer.get("generation") == self.generation:
+            return None
+        if not os.path.isdir(pointer["path"]):
+            return None  # publiée sur un autre hôte (SNAPSHOT_DIR non partagé)
+        self.snapshot = await asyncio.to_thread(Snapshot, pointer["path"])
+        self.generation = pointer["generation"]
+        return self.snapshot
@@ -0,0 +1,107 @@
+import numpy as np
+import httpx
+
+from cache_utils import NEGATIVE_TTL, cache_manager, mark_degraded
+from app_logging import logger
+from epss_table import epss_table
+from metrics import track_upstream
+
+EPSS_API = "https://api.first.org/data/v1/epss"
+EPSS_BATCH_SIZE = 100  # nombre de CVE par requête EPSS groupée
+EPSS_TTL = 3600
+
+
+def epss_cache_key(cve_id: str) -> str:
+    """Clé de cache partagée avec get_epss_data_safe"""
+    return f"cve_advisory:get_epss_data_safe:{cve_id}"
+
+
+async def fetch_epss_scores(cve_ids: list) -> dict:
+    """Récupérer les scores EPSS de plusieurs CVE (table partagée, MGET sur le cache puis requêtes groupées)"""
+    if not cve_ids:
+        return {}
+
+    epss = epss_table.get_many(cve_ids)
+    remaining = [c for c in cve_ids if c not in epss]
+    if remaining:
+        cached = await cache_manager.get_cached_many([epss_cache_key(c) for c in remaining])
+        epss.update({c: v for c, v in zip(remaining, cached) if v is not None})
+    missing = [c for c in cve_ids if c not in epss]
+
+    if missing:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for i in range(0, len(missing), EPSS_BATCH_SIZE):
+                batch = missing[i:i + EPSS_BATCH_SIZE]
+                try:
+                    with track_upstream("epss"):
+                        r = await client.get(EPSS_API, params={"cve": ",".join(batch)})
+                        r.raise_for_status()
+                    rows = {row.get("cve"): row for row in r.json().get("data", [])}
+                except Exception as e:
+                    # Rien n'est mis en cache : les CVE du lot seront redemandés
+                    logger.warning("Erreur récupération EPSS groupée (%s CVE): %s", len(batch), e)
+                    mark_degraded("epss")
+                    continue
+
+                # Même forme que get_epss_data_safe ; CVE absents de la réponse : négatif confirmé
+                found, not_found = {}, {}
+                for cve_id in batch:
+                    row = rows.get(cve_id)
+                    if row:
+                        value = {
+                            "epss_score": float(row.get("epss") or 0),
+                            "epss_percentile": float(row.get("percentile") or 0),
+                            "epss_status": "ok",
+                        }
+                        found[epss_cache_key(cve_id)] = value
+                    else:
+                        value = {"epss_score": 0.0, "epss_percentile": 0.0, "epss_status": "not_found"}
+                        not_found[epss_cache_key(cve_id)] = value
+                    epss[cve_id] = value
+                if found:
+                    await cache_manager.set_cached_many(found, ttl=EPSS_TTL)
+                if not_found:
+                    await cache_manager.set_cached_many(not_found, ttl=NEGATIVE_TTL)
+
+    return epss
+
+
+def extract_columns(cves) -> dict:
+    """Extraire en colonnes les seuls champs utiles aux agrégats (id, score CVSS)"""
+    ids = []
+    scores = np.full(len(cves), np.nan, dtype=np.float64)
+    for i, cve in enumerate(cves):
+        ids.append(getattr(cve, "id", None))
+        score_field = getattr(cve, "score", None) or []
+        if len(score_field) > 1 and score_field[1] is not None:
+            try:
+                scores[i] = float(score_field[1])
+            except (TypeError, ValueError):
+                pass
+    return {"ids": ids, "scores": scores}
+
+
+def compute_aggregates(scores: np.ndarray, in_kev: np.ndarray, epss: np.ndarray) -> dict:
+    """Calcul vectorisé des compteurs (mêmes règles que compute_actively_exploited)"""
+    return {
+        "totalCVE": int(scores.size),
+        "totalKEV": int(np.count_nonzero(in_kev)),
+        "totalCritical": int(np.count_nonzero(scores >= 9)),
+        "totalActivelyExploited": int(np.count_nonzero(in_kev & (epss > 0.6))),
+    }
+
+
+async def compute_window_stats(cves, kev_ids: set) -> dict:
+    """Agrégats d'une fenêtre de CVE sans enrichissement social ni recherche d'exploit"""
+    columns = extract_columns(cves)
+    ids = columns["ids"]
+    in_kev = np.fromiter((cve_id in kev_ids for cve_id in ids), dtype=bool, count=len(ids))
+
+    # L'EPSS n'intervient que pour les CVE présents dans KEV : on ne le récupère que pour eux
+    kev_hits = [cve_id for cve_id, hit in zip(ids, in_kev) if hit]
+    epss_map = await fetch_epss_scores(kev_hits)
+    epss = np.zeros(len(ids), dtype=np.float64)
+    for i in np.flatnonzero(in_kev):
+        epss[i] = (epss_map.get(ids[i]) or {}).get("epss_score") or 0
+
+    return compute_aggregates(columns["scores"], in_kev, epss)
@@ -0,0 +1,358 @@
+import asyncio
+import gc
+import bisect
+import math
+import os
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+
+from app_logging import logger
+from index_updates import publish_updates, read_updates
+from redis_client import redis_client
+
+INDEX_DOCS_KEY = "cve_advisory:text_index:docs"
+INDEX_UPDATES_KEY = "cve_advisory:text_index:updates"  # journal des documents écrits (index_updates)
+INDEX_COVERAGE_KEY = "cve_advisory:text_index:coverage"  # publications couvertes par l'ingestion hors ligne
+NVD_FIRST_PUBLISHED = "1988-10-01"  # plus ancienne publication NVD : borne d'une recherche sans date de début
+# Recherche sans date de fin : l'index la couvre si sa dernière publication ingérée a moins de N jours
+INDEX_COVERAGE_LAG_DAYS = int(os.getenv("INDEX_COVERAGE_LAG_DAYS", 2))
+FIELD_GAP = 16  # écart de positions entre champs : une phrase ne chevauche pas deux champs
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+# Chargement au démarrage : documents indexés entre deux reprises de la boucle d'événements
+INDEX_LOAD_BATCH = int(os.getenv("INDEX_LOAD_BATCH", 200))
+INDEX_SYNC_ENTRIES = 100  # entrées du journal des écritures lues par requête
+
+# Noms des CWE les plus fréquents (les identifiants seuls ne sont pas recherchables en texte)
+CWE_NAMES = {
+    "CWE-20": "Improper Input Validation",
+    "CWE-22": "Path Traversal",
+    "CWE-77": "Command Injection",
+    "CWE-78": "OS Command Injection",
+    "CWE-79": "Cross-site Scripting XSS",
+    "CWE-89": "SQL Injection",
+    "CWE-94": "Code Injection",
+    "CWE-119": "Buffer Overflow Improper Restriction of Operations within the Bounds of a Memory Buffer",
+    "CWE-120": "Classic Buffer Overflow",
+    "CWE-125": "Out-of-bounds Read",
+    "CWE-190": "Integer Overflow or Wraparound",
+    "CWE-200": "Exposure of Sensitive Information",
+    "CWE-269": "Improper Privilege Management",
+    "CWE-276": "Incorrect Default Permissions",
+    "CWE-287": "Improper Authentication",
+    "CWE-306": "Missing Authentication for Critical Function",
+    "CWE-352": "Cross-Site Request Forgery CSRF",
+    "CWE-362": "Race Condition",
+    "CWE-400": "Uncontrolled Resource Consumption Denial of Service",
+    "CWE-401": "Memory Leak",
+    "CWE-416": "Use After Free",
+    "CWE-434": "Unrestricted Upload of File with Dangerous Type",
+    "CWE-476": "NULL Pointer Dereference",
+    "CWE-502": "Deserialization of Untrusted Data",
+    "CWE-611": "XML External Entity XXE",
+    "CWE-787": "Out-of-bounds Write",
+    "CWE-798": "Use of Hard-coded Credentials",
+    "CWE-862": "Missing Authorization",
+    "CWE-863": "Incorrect Authorization",
+    "CWE-918": "Server-Side Request Forgery SSRF",
+}
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class TextIndex:
+    """Index inversé positionnel en mémoire avec classement BM25"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # terme -> {doc_id: [positions]}
+        self.doc_len: dict = {}
+        self.doc_terms: dict = {}  # doc_id -> termes indexés (pour la mise à jour incrémentale)
+        self.fields: dict = {}  # doc_id -> champs texte
+        self.meta: dict = {}  # doc_id -> métadonnées (published, sourceIdentifier, score)
+        self.total_len = 0
+        self.kev_version = None
+        self.loaded = False  # documents persistés entièrement rechargés
+        self.updates_cursor = "0-0"  # dernière entrée du journal des écritures appliquée
+        # Ingestion hors ligne : {"from", "to", "years"} des publications ingérées ; None si jamais amorcé
+        self.coverage: dict | None = None
+        self._sorted_terms = None  # liste triée des termes, pour les requêtes par préfixe
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    # --- Indexation ---
+    def remove(self, doc_id: str) -> None:
+        for term in self.doc_terms.pop(doc_id, ()):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+                    if self._sorted_terms is not None:
+                        del self._sorted_terms[bisect.bisect_left(self._sorted_terms, term)]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def add(self, doc_id: str, fields: dict, meta: dict = None) -> None:
+        """Indexer (ou réindexer) un document ; les champs fournis remplacent ceux existants"""
+        merged = {**self.fields.get(doc_id, {}), **{k: v for k, v in fields.items() if v}}
+        self.remove(doc_id)
+        self.fields[doc_id] = merged
+        if meta:
+            self.meta[doc_id] = {**self.meta.get(doc_id, {}), **meta}
+
+        position = 0
+        terms = set()
+        for name in sorted(merged):
+            for token in tokenize(merged[name]):
+                docs = self.postings[token]
+                if doc_id not in docs:
+                    docs[doc_id] = []
+                    if len(docs) == 1 and self._sorted_terms is not None:
+                        bisect.insort(self._sorted_terms, token)
+                docs[doc_id].append(position)
+                terms.add(token)
+                position += 1
+            position += FIELD_GAP
+        self.doc_terms[doc_id] = terms
+        self.doc_len[doc_id] = position
+        self.total_len += position
+
+    def covers(self, start_date: str | None, end_date: str | None, today: str) -> bool:
+        """
+        L'index répond-il seul pour ces dates de publication ? Seulement une fois amorcé par l'ingestion
+        hors ligne sur toute la plage : les CVE vus en ligne et le catalogue KEV n'en sont qu'un échantillon.
+        """
+        if not self.loaded or not self.coverage:
+            return False
+        start = max(start_date or NVD_FIRST_PUBLISHED, NVD_FIRST_PUBLISHED)
+        end = end_date or today
+        latest = (date.fromisoformat(self.coverage["to"]) + timedelta(days=INDEX_COVERAGE_LAG_DAYS)).isoformat()
+        if start < self.coverage["from"] or end > latest:
+            return False
+        years = set(self.coverage.get("years", []))
+        return all(year in years for year in range(int(start[:4]), int(min(end, self.coverage["to"])[:4]) + 1))
+
+    # --- Recherche ---
+    def _expand_prefix(self, prefix: str) -> list:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\uffff")
+        return self._sorted_terms[start:end]
+
+    def _parse(self, query: str) -> list:
+        """Clauses : ("phrase", [termes]) ou ("prefix", [termes développés])"""
+        clauses = []
+        for quoted, word in QUERY_RE.findall(query):
+            if quoted:
+                tokens = tokenize(quoted)
+                if tokens:
+                    clauses.append(("phrase", tokens))
+                continue
+            prefix = word.endswith("*")
+            tokens = tokenize(word)
+            if not tokens:
+                continue
+            if prefix:
+                # "apache-log*" : phrase "apache" puis préfixe "log"
+                if len(tokens) > 1:
+                    clauses.append(("phrase", tokens[:-1]))
+                clauses.append(("prefix", self._expand_prefix(tokens[-1])))
+            else:
+                # Un mot composé ("CVE-2021-44228") est une phrase implicite
+                clauses.append(("phrase", tokens))
+        return clauses
+
+    def _phrase_docs(self, tokens: list) -> set:
+        postings = [self.postings.get(t) for t in tokens]
+        if any(p is None for p in postings):
+            return set()
+        docs = set.intersection(*(set(p) for p in postings))
+        if len(tokens) == 1:
+            return docs
+        matched = set()
+        for doc_id in docs:
+            following = [set(p[doc_id]) for p in postings[1:]]
+            if any(all(pos + i + 1 in following[i] for i in range(len(following))) for pos in postings[0][doc_id]):
+                matched.add(doc_id)
+        return matched
+
+    def _bm25(self, term: str, doc_id: str, n_docs: int, avg_len: float) -> float:
+        docs = self.postings[term]
+        tf = len(docs[doc_id])
+        idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+        return idf * tf * (self.k1 + 1) / norm
+
+    def search(self, query: str) -> list:
+        """Documents satisfaisant toutes les clauses, classés par score BM25 décroissant"""
+        clauses = self._parse(query)
+        if not clauses or not self.doc_len:
+            return []
+
+        matched = None
+        scored_terms = []
+        for kind, terms in clauses:
+            if kind == "phrase":
+                docs = self._phrase_docs(terms)
+            else:
+                docs = set()
+                for term in terms:
+                    docs.update(self.postings[term])
+            matched = docs if matched is None else matched & docs
+            scored_terms.extend(terms)
+            if not matched:
+                return []
+
+        n_docs = len(self.doc_len)
+        avg_len = self.total_len / n_docs or 1
+        results = []
+        for doc_id in matched:
+            score = sum(
+                self._bm25(t, doc_id, n_docs, avg_len) for t in scored_terms if doc_id in self.postings.get(t, {})
+            )
+            results.append((doc_id, score))
+        results.sort(key=lambda x: (-x[1], x[0]))
+        return results
+
+
+# Instance globale
+text_index = TextIndex()
+
+
+def cve_document(cve) -> tuple:
+    """Champs texte et métadonnées d'un objet CVE nvdlib"""
+    descriptions = [getattr(d, "value", "") for d in getattr(cve, "descriptions", []) or [] if getattr(d, "lang", "en") == "en"]
+    cwe_ids = [getattr(w, "value", "") for w in getattr(cve, "cwe", []) or []]
+    fields = {
+        "id": getattr(cve, "id", ""),
+        "description": " ".join(descriptions),
+        "cwe": " ".join(f"{c} {CWE_NAMES.get(c, '')}" for c in cwe_ids),
+    }
+    meta = {
+        "published": getattr(cve, "published", None),
+        "sourceIdentifier": getattr(cve, "sourceIdentifier", None),
+        "score": getattr(cve, "score", None),
+    }
+    return fields, meta
+
+
+async def persist_documents(docs: dict) -> None:
+    """
+    Persister des documents {doc_id: {"fields", "meta"}} fusionnés avec ceux déjà stockés, comme
+    TextIndex.add : une source n'efface pas les champs d'une autre (description NVD, texte KEV).
+    """
+    existing = await redis_client.hmget_json(INDEX_DOCS_KEY, list(docs))
+    merged = {}
+    for (doc_id, doc), previous in zip(docs.items(), existing):
+        previous = previous or {}
+        merged[doc_id] = {
+            "fields": {**previous.get("fields", {}), **{k: v for k, v in doc["fields"].items() if v}},
+            "meta": {**previous.get("meta", {}), **(doc.get("meta") or {})},
+        }
+    await redis_client.hset_json(INDEX_DOCS_KEY, merged)
+    await publish_updates(INDEX_UPDATES_KEY, list(merged))
+
+
+
+async def ingest_cves(cves) -> None:
+    """Indexer des CVE au fil de leur arrivée et persister les documents (rechargés au démarrage)"""
+    docs = {}
+    for cve in cves:
+        cve_id = getattr(cve, "id", None)
+        if not cve_id:
+            continue
+        fields, meta = cve_document(cve)
+        text_index.add(cve_id, fields, meta)
+        docs[cve_id] = {"fields": fields, "meta": meta}
+    await persist_documents(docs)
+
+
+async def store_documents(cves) -> None:
+    """Persister les documents sans les indexer en mémoire (ingestion hors ligne, chargés au démarrage)"""
+    docs = {}
+    for cve in cves:
+        cve_id = getattr(cve, "id", None)
+        if cve_id:
+            fields, meta = cve_document(cve)
+            docs[cve_id] = {"fields": fields, "meta": meta}
+    await persist_documents(docs)
+
+
+async def ingest_kev(vulnerabilities: list) -> None:
+    """Ajouter le nom et la description KEV aux documents concernés"""
+    docs = {}
+    for v in vulnerabilities:
+        cve_id = v.get("cveID")
+        if not cve_id:
+            continue
+        fields = {"id": cve_id, "kev": f"{v.get('vulnerabilityName') or ''} {v.get('shortDescription') or ''}"}
+        text_index.add(cve_id, fields)
+        docs[cve_id] = {"fields": fields}
+    await persist_documents(docs)
+
+
+async def record_coverage(published: set) -> dict:
+    """Ingestion hors ligne : étendre la couverture (dates "YYYY-MM-DD" de publication ingérées)"""
+    coverage = await redis_client.get_json(INDEX_COVERAGE_KEY) or {}
+    dates = set(published) | {d for d in (coverage.get("from"), coverage.get("to")) if d}
+    if not dates:
+        return coverage
+    coverage = {
+        "from": min(dates),
+        "to": max(dates),
+        "years": sorted(set(coverage.get("years", [])) | {int(d[:4]) for d in published}),
+    }
+    await redis_client.set_json(INDEX_COVERAGE_KEY, coverage)
+    return coverage
+
+
+async def load_index() -> int:
+    """
+    Reconstruire l'index en mémoire depuis les documents persistés, par lots (HSCAN) : la boucle
+    d'événements reprend la main tous les INDEX_LOAD_BATCH documents, les requêtes restent servies.
+    """
+    text_index.coverage = await redis_client.get_json(INDEX_COVERAGE_KEY)
+    # Écritures pendant le chargement : rejouées ensuite par sync_index
+    text_index.updates_cursor = await redis_client.stream_last_id(INDEX_UPDATES_KEY) or "0-0"
+    pending = 0
+    async for docs in redis_client.hscan_json(INDEX_DOCS_KEY, INDEX_LOAD_BATCH):
+        for doc_id, doc in docs.items():
+            text_index.add(doc_id, doc.get("fields", {}), doc.get("meta"))
+            pending += 1
+            if pending >= INDEX_LOAD_BATCH:
+                pending = 0
+                await asyncio.sleep(0)
+    # Index chargé une fois : ses objets sont exclus des passes complètes du ramasse-miettes
+    gc.freeze()
+    text_index.loaded = True
+    logger.info("Index plein texte chargé (%s documents)", len(text_index))
+    return len(text_index)
+
+
+async def sync_index() -> int:
+    """
+    Appliquer les documents écrits depuis le dernier relevé par les autres workers et l'ingestion
+    hors ligne (tous les workers, à chaque cycle de hot_data) ; retourne le nombre de documents relus.
+    """
+    if not text_index.loaded:
+        return 0
+    text_index.coverage = await redis_client.get_json(INDEX_COVERAGE_KEY)
+    applied = 0
+    while True:
+        ids, cursor = await read_updates(INDEX_UPDATES_KEY, text_index.updates_cursor, INDEX_SYNC_ENTRIES)
+        if cursor == text_index.updates_cursor:
+            return applied
+        for start in range(0, len(ids), INDEX_LOAD_BATCH):
+            chunk = ids[start:start + INDEX_LOAD_BATCH]
+            for doc_id, doc in zip(chunk, await redis_client.hmget_json(INDEX_DOCS_KEY, chunk)):
+                if doc is not None:
+                    text_index.add(doc_id, doc.get("fields", {}), doc.get("meta"))
+            applied += len(chunk)
+            await asyncio.sleep(0)
+        text_index.updates_cursor = cursor
@@ -0,0 +1,104 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Chronométrage par requête : en-tête Server-Timing, détail par CVE avec ?debug=timing.
+# Désactivé par défaut : les durées par étape et par source exposent le fonctionnement interne
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+request_timing: ContextVar = ContextVar("request_timing", default=None)
+current_cve: ContextVar = ContextVar("current_cve", default=None)
+
+
+class RequestTiming:
+    """
+    Durées cumulées par étape pour une requête. Les étapes s'imbriquent (enrich contient epss,
+    qui contient upstream.epss) : chaque durée est inclusive, les appels concurrents s'additionnent.
+    """
+
+    def __init__(self, per_cve: bool = False):
+        self.started = time.perf_counter()
+        self.stages: dict = {}  # étape -> [durée totale, nombre d'appels]
+        self.per_cve: Optional[dict] = {} if per_cve else None
+
+    def record(self, stage: str, duration: float) -> None:
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = [0.0, 0]
+        entry[0] += duration
+        entry[1] += 1
+        if self.per_cve is not None:
+            cve_id = current_cve.get()
+            if cve_id:
+                breakdown = self.per_cve.setdefault(cve_id, {})
+                breakdown[stage] = breakdown.get(stage, 0.0) + duration
+
+    def server_timing(self) -> str:
+        """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+        parts = [f'{name};dur={total * 1000:.1f};desc="x{count}"' for name, (total, count) in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def report(self) -> dict:
+        """Détail renvoyé avec ?debug=timing"""
+        report = {
+            "totalMs": round((time.perf_counter() - self.started) * 1000, 2),
+            "stages": {
+                name: {"ms": round(total * 1000, 2), "count": count}
+                for name, (total, count) in sorted(self.stages.items(), key=lambda s: -s[1][0])
+            },
+        }
+        if self.per_cve is not None:
+            report["perCve"] = {
+                cve_id: {name: round(d * 1000, 2) for name, d in breakdown.items()}
+                for cve_id, breakdown in self.per_cve.items()
+            }
+        return report
+
+
+def record_stage(stage: str, duration: float) -> None:
+    timing = request_timing.get()
+    if timing is not None:
+        timing.record(stage, duration)
+
+
+@contextmanager
+def stage(name: str):
+    """Chronométrer un bloc ; sans requête chronométrée en cours, simple passage"""
+    timing = request_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.record(name, time.perf_counter() - start)
+
+
+def timed(name: str, cve_of=None):
+    """
+    Décorateur : chronométrer une coroutine comme une étape.
+    cve_of(*args, **kwargs) -> identifiant : attribuer l'étape et ses sous-étapes à ce CVE.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            timing = request_timing.get()
+            if timing is None:
+                return await func(*args, **kwargs)
+            token = None
+            if cve_of is not None and timing.per_cve is not None:
+                token = current_cve.set(cve_of(*args, **kwargs))
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timing.record(name, time.perf_counter() - start)
+                if token is not None:
+                    current_cve.reset(token)
+        return wrapper
+    return decorator
@@ -0,0 +1,316 @@
+"""
+Enregistrement et rejeu des échanges avec les sources externes (NVD, KEV, EPSS, GitHub, Reddit, Exploit-DB).
+
+UPSTREAM_ARCHIVE_MODE=record : chaque appel sortant (httpx, requests, aiohttp) est écrit dans l'archive
+UPSTREAM_ARCHIVE_MODE=replay : les appels sont servis depuis l'archive, sans réseau
+UPSTREAM_ARCHIVE_PATH        : fichier d'archive (JSON lignes compressé gzip)
+UPSTREAM_REPLAY_LATENCY      : facteur appliqué aux latences enregistrées (1 = d'origine, 0 = aucune)
+
+L'archive contient deux types de lignes : les corps de réponse, stockés une seule fois par empreinte,
+et les échanges (méthode, URL, empreinte du corps de requête, statut, en-têtes, latence, empreinte
+du corps de réponse). Les en-têtes de requête (clés d'API, jetons) ne sont jamais enregistrés.
+
+Au rejeu, une requête est d'abord cherchée à l'identique ; à défaut, par sa forme, dates de la
+query string masquées (les fenêtres NVD dépendent de l'heure). Plusieurs échanges de même clé sont
+servis dans l'ordre d'enregistrement, le dernier étant répété une fois la liste épuisée.
+"""
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app_logging import logger, setup_logging
+
+DATE_VALUE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][0-9:.]+)?([+-]\d{2}:?\d{2}|Z)?$")
+# En-têtes de réponse non rejoués : le corps est stocké décodé et sa longueur recalculée
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "set-cookie"}
+
+
+class ReplayMiss(Exception):
+    """Requête absente de l'archive"""
+
+
+def normalize_url(url: str) -> str:
+    """URL avec paramètres triés (l'ordre d'émission ne change pas la clé)"""
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+
+
+def url_shape(url: str) -> str:
+    """URL normalisée dont les valeurs de date sont masquées"""
+    parts = urlsplit(str(url))
+    params = [(k, "*" if DATE_VALUE_RE.match(v) else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(sorted(params)), ""))
+
+
+def body_digest(body: Optional[bytes]) -> str:
+    return hashlib.sha1(body).hexdigest() if body else ""
+
+
+class UpstreamArchive:
+    def __init__(self, mode: str, path: str, latency_scale: float = 1.0):
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self.file = None
+        self.closed = False
+        self.known_bodies: set = set()
+        self.bodies: dict = {}
+        self.exact: dict = {}
+        self.shapes: dict = {}
+        self.cursors: dict = {}
+        if mode == "record":
+            # Ajout d'un membre gzip : une archive existante est complétée, pas écrasée
+            self.file = gzip.open(path, "at", encoding="utf-8")
+        elif mode == "replay":
+            self._load()
+        else:
+            raise ValueError(f"UPSTREAM_ARCHIVE_MODE inconnu : {mode} (record ou replay)")
+
+    # --- Enregistrement ---
+    def record(self, method: str, url: str, request_body: Optional[bytes], status: int,
+               headers: dict, content: bytes, latency: float) -> None:
+        digest = hashlib.sha1(content).hexdigest()
+        exchange = {
+            "type": "exchange",
+            "t": round(time.time() - self.started, 3),
+            "method": method.upper(),
+            "url": normalize_url(url),
+            "requestBody": body_digest(request_body),
+            "status": status,
+            "headers": {k.lower(): v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS},
+            "latency": round(latency, 4),
+            "body": digest,
+        }
+        with self.lock:
+            if self.file is None:
+                return
+            if digest not in self.known_bodies:
+                self.known_bodies.add(digest)
+                try:
+                    blob = {"type": "body", "id": digest, "text": content.decode("utf-8")}
+                except UnicodeDecodeError:
+                    blob = {"type": "body", "id": digest, "base64": base64.b64encode(content).decode()}
+                self.file.write(json.dumps(blob, separators=(",", ":")) + "\n")
+            self.file.write(json.dumps(exchange, separators=(",", ":")) + "\n")
+            self.recorded += 1
+
+    # --- Rejeu ---
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["type"] == "body":
+                    self.bodies[entry["id"]] = (entry["text"].encode("utf-8") if "text" in entry
+                                                else base64.b64decode(entry["base64"]))
+                else:
+                    self.exact.setdefault((entry["method"], entry["url"], entry["requestBody"]), []).append(entry)
+                    self.shapes.setdefault((entry["method"], url_shape(entry["url"]), entry["requestBody"]), []).append(entry)
+        logger.info("Archive amont chargée : %s échanges (%s)", sum(len(v) for v in self.exact.values()), self.path)
+
+    def lookup(self, method: str, url: str, request_body: Optional[bytes]) -> tuple:
+        """-> (échange, corps de réponse) ; ReplayMiss si la requête n'a pas été enregistrée"""
+        method = method.upper()
+        digest = body_digest(request_body)
+        candidates = [("exact", (method, normalize_url(url), digest)), ("shape", (method, url_shape(url), digest))]
+        with self.lock:
+            for kind, key in candidates:
+                entries = (self.exact if kind == "exact" else self.shapes).get(key)
+                if entries:
+                    index = self.cursors.get((kind, key), 0)
+                    self.cursors[(kind, key)] = index + 1
+                    exchange = entries[min(index, len(entries) - 1)]
+                    self.replayed += 1
+                    return exchange, self.bodies[exchange["body"]]
+            self.misses += 1
+        logger.warning("Rejeu : %s %s absent de l'archive", method, url)
+        raise ReplayMiss(f"{method} {url} absent de l'archive {self.path}")
+
+    def delay(self, exchange: dict) -> float:
+        return exchange["latency"] * self.latency_scale
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.file:
+            with self.lock:
+                self.file.close()
+                self.file = None
+        if self.mode == "record":
+            logger.info("Archive amont : %s échanges enregistrés (%s)", self.recorded, self.path)
+        else:
+            logger.info("Archive amont : %s échanges rejoués, %s absents", self.replayed, self.misses)
+
+
+# --- Interception des clients HTTP ---
+def _install_httpx(archive: UpstreamArchive):
+    import httpx
+
+    original = httpx.AsyncHTTPTransport.handle_async_request
+
+    async def handle_async_request(transport, request: httpx.Request) -> httpx.Response:
+        if archive.mode == "replay":
+            try:
+                exchange, content = archive.lookup(request.method, str(request.url), request.content)
+            except ReplayMiss as e:
+                raise httpx.ConnectError(str(e), request=request)
+            if archive.delay(exchange):
+                await asyncio.sleep(archive.delay(exchange))
+            return httpx.Response(exchange["status"], headers=exchange["headers"], content=content, request=request)
+
+        start = time.perf_counter()
+        response = await original(transport, request)
+        content = await response.aread()
+        archive.record(request.method, str(request.url), request.content, response.status_code,
+                       dict(response.headers), content, time.perf_counter() - start)
+        return response
+
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+
+def _install_requests(archive: UpstreamArchive):
+    import requests
+
+    original = requests.adapters.HTTPAdapter.send
+
+    def send(adapter, request, **kwargs):
+        body = request.body.encode() if isinstance(request.body, str) else request.body
+        if archive.mode == "replay":
+            try:
+                exchange, content = archive.lookup(request.method, request.url, body)
+            except ReplayMiss as e:
+                raise requests.ConnectionError(str(e), request=request)
+            if archive.delay(exchange):
+                time.sleep(archive.delay(exchange))  # client synchrone : même blocage qu'à l'enregistrement
+            response = requests.Response()
+            response.status_code = exchange["status"]
+            response.headers.update(exchange["headers"])
+            response._content = content
+            response.url = request.url
+            response.request = request
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            return response
+
+        start = time.perf_counter()
+        response = original(adapter, request, **kwargs)
+        archive.record(request.method, request.url, body, response.status_code,
+                       dict(response.headers), response.content, time.perf_counter() - start)
+        return response
+
+    requests.adapters.HTTPAdapter.send = send
+
+
+class _ReplayedAiohttpResponse:
+    """Sous-ensemble de aiohttp.ClientResponse utilisé par asyncprawcore"""
+
+    def __init__(self, method: str, url: str, exchange: dict, content: bytes):
+        from multidict import CIMultiDict, CIMultiDictProxy
+        import yarl
+
+        self.method = method
+        self.url = yarl.URL(url)
+        self.status = exchange["status"]
+        self.headers = CIMultiDictProxy(CIMultiDict(exchange["headers"]))
+        self._content = content
+
+    async def read(self) -> bytes:
+        return self._content
+
+    async def text(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        return self._content.decode(encoding, errors)
+
+    async def json(self, *args, **kwargs):
+        return json.loads(self._content) if self._content else None
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def _install_aiohttp(archive: UpstreamArchive):
+    try:
+        import aiohttp
+        import yarl
+    except ImportError:
+        return
+
+    original = aiohttp.ClientSession._request
+
+    async def _request(session, method, str_or_url, **kwargs):
+        url = str(str_or_url)
+        if kwargs.get("params"):
+            url = str(yarl.URL(url).extend_query(kwargs["params"]))
+        data = kwargs.get("data")
+        if isinstance(data, dict):
+            data = urlencode(sorted(data.items()))
+        body = data.encode() if isinstance(data, str) else (data if isinstance(data, bytes) else None)
+        if kwargs.get("json") is not None:
+            body = json.dumps(kwargs["json"], sort_keys=True).encode()
+
+        if archive.mode == "replay":
+            try:
+                exchange, content = archive.lookup(method, url, body)
+            except ReplayMiss as e:
+                raise aiohttp.ClientConnectionError(str(e))
+            if archive.delay(exchange):
+                await asyncio.sleep(archive.delay(exchange))
+            return _ReplayedAiohttpResponse(method, url, exchange, content)
+
+        start = time.perf_counter()
+        response = await original(session, method, str_or_url, **kwargs)
+        content = await response.read()
+        archive.record(method, url, body, response.status, dict(response.headers), content,
+                       time.perf_counter() - start)
+        return response
+
+    aiohttp.ClientSession._request = _request
+
+
+def install(mode: str, path: str, latency_scale: float = 1.0) -> UpstreamArchive:
+    """Intercepter httpx, requests et aiohttp pour enregistrer ou rejouer les échanges"""
+    setup_logging()
+    archive = UpstreamArchive(mode, path, latency_scale)
+    atexit.register(archive.close)
+    _install_httpx(archive)
+    _install_requests(archive)
+    _install_aiohttp(archive)
+    logger.info("Archive amont en mode %s : %s", mode, path)
+    return archive
+
+
+def install_from_env() -> Optional[UpstreamArchive]:
+    mode = os.getenv("UPSTREAM_ARCHIVE_MODE", "").lower()
+    if not mode:
+        return None
+    return install(
+        mode,
+        os.getenv("UPSTREAM_ARCHIVE_PATH", "upstream-archive.jsonl.gz"),
+        float(os.getenv("UPSTREAM_REPLAY_LATENCY", 1.0)),
+    )
+
+
+# Instance globale (None hors enregistrement / rejeu)
+upstream_archive = install_from_env()
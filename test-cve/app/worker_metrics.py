@@ -0,0 +1,65 @@
+import asyncio
+import os
+import time
+
+from app_logging import logger
+from leader import leader
+from metrics import export_metrics, render_metrics
+from redis_client import redis_client
+
+WORKER_METRICS_KEY = "cve_advisory:metrics:workers"
+
+
+class WorkerMetrics:
+    """
+    Métriques de tous les workers (WEB_CONCURRENCY > 1) : chaque worker publie périodiquement ses
+    valeurs dans Redis, et /metrics, servi par n'importe quel worker, les restitue toutes avec une
+    étiquette worker. Un worker silencieux depuis plus de trois périodes est retiré.
+    """
+
+    def __init__(self):
+        self.interval = int(os.getenv("METRICS_PUBLISH_INTERVAL", 15))  # secondes entre deux publications
+        self.task: asyncio.Task | None = None
+
+    async def publish(self) -> None:
+        await redis_client.hset_json(WORKER_METRICS_KEY, {leader.worker_id: {"at": time.time(), "values": export_metrics()}})
+
+    async def render(self) -> str:
+        """Texte Prometheus de tous les workers actifs (valeurs du worker courant à jour)"""
+        await self.publish()
+        published = await redis_client.hgetall_json(WORKER_METRICS_KEY)
+        cutoff = time.time() - 3 * self.interval
+        stale = [w for w, entry in published.items() if entry.get("at", 0) < cutoff]
+        await redis_client.hdel(WORKER_METRICS_KEY, stale)
+        workers = {w: entry["values"] for w, entry in published.items() if w not in stale}
+        # Redis indisponible : au moins les métriques du worker courant
+        workers.setdefault(leader.worker_id, export_metrics())
+        return render_metrics(workers)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.warning("Erreur publication des métriques du worker: %s", e)
+
+    def start(self):
+        """Démarrer la publication périodique (tous les workers, pas seulement le leader)"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Arrêter la publication et retirer les métriques de ce worker"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await redis_client.hdel(WORKER_METRICS_KEY, [leader.worker_id])
+
+
+# Instance globale
+worker_metrics = WorkerMetrics()
@@ -0,0 +1,64 @@
+"""
+Benchmark de la vérification d'appartenance KEV (kev_index.py).
+
+Mesure, pour 100 000 identifiants contre un catalogue de ~1 400 entrées :
+- le parcours linéaire du catalogue (comportement de /kev/{cve_id}, extrapolé)
+- le tableau trié d'identifiants encodés (KevMembership.check)
+
+Usage : python bench/bench_kev_check.py  (depuis test-cve/)
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from kev_index import KevMembership
+
+CATALOG_SIZE = 1400
+QUERY_SIZE = 100_000
+LINEAR_SAMPLE = 1000
+
+
+def synthetic_catalog(rng: random.Random) -> dict:
+    ids = {f"CVE-{rng.randint(2002, 2025)}-{rng.randint(1, 60000)}" for _ in range(CATALOG_SIZE)}
+    return {"catalogVersion": "bench", "vulnerabilities": [
+        {"cveID": cve_id, "dueDate": "2025-01-01", "dateAdded": "2024-12-01", "knownRansomwareCampaignUse": "Unknown"}
+        for cve_id in sorted(ids)
+    ]}
+
+
+def main():
+    rng = random.Random(1)
+    catalog = synthetic_catalog(rng)
+    kev_ids = [v["cveID"] for v in catalog["vulnerabilities"]]
+    # ~5 % des identifiants d'un scan sont dans KEV
+    queries = [rng.choice(kev_ids) if rng.random() < 0.05 else f"CVE-{rng.randint(1999, 2025)}-{rng.randint(1, 60000)}"
+               for _ in range(QUERY_SIZE)]
+
+    vulns = catalog["vulnerabilities"]
+    t = time.perf_counter()
+    linear = [[v for v in vulns if v["cveID"] == q] for q in queries[:LINEAR_SAMPLE]]
+    t_linear = (time.perf_counter() - t) * QUERY_SIZE / LINEAR_SAMPLE
+
+    membership = KevMembership()
+    t = time.perf_counter()
+    membership.ensure(catalog)
+    t_build = time.perf_counter() - t
+
+    t = time.perf_counter()
+    rows = membership.check(queries)
+    t_check = time.perf_counter() - t
+
+    # Mêmes réponses que le parcours linéaire
+    assert [bool(m) for m in linear] == (rows[:LINEAR_SAMPLE] >= 0).tolist()
+
+    print(f"{QUERY_SIZE} identifiants, catalogue de {len(vulns)} entrées ({int((rows >= 0).sum())} présents)")
+    print(f"  parcours linéaire (extrapolé) : {t_linear * 1000:9.1f} ms")
+    print(f"  construction tableau trié     : {t_build * 1000:9.1f} ms")
+    print(f"  recherche vectorisée          : {t_check * 1000:9.1f} ms ({QUERY_SIZE / t_check / 1e6:.2f} M ids/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark de la forme compacte (records.py) face aux dictionnaires complets.
+
+Mesure, pour une fenêtre de 30 jours (~4000 CVE), la mémoire résidente de la
+fenêtre (tracemalloc : dictionnaires complets, dictionnaires compacts, CVERecord)
+ainsi que le temps et la taille de sérialisation JSON, avec les mêmes séparateurs
+des deux côtés.
+
+Usage : python bench/bench_records.py  (depuis test-cve/)
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from records import FULL_FIELDS, CVERecord, expand_wire, to_wire
+
+WINDOW_SIZE = 4000
+
+
+def synthetic_full_dict(i: int, rng: random.Random) -> dict:
+    d = {field: None for field in FULL_FIELDS}
+    d.update({
+        "id": f"CVE-2024-{i:05d}",
+        "sourceIdentifier": "cve@mitre.org",
+        "url": f"https://nvd.nist.gov/vuln/detail/CVE-2024-{i:05d}",
+        "published": "2024-10-01T12:00:00.000",
+        "lastModified": "2024-10-02T08:00:00.000",
+        "vulnStatus": "Awaiting Analysis",
+        "descriptions": [{"lang": "en", "value": "Improper input validation allows remote code execution."}],
+        "references": [{"url": f"https://example.com/advisory/{i}", "tags": ["Vendor Advisory"]}],
+        "cwe": [], "cpe": [],
+        "score": [None, None, None],
+        "isExploited": False,
+        "epss_score": 0.0, "epss_percentile": 0.0,
+        "exploit_public": False, "evidence": [],
+        "confidenceLevel": "Unknown", "activelyExploited": False,
+        "profileTitle": "ℹ️ Vulnerability (no CVSS score)",
+        "profileDescription": "ℹ️ Vulnerability (no CVSS score). CVSS score: N/A. EPSS: N/A.",
+        "profileTags": [], "profileSynthScore": 0,
+    })
+    # Une minorité de CVE récents est déjà scorée en CVSS 3.1
+    if rng.random() < 0.3:
+        d.update({
+            "v31vector": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H",
+            "v31exploitability": 3.9, "v31impactScore": 5.9,
+            "score": ["V31", 9.8, "CRITICAL"],
+            "v31attackVector": "NETWORK", "v31attackComplexity": "LOW",
+            "v31confidentialityImpact": "HIGH", "v31integrityImpact": "HIGH", "v31availabilityImpact": "HIGH",
+        })
+    return d
+
+
+def resident(build):
+    """(octets retenus par la fenêtre construite, fenêtre) ; les objets temporaires ne comptent pas"""
+    tracemalloc.start()
+    window = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, window
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    rng = random.Random(1)
+    source = json.dumps([synthetic_full_dict(i, rng) for i in range(WINDOW_SIZE)])
+
+    # Chaque représentation est construite depuis le même JSON : les valeurs retenues sont comparables
+    mem_full, dicts = resident(lambda: json.loads(source))
+    mem_wire, _ = resident(lambda: [to_wire(d) for d in json.loads(source)])
+    mem_record, records = resident(lambda: [CVERecord.from_dict(d) for d in json.loads(source)])
+
+    separators = (",", ":")
+    t_full = timed(lambda: json.dumps(dicts, default=str, separators=separators))
+    t_record = timed(lambda: json.dumps([r.to_wire() for r in records], default=str, separators=separators))
+    full = json.dumps(dicts, default=str, separators=separators)
+    compact = json.dumps([r.to_wire() for r in records], default=str, separators=separators)
+
+    # Compatibilité : la forme complète reconstruite est identique à l'originale
+    assert [r.to_dict() for r in records] == dicts
+    assert [expand_wire(r) for r in json.loads(compact)] == dicts
+
+    print(f"Fenêtre de {WINDOW_SIZE} CVE")
+    print(f"  mémoire   : dicts {mem_full / 1e6:7.2f} Mo | dicts compacts {mem_wire / 1e6:7.2f} Mo"
+          f" | CVERecord {mem_record / 1e6:7.2f} Mo")
+    print(f"  sérialis. : dicts {t_full * 1000:7.1f} ms | CVERecord {t_record * 1000:7.1f} ms")
+    print(f"  taille    : dicts {len(full) / 1e6:7.2f} Mo | compact {len(compact.encode()) / 1e6:7.2f} Mo")
+
+
+if __name__ == "__main__":
+    main()
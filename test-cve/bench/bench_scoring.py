@@ -0,0 +1,88 @@
+"""
+Benchmark du scoring groupé (scoring.py) face aux fonctions par CVE de main.py.
+
+Vérifie d'abord que les sorties sont identiques octet pour octet (les rollups
+comptent avec les mêmes règles), puis mesure les temps à 10k et 100k CVE.
+
+Usage : python bench/bench_scoring.py  (depuis test-cve/)
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from main import compute_confidence_level, compute_actively_exploited, generate_vulnerability_profile
+from scoring import score_cve_dicts
+
+SEVERITIES = ["LOW", "MEDIUM", "HIGH", "CRITICAL", "critical", None]
+
+
+def synthetic_cves(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    cves = []
+    for i in range(n):
+        score = rng.choice([None, round(rng.uniform(0, 10), 1), 9.0, 10.0, 0.0, "7.5"])
+        cves.append({
+            "id": f"CVE-2024-{i:06d}",
+            "score": rng.choice([[], [None, None, None], ["V31", score, rng.choice(SEVERITIES)]]),
+            "isExploited": rng.random() < 0.1,
+            "epss_score": rng.choice([None, 0, 0.0, rng.random(), 0.6, 0.3, 0.1, 1.0]),
+            "epss_percentile": rng.choice([None, 0.0, rng.random()]),
+            "exploit_public": rng.random() < 0.3,
+            "product": rng.choice([None, "", "Exchange Server", "Windows"]),
+        })
+    return cves
+
+
+def per_cve(cves: list) -> list:
+    out = []
+    for c in cves:
+        d = dict(c)
+        d["confidenceLevel"] = compute_confidence_level(d)
+        d["activelyExploited"] = compute_actively_exploited(d)
+        profile = generate_vulnerability_profile(d)
+        out.append((d["confidenceLevel"], d["activelyExploited"], profile))
+    return out
+
+
+def batched(cves: list) -> list:
+    batch = score_cve_dicts(cves)
+    return [(batch.confidence(i), bool(batch.actively_exploited[i]), batch.profile(i)) for i in range(len(cves))]
+
+
+def check_identical(n: int = 20000) -> None:
+    cves = synthetic_cves(n, seed=7)
+    expected = json.dumps(per_cve(cves), ensure_ascii=False).encode()
+    actual = json.dumps(batched(cves), ensure_ascii=False).encode()
+    assert expected == actual, "Le scoring groupé diverge de la version par CVE"
+    print(f"✅ Sorties identiques sur {n} CVE synthétiques")
+
+
+def bench(n: int) -> None:
+    cves = synthetic_cves(n)
+
+    t = time.perf_counter()
+    per_cve(cves)
+    t_per_cve = time.perf_counter() - t
+
+    t = time.perf_counter()
+    batch = score_cve_dicts(cves)
+    t_scores = time.perf_counter() - t
+
+    # Rendu des descriptions/tags pour une page de 50 CVE seulement
+    t = time.perf_counter()
+    for i in range(50):
+        batch.profile(i)
+    t_page = time.perf_counter() - t
+
+    print(f"{n:>7} CVE | par CVE: {t_per_cve * 1000:8.1f} ms | "
+          f"groupé (scores): {t_scores * 1000:8.1f} ms | rendu page 50: {t_page * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    check_identical()
+    for n in (10_000, 100_000):
+        bench(n)
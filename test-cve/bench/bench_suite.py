@@ -0,0 +1,365 @@
+"""
+Suite de benchmarks reproductible : micro-benchmarks et scénarios de charge contre des sources simulées.
+
+L'application est démarrée en processus (ASGI) contre Redis (--redis-url) ou, par défaut, un faux
+Redis en mémoire (fakeredis). NVD, KEV, EPSS, GitHub, Reddit et Exploit-DB sont remplacés par les
+fausses sources de bench/fakes.py, avec latence et limites de débit réglables.
+
+Micro-benchmarks : generate_vulnerability_profile, cve_to_dict_full (cache chaud), codecs du cache
+(JSON, représentation compacte, aller-retour Redis) et filtres KEV.
+Scénarios de charge : /cves/recent à froid et à chaud, /kev/search, /cves/search avec filtres ;
+débit et latences p50/p95/p99.
+
+Les résultats peuvent être enregistrés comme référence puis comparés : chaque métrique est
+affichée avec son écart et les régressions au-delà du seuil sont signalées.
+
+Usage (depuis test-cve/) :
+  python bench/bench_suite.py                                   # suite complète
+  python bench/bench_suite.py --quick --only micro              # micro-benchmarks, tailles réduites
+  python bench/bench_suite.py --latency nvd=0.3,github=0.1 --rate nvd=50/30
+  python bench/bench_suite.py --save-baseline bench/baselines/default.json
+  python bench/bench_suite.py --baseline bench/baselines/default.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "default.json")
+# Métriques où une hausse est une amélioration (les autres sont des durées)
+HIGHER_IS_BETTER = {"ops_s", "throughput_rps"}
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def configure_environment(args):
+    """Variables lues à l'import de l'application : tâches de fond coupées, limiteur NVD laissé aux fausses sources"""
+    os.environ.setdefault("PREWARM_ENABLED", "false")
+    os.environ.setdefault("ROLLUP_ENABLED", "false")
+    os.environ.setdefault("CHANGES_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("API_KEY", "bench")
+    os.environ.setdefault("NVD_MIN_INTERVAL", "0")
+    # Identifiants factices : les sources de preuves GitHub et Reddit restent actives
+    for var in ("GITHUB_TOKEN", "REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET"):
+        os.environ.setdefault(var, "bench")
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+
+
+async def connect_redis(args):
+    import redis_client as rc
+    if args.redis_url:
+        await rc.redis_client.connect()
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            raise SystemExit("fakeredis n'est pas installé : pip install fakeredis, ou --redis-url redis://...")
+        rc.redis_client.client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+        async def connect():
+            pass
+        rc.redis_client.connect = connect
+    await rc.redis_client.client.flushdb()
+    return rc.redis_client
+
+
+# --- Micro-benchmarks ---
+async def measure(fn, number: int, repeat: int) -> dict:
+    """Durée par appel sur `repeat` séries de `number` appels (fn synchrone ou coroutine)"""
+    per_call = []
+    is_async = asyncio.iscoroutinefunction(fn)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            if is_async:
+                await fn()
+            else:
+                fn()
+        per_call.append((time.perf_counter() - start) / number)
+    mean = statistics.fmean(per_call)
+    return {
+        "mean_us": round(mean * 1e6, 2),
+        "p50_us": round(percentile(per_call, 50) * 1e6, 2),
+        "p95_us": round(percentile(per_call, 95) * 1e6, 2),
+        "ops_s": round(1 / mean, 1) if mean else 0.0,
+    }
+
+
+async def run_micro(dataset, scale: float) -> dict:
+    import main
+    from cache_utils import cache_manager
+    from kev_index import KevMembership
+    from nvd_api import convert_raw
+    from records import expand_wire, to_wire
+    from redis_client import redis_client
+
+    repeat = max(3, int(20 * scale))
+    rng = random.Random(2)
+    sample_raw = rng.sample(dataset.cves, min(200, len(dataset.cves)))
+    cves = [convert_raw(raw) for raw in sample_raw]
+    kev_map = {v["cveID"]: v for v in dataset.kev["vulnerabilities"]}
+
+    # Premier passage : remplit les caches EPSS / GitHub / Reddit, le benchmark mesure le cache chaud
+    enriched = [await main.cve_to_dict_full(cve, kev_map) for cve in cves]
+    results = {}
+
+    results["generate_vulnerability_profile"] = await measure(
+        lambda: [main.generate_vulnerability_profile(d) for d in enriched], number=5, repeat=repeat)
+    results["generate_vulnerability_profile"] = per_item(results["generate_vulnerability_profile"], len(enriched))
+
+    cursor = iter(range(10 ** 9))
+
+    async def enrich_one():
+        await main.cve_to_dict_full(cves[next(cursor) % len(cves)], kev_map)
+    results["cve_to_dict_full_warm"] = await measure(enrich_one, number=len(cves), repeat=repeat)
+
+    window = (enriched * (2000 // len(enriched) + 1))[:2000]
+    serialized = json.dumps(window, default=str)
+    encode_compact = lambda: json.dumps([to_wire(d) for d in window], default=str, separators=(",", ":"))
+    compact = encode_compact()
+    results["codec_json_dumps_2000"] = await measure(lambda: json.dumps(window, default=str), 1, repeat)
+    results["codec_json_loads_2000"] = await measure(lambda: json.loads(serialized), 1, repeat)
+    results["codec_compact_encode_2000"] = await measure(encode_compact, 1, repeat)
+    results["codec_compact_expand_2000"] = await measure(
+        lambda: [expand_wire(r) for r in json.loads(compact)], 1, repeat)
+
+    async def redis_roundtrip():
+        await cache_manager.set_cached_data("cve_advisory:bench:window", window, ttl=60)
+        await redis_client.get_json("cve_advisory:bench:window")
+    results["codec_redis_roundtrip_2000"] = await measure(redis_roundtrip, 1, repeat)
+
+    # Filtres KEV : recherche paginée (hors cache HTTP) et appartenance vectorisée
+    await main.fetch_kev_catalog()
+    search_kev = main.search_kev.__wrapped__
+    vendors = sorted({v["vendorProject"] for v in dataset.kev["vulnerabilities"]})
+
+    async def kev_search():
+        await search_kev(page=1, limit=50, start=None, end=None, cve_id=None,
+                         vendor=rng.choice(vendors), product=None)
+    results["kev_search_filter"] = await measure(kev_search, number=20, repeat=repeat)
+
+    membership = KevMembership()
+    membership.ensure(dataset.kev)
+    ids = [c["id"] for c in dataset.cves] * 10
+    results["kev_membership_check"] = per_item(await measure(lambda: membership.check(ids), 1, repeat), len(ids))
+    return results
+
+
+def per_item(stats: dict, count: int) -> dict:
+    """Rapporter une mesure groupée à l'élément"""
+    return {
+        "mean_us": round(stats["mean_us"] / count, 3),
+        "p50_us": round(stats["p50_us"] / count, 3),
+        "p95_us": round(stats["p95_us"] / count, 3),
+        "ops_s": round(stats["ops_s"] * count, 1),
+    }
+
+
+# --- Scénarios de charge ---
+async def drive(client, paths: list, concurrency: int) -> dict:
+    """Envoyer les requêtes avec `concurrency` clients simultanés ; latences et débit"""
+    latencies = []
+    errors = 0
+    queue = iter(paths)
+
+    async def worker():
+        nonlocal errors
+        for path in queue:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_load(dataset, fakes, redis, scale: float) -> dict:
+    import httpx
+    import main
+
+    n = lambda base: max(5, int(base * scale))
+    rng = random.Random(3)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        # À froid : cache vidé avant chaque requête (KEV, NVD, EPSS et exploits redemandés)
+        latencies, errors = [], 0
+        for _ in range(n(5)):
+            await redis.client.flushdb()
+            start = time.perf_counter()
+            response = await client.get("/cves/recent?days=7&limit=100")
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+        results["cves_recent_cold"] = summarize(latencies, errors, sum(latencies))
+
+        await client.get("/cves/recent?days=7&limit=100")
+        results["cves_recent_warm"] = await drive(client, ["/cves/recent?days=7&limit=100"] * n(400), 16)
+
+        vendors = sorted({v["vendorProject"] for v in dataset.kev["vulnerabilities"]})
+        kev_paths = [
+            f"/kev/search?vendor={rng.choice(vendors)}&page={rng.randint(1, 2)}&limit=50" if i % 2
+            else f"/kev/search?cve_id={rng.choice(dataset.cves)['id'][:9]}&limit=20"
+            for i in range(n(400))
+        ]
+        results["kev_search"] = await drive(client, kev_paths, 16)
+
+        filters = ["severity=HIGH", "severity=CRITICAL&has_kev=true", "has_exploit=true",
+                   "keyword=buffer%20overflow&keyword_source=local", "severity=MEDIUM&source=cve@mitre.org"]
+        search_paths = [f"/cves/search?{rng.choice(filters)}&limit=20&page={rng.randint(1, 3)}" for _ in range(n(100))]
+        results["cves_search_filters"] = await drive(client, search_paths, 8)
+
+    results["upstream_calls"] = dict(fakes.calls)
+    results["upstream_throttled"] = dict(fakes.throttled)
+    return results
+
+
+# --- Références ---
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Lignes de comparaison (section, nom, métrique, référence, actuel, écart %, régression)"""
+    rows = []
+    for section in ("micro", "load"):
+        for name, metrics in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not isinstance(metrics, dict) or not isinstance(base, dict):
+                continue
+            for metric, value in metrics.items():
+                ref = base.get(metric)
+                if metric in ("requests", "errors") or not isinstance(ref, (int, float)) or not ref:
+                    continue
+                delta = (value - ref) / ref * 100
+                worse = -delta if metric in HIGHER_IS_BETTER else delta
+                rows.append((section, name, metric, ref, value, delta, worse > threshold))
+    return rows
+
+
+def print_results(results: dict):
+    for section in ("micro", "load"):
+        if section not in results:
+            continue
+        print(f"\n== {section} ==")
+        for name, metrics in results[section].items():
+            print(f"  {name:34s} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+    if "upstream" in results:
+        print("\n== sources simulées (charge) ==")
+        for kind, counts in results["upstream"].items():
+            print(f"  {kind:10s} " + "  ".join(f"{k}={v}" for k, v in counts.items()))
+
+
+def print_comparison(rows: list, threshold: float) -> int:
+    print(f"\n== comparaison avec la référence (seuil {threshold:.0f} %) ==")
+    regressions = 0
+    for section, name, metric, ref, value, delta, regressed in rows:
+        flag = "  RÉGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"  {section:5s} {name:32s} {metric:15s} {ref:>12} -> {value:>12}  {delta:+7.1f} %{flag}")
+    print(f"  {regressions} régression(s)")
+    return regressions
+
+
+async def run(args) -> dict:
+    import fakes as fake_sources
+
+    configure_environment(args)
+    dataset = fake_sources.Dataset(n_cves=args.cves, seed=args.seed)
+    rate_limits = {name: fake_sources.parse_rate(v) for name, v in
+                   fake_sources.parse_service_map(args.rate, cast=str).items()}
+    fakes = fake_sources.FakeUpstreams(dataset, fake_sources.parse_service_map(args.latency), rate_limits)
+    fakes.install(nvdlib_delay_scale=args.nvdlib_delay_scale)
+
+    import main
+    import evidence_reddit
+    evidence_reddit.asyncpraw.Reddit = fakes.reddit_class()
+    redis = await connect_redis(args)
+    await main.startup_event()
+
+    results = {"meta": {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "redis": "redis" if args.redis_url else "fakeredis",
+        "cves": args.cves, "seed": args.seed, "scale": args.scale,
+        "latency": args.latency, "rate": args.rate,
+    }}
+    try:
+        if args.only in (None, "micro"):
+            results["micro"] = await run_micro(dataset, args.scale)
+        if args.only in (None, "load"):
+            fakes.reset_counters()
+            results["load"] = await run_load(dataset, fakes, redis, args.scale)
+            results["upstream"] = {"calls": results["load"].pop("upstream_calls"),
+                                   "throttled": results["load"].pop("upstream_throttled")}
+    finally:
+        await main.shutdown_event()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks et scénarios de charge avec sources simulées")
+    parser.add_argument("--only", choices=["micro", "load"], help="Ne lancer qu'une partie de la suite")
+    parser.add_argument("--quick", action="store_true", help="Tailles réduites (équivaut à --scale 0.25)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Facteur appliqué au nombre d'itérations")
+    parser.add_argument("--cves", type=int, default=3000, help="CVE synthétiques publiés sur 60 jours")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--redis-url", help="Redis réel (sinon fakeredis en mémoire)")
+    parser.add_argument("--latency", default="", help="Latence par source en secondes, ex. nvd=0.3,github=0.1")
+    parser.add_argument("--rate", default="", help="Limite par source, ex. nvd=50/30 (requêtes/secondes)")
+    parser.add_argument("--nvdlib-delay-scale", type=float, default=0.0,
+                        help="Fraction conservée de la pause imposée par nvdlib après chaque appel")
+    parser.add_argument("--json", help="Écrire les résultats dans ce fichier")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Enregistrer comme référence")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, help="Comparer à une référence")
+    parser.add_argument("--threshold", type=float, default=15.0, help="Écart (%%) signalé comme régression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Code de sortie 1 en cas de régression")
+    args = parser.parse_args()
+    if args.quick:
+        args.scale = min(args.scale, 0.25)
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    for path in filter(None, (args.json, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nRésultats enregistrés : {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = print_comparison(compare(results, baseline, args.threshold), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
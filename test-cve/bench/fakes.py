@@ -0,0 +1,314 @@
+"""
+Sources externes simulées pour les benchmarks : NVD, KEV, EPSS, GitHub, Reddit et Exploit-DB.
+
+Les fausses sources répondent au niveau transport (httpx et requests), si bien que le code de
+l'application et nvdlib s'exécutent sans modification. Chaque source a une latence et une limite
+de débit (seau à jetons) configurables ; au-delà de la limite elle répond 403 (NVD) ou 429.
+
+Les données sont synthétiques et déterministes (graine fixe) : mêmes CVE, même catalogue KEV,
+mêmes scores EPSS d'une exécution à l'autre.
+"""
+import asyncio
+import gzip
+import json
+import random
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import httpx
+import requests
+
+SERVICES = ("nvd", "kev", "epss", "github", "reddit", "exploit_db")
+HOSTS = {
+    "services.nvd.nist.gov": "nvd",
+    "www.cisa.gov": "kev",
+    "api.first.org": "epss",
+    "epss.cyentia.com": "epss",
+    "api.github.com": "github",
+    "www.exploit-db.com": "exploit_db",
+}
+SEVERITIES = [None, ("LOW", 3.1), ("MEDIUM", 5.4), ("HIGH", 7.5), ("CRITICAL", 9.8)]
+WORDS = ["buffer", "overflow", "injection", "sql", "cross-site", "scripting", "authentication", "bypass",
+         "remote", "code", "execution", "privilege", "escalation", "denial", "service", "path", "traversal"]
+
+
+class Dataset:
+    """CVE NVD 2.0 synthétiques publiés sur les `days` derniers jours, catalogue KEV et EPSS associés"""
+
+    def __init__(self, n_cves: int = 3000, days: int = 60, kev_ratio: float = 0.05, seed: int = 1):
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        self.cves = [self._raw_cve(i, now - timedelta(seconds=rng.randint(0, days * 86400)), rng)
+                     for i in range(n_cves)]
+        self.cves.sort(key=lambda c: c["published"])
+        self.by_id = {c["id"]: c for c in self.cves}
+        kev_ids = [c["id"] for c in self.cves if rng.random() < kev_ratio]
+        self.kev = {
+            "title": "CISA Catalog of Known Exploited Vulnerabilities",
+            "catalogVersion": "bench",
+            "dateReleased": now.isoformat(),
+            "count": len(kev_ids),
+            "vulnerabilities": [self._kev_entry(self.by_id[c], rng) for c in kev_ids],
+        }
+        self.kev_ids = set(kev_ids)
+        self.epss = {c["id"]: round(rng.random() ** 3, 5) for c in self.cves}
+        # Fraction des CVE avec PoC GitHub / entrée Exploit-DB
+        self.github = {c["id"] for c in self.cves if rng.random() < 0.1}
+        self.exploit_db = {c["id"] for c in self.cves if rng.random() < 0.05}
+
+    @staticmethod
+    def _raw_cve(i: int, published: datetime, rng: random.Random) -> dict:
+        cve_id = f"CVE-{published.year}-{10000 + i}"
+        stamp = published.strftime("%Y-%m-%dT%H:%M:%S.000")
+        vendor, product = f"vendor{i % 40}", f"product{i % 150}"
+        raw = {
+            "id": cve_id,
+            "sourceIdentifier": rng.choice(["cve@mitre.org", "secalert@redhat.com", "psirt@us.ibm.com"]),
+            "published": stamp,
+            "lastModified": stamp,
+            "vulnStatus": rng.choice(["Analyzed", "Awaiting Analysis", "Modified"]),
+            "descriptions": [{"lang": "en", "value": f"{' '.join(rng.sample(WORDS, 6))} in {vendor} {product}."}],
+            "references": [{"url": f"https://{vendor}.example/advisory/{i}",
+                            "tags": ["Exploit"] if rng.random() < 0.15 else ["Vendor Advisory"]}],
+            "metrics": {},
+            "weaknesses": [{"source": "nvd@nist.gov", "type": "Primary",
+                            "description": [{"lang": "en", "value": f"CWE-{rng.choice([79, 89, 20, 787, 22])}"}]}],
+            "configurations": [{"nodes": [{"operator": "OR", "negate": False, "cpeMatch": [{
+                "vulnerable": True,
+                "criteria": f"cpe:2.3:a:{vendor}:{product}:*:*:*:*:*:*:*:*",
+                "versionEndExcluding": f"{rng.randint(1, 9)}.{rng.randint(0, 20)}.0",
+                "matchCriteriaId": f"BENCH-{i}",
+            }]}]}],
+        }
+        severity = rng.choice(SEVERITIES)
+        if severity:
+            raw["metrics"]["cvssMetricV31"] = [{
+                "source": "nvd@nist.gov", "type": "Primary",
+                "cvssData": {
+                    "version": "3.1", "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H",
+                    "baseScore": severity[1], "baseSeverity": severity[0],
+                    "attackVector": "NETWORK", "attackComplexity": "LOW", "privilegesRequired": "NONE",
+                    "userInteraction": "NONE", "scope": "UNCHANGED", "confidentialityImpact": "HIGH",
+                    "integrityImpact": "HIGH", "availabilityImpact": "HIGH",
+                },
+                "exploitabilityScore": 3.9, "impactScore": 5.9,
+            }]
+        return raw
+
+    @staticmethod
+    def _kev_entry(raw: dict, rng: random.Random) -> dict:
+        vendor, product = raw["configurations"][0]["nodes"][0]["cpeMatch"][0]["criteria"].split(":")[3:5]
+        added = datetime.fromisoformat(raw["published"][:19]) + timedelta(days=rng.randint(0, 10))
+        return {
+            "cveID": raw["id"], "vendorProject": vendor, "product": product,
+            "vulnerabilityName": f"{vendor} {product} vulnerability",
+            "dateAdded": added.strftime("%Y-%m-%d"),
+            "shortDescription": raw["descriptions"][0]["value"],
+            "requiredAction": "Apply mitigations per vendor instructions.",
+            "dueDate": (added + timedelta(days=21)).strftime("%Y-%m-%d"),
+            "knownRansomwareCampaignUse": rng.choice(["Known", "Unknown"]),
+            "notes": "", "cwes": [],
+        }
+
+
+class TokenBucket:
+    """Limite de débit : `rate` requêtes par fenêtre de `per` secondes"""
+
+    def __init__(self, rate: float, per: float):
+        self.capacity = rate
+        self.tokens = rate
+        self.refill = rate / per
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.refill)
+            self.stamp = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def _parse_date(value: str) -> datetime:
+    dt = datetime.fromisoformat(unquote(value).replace("Z", "+00:00"))
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+class FakeUpstreams:
+    """Routeur des fausses sources ; latence (secondes) et limites par source"""
+
+    def __init__(self, dataset: Dataset, latency: dict = None, rate_limits: dict = None):
+        self.data = dataset
+        self.latency = {s: 0.0 for s in SERVICES}
+        self.latency.update(latency or {})
+        self.buckets = {s: TokenBucket(*limit) for s, limit in (rate_limits or {}).items()}
+        self.calls = {s: 0 for s in SERVICES}
+        self.throttled = {s: 0 for s in SERVICES}
+
+    def reset_counters(self):
+        self.calls = {s: 0 for s in SERVICES}
+        self.throttled = {s: 0 for s in SERVICES}
+
+    # --- Routage ---
+    def handle(self, method: str, url: str) -> tuple:
+        """-> (service, statut, en-têtes, corps en octets)"""
+        parts = urlsplit(url)
+        service = HOSTS.get(parts.hostname)
+        if service is None:
+            return None, 404, {}, b"unknown host"
+        self.calls[service] += 1
+        bucket = self.buckets.get(service)
+        if bucket is not None and not bucket.take():
+            self.throttled[service] += 1
+            return service, 403 if service == "nvd" else 429, {}, b"rate limited"
+
+        # Paramètres sans valeur (hasKev, noRejected...) conservés avec une valeur vide
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        if service == "nvd":
+            body = self.nvd(params)
+        elif service == "kev":
+            body = self.data.kev
+        elif service == "epss" and parts.hostname == "epss.cyentia.com":
+            return service, 200, {"content-type": "application/gzip"}, self.epss_bulk()
+        elif service == "epss":
+            ids = params.get("cve", "").split(",")
+            body = {"status": "OK", "data": [{"cve": c, "epss": str(self.data.epss[c]), "percentile": "0.5",
+                                              "date": "2024-01-01"} for c in ids if c in self.data.epss]}
+        elif service == "github":
+            cve_id = params.get("q", "").split(" ")[0]
+            items = []
+            if cve_id in self.data.github:
+                kind = "repositories" if parts.path.endswith("repositories") else "issues"
+                items = [{"html_url": f"https://github.com/poc/{cve_id}-{kind}", "full_name": f"poc/{cve_id}",
+                          "title": f"PoC for {cve_id}", "stargazers_count": 3, "created_at": "2024-01-01T00:00:00Z"}]
+            body = {"total_count": len(items), "items": items}
+        else:
+            cve = "CVE-" + params.get("cve", "")
+            text = f"<html>{params.get('cve')}</html>" if cve in self.data.exploit_db else "<html>no results</html>"
+            return service, 200, {"content-type": "text/html"}, text.encode()
+        return service, 200, {"content-type": "application/json"}, json.dumps(body).encode()
+
+    def epss_bulk(self) -> bytes:
+        """Fichier EPSS quotidien (CSV compressé) couvrant tout le jeu de données"""
+        lines = ["#model_version:v2024.01.01,score_date:2024-01-01T00:00:00+0000", "cve,epss,percentile"]
+        lines += [f"{c},{score},0.5" for c, score in self.data.epss.items()]
+        return gzip.compress("\n".join(lines).encode(), mtime=0)
+
+    def nvd(self, params: dict) -> dict:
+        items = self.data.cves
+        if "cveId" in params:
+            items = [self.data.by_id[params["cveId"]]] if params["cveId"] in self.data.by_id else []
+        for field, start_key, end_key in (("published", "pubStartDate", "pubEndDate"),
+                                          ("lastModified", "lastModStartDate", "lastModEndDate")):
+            if start_key in params:
+                start, end = _parse_date(params[start_key]).isoformat(), _parse_date(params[end_key]).isoformat()
+                items = [c for c in items if start <= c[field][:19] <= end]
+        if "cvssV3Severity" in params:
+            sev = params["cvssV3Severity"]
+            items = [c for c in items if c["metrics"].get("cvssMetricV31", [{}])[0]
+                     .get("cvssData", {}).get("baseSeverity") == sev]
+        if "hasKev" in params:
+            items = [c for c in items if c["id"] in self.data.kev_ids]
+        if "sourceIdentifier" in params:
+            items = [c for c in items if c["sourceIdentifier"] == params["sourceIdentifier"]]
+        if "keywordSearch" in params:
+            words = params["keywordSearch"].lower().split()
+            items = [c for c in items if all(w in c["descriptions"][0]["value"].lower() for w in words)]
+
+        start = int(params.get("startIndex", 0))
+        size = int(params.get("resultsPerPage", 2000))
+        page = items[start:start + size]
+        return {
+            "resultsPerPage": len(page), "startIndex": start, "totalResults": len(items),
+            "format": "NVD_CVE", "version": "2.0", "timestamp": datetime.now(timezone.utc).isoformat(),
+            "vulnerabilities": [{"cve": c} for c in page],
+        }
+
+    # --- Installation ---
+    def install(self, nvdlib_delay_scale: float = 0.0):
+        """
+        Intercepter httpx (transport asynchrone par défaut) et requests (adaptateur HTTP).
+        Les clients avec un transport explicite (ASGITransport du générateur de charge) ne sont pas concernés.
+        nvdlib_delay_scale : fraction conservée de la pause que nvdlib impose après chaque appel (6 s sans clé).
+        """
+        fake = self
+
+        async def handle_async_request(transport, request: httpx.Request) -> httpx.Response:
+            service, status, headers, body = fake.handle(request.method, str(request.url))
+            if service and fake.latency[service]:
+                await asyncio.sleep(fake.latency[service])
+            return httpx.Response(status, headers=headers, content=body, request=request)
+
+        def send(adapter, request, **kwargs) -> requests.Response:
+            service, status, headers, body = fake.handle(request.method, request.url)
+            if service and fake.latency[service]:
+                time.sleep(fake.latency[service])  # requests est synchrone : la boucle est bloquée comme en production
+            response = requests.Response()
+            response.status_code = status
+            response.headers.update(headers)
+            response._content = body
+            response.url = request.url
+            response.request = request
+            response.encoding = "utf-8"
+            return response
+
+        httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+        requests.adapters.HTTPAdapter.send = send
+
+        import nvdlib.get
+        nvdlib.get.time = types.SimpleNamespace(sleep=lambda s: time.sleep(s * nvdlib_delay_scale) if nvdlib_delay_scale else None)
+
+    def reddit_class(self):
+        """Remplaçant d'asyncpraw.Reddit : recherche dans r/netsec avec la latence configurée"""
+        fake = self
+
+        class Submission(types.SimpleNamespace):
+            pass
+
+        class Subreddit:
+            async def search(self, query, limit=5):
+                fake.calls["reddit"] += 1
+                bucket = fake.buckets.get("reddit")
+                if bucket is not None and not bucket.take():
+                    fake.throttled["reddit"] += 1
+                    raise RuntimeError("received 429 HTTP response")
+                if fake.latency["reddit"]:
+                    await asyncio.sleep(fake.latency["reddit"])
+                if query in fake.data.exploit_db:
+                    yield Submission(title=f"{query} exploited", url=f"https://example.org/{query}", score=42,
+                                     created_utc=1.7e9, num_comments=3, permalink=f"/r/netsec/{query}")
+
+        class Reddit:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            async def subreddit(self, name, fetch=False):
+                return Subreddit()
+
+            async def close(self):
+                pass
+
+        return Reddit
+
+
+def parse_service_map(spec: str, cast=float) -> dict:
+    """"nvd=0.2,github=0.05" -> {"nvd": 0.2, "github": 0.05}"""
+    result = {}
+    for part in filter(None, (spec or "").split(",")):
+        name, _, value = part.partition("=")
+        if name not in SERVICES:
+            raise ValueError(f"Source inconnue : {name} (attendu : {', '.join(SERVICES)})")
+        result[name] = cast(value)
+    return result
+
+
+def parse_rate(value: str) -> tuple:
+    """"50/30" -> (50, 30) : 50 requêtes par fenêtre de 30 secondes"""
+    rate, _, per = value.partition("/")
+    return float(rate), float(per or 1)
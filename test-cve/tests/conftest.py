@@ -0,0 +1,22 @@
+import asyncio
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# Les modules de l'application sont à plat dans app/ (comme dans l'image Docker)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Client Redis partagé de l'application branché sur un serveur fakeredis vierge"""
+    from redis_client import redis_client
+
+    server = fakeredis.FakeServer()
+    client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    client.server = server  # un autre worker : fakeredis.FakeRedis(server=client.server)
+    monkeypatch.setattr(redis_client, "client", client)
+    yield client
+    asyncio.run(client.aclose())
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from cache_budget import CacheBudgets, parse_budgets, parse_size
+from redis_client import decode_payload, redis_client
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    monkeypatch.setenv("CACHE_BUDGETS", "cve_detail=10kb,stats=1kb")
+    monkeypatch.setenv("CACHE_COMPRESS_MIN_BYTES", "2kb")
+    monkeypatch.setenv("CACHE_MAX_ENTRY_BYTES", "4kb")
+    monkeypatch.setenv("CACHE_MAX_BUDGET_SHARE", "0.5")
+    return CacheBudgets()
+
+
+def test_parse_sizes():
+    assert parse_size("64mb") == 64 * 1024 ** 2
+    assert parse_size(" 512 ") == 512
+    assert parse_budgets("cve_list=1kb, stats=2b") == {"cve_list": 1024, "stats": 2}
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_admission_compresses_and_refuses_one_off_giants(budgets):
+    small = '{"a": 1}'
+    assert budgets.prepare("cve_advisory:cve_detail:CVE-1", small) == small
+
+    compressible = '"' + "x" * 10000 + '"'
+    payload = budgets.prepare("cve_advisory:cve_detail:CVE-2", compressible)
+    assert payload != compressible and decode_payload(payload) == "x" * 10000
+
+    # Plus de la moitié du budget "stats" (512 octets) même compressé : refusé sauf clé déjà demandée
+    giant = '"' + "".join(f"{i:x}" for i in range(2000)) + '"'
+    assert budgets.prepare("cve_advisory:stats_week:days:7", giant) is None
+    budgets.is_repeated = lambda key: True
+    assert budgets.prepare("cve_advisory:stats_week:days:7", giant) is not None
+
+    assert budgets.counters["cve_detail"]["compressed"] == 1
+    assert budgets.counters["stats"]["refused"] == 1
+
+
+def test_every_write_path_is_tracked(fake_redis, budgets):
+    async def scenario():
+        await redis_client.set_json("cve_advisory:cve_detail:CVE-1", {"id": 1}, ttl=60, admission=budgets)
+        await redis_client.set_json("cve_advisory:cve_detail:CVE-2", {"id": 2}, ttl=60,
+                                    meta_key="cve_advisory:cve_detail:CVE-2:meta", admission=budgets)
+        await redis_client.set_json_many({"cve_advisory:cve_detail:CVE-3": {"id": 3}}, ttl=60, admission=budgets)
+        big = {"text": "y" * 5000}
+        await redis_client.set_json("cve_advisory:cve_detail:CVE-4", big, ttl=60, admission=budgets)
+        return (await fake_redis.hgetall(budgets.sizes_key("cve_detail")),
+                await redis_client.get_json("cve_advisory:cve_detail:CVE-4"),
+                await fake_redis.get("cve_advisory:cve_detail:CVE-4"))
+
+    sizes, big, raw = asyncio.run(scenario())
+    assert set(sizes) == {f"cve_advisory:cve_detail:CVE-{i}" for i in range(1, 5)}
+    # Sans validateurs, la valeur stockée est bien celle admise (compressée)
+    assert raw.startswith("z:") and big == {"text": "y" * 5000}
+    assert int(sizes["cve_advisory:cve_detail:CVE-4"]) == len(raw)
+
+
+def test_sweep_forgets_vanished_keys_before_evicting(fake_redis, budgets, monkeypatch):
+    monkeypatch.setattr("cache_budget.SWEEP_BATCH", 3)
+    family = "cve_detail"
+
+    async def scenario():
+        for i in range(5):
+            # 5 x ~1,5 ko sur un budget de 10 ko ; échéances croissantes
+            await redis_client.set_json(f"cve_advisory:cve_detail:CVE-{i}", "v" * 1500, ttl=100 + i, admission=budgets)
+        over = await budgets.sweep(family)
+
+        for i in range(5, 7):
+            await redis_client.set_json(f"cve_advisory:cve_detail:CVE-{i}", "v" * 1500, ttl=200 + i, admission=budgets)
+        # Évincées par Redis (allkeys-lru) : leur suivi ne doit pas provoquer d'éviction
+        await fake_redis.delete("cve_advisory:cve_detail:CVE-1", "cve_advisory:cve_detail:CVE-6")
+        after_lru = await budgets.sweep(family)
+        return over, after_lru, sorted(await fake_redis.keys("cve_advisory:cve_detail:*"))
+
+    over, after_lru, keys = asyncio.run(scenario())
+    assert over["evicted"] == 0 and over["keys"] == 5
+
+    # 7 entrées suivies (> 10 ko), 5 encore présentes (< 10 ko)
+    assert after_lru["evicted"] == 0 and after_lru["keys"] == 5 and after_lru["usedBytes"] <= 10 * 1024
+    assert len(keys) == 5
+
+
+def test_sweep_evicts_down_to_low_watermark(fake_redis, budgets, monkeypatch):
+    monkeypatch.setattr("cache_budget.SWEEP_BATCH", 2)
+
+    async def scenario():
+        for i in range(10):
+            await redis_client.set_json(f"cve_advisory:cve_detail:CVE-{i}", "v" * 1500, ttl=100 + i, admission=budgets)
+        usage = await budgets.sweep("cve_detail")
+        return usage, sorted(await fake_redis.keys("cve_advisory:cve_detail:*"))
+
+    usage, keys = asyncio.run(scenario())
+    assert usage["usedBytes"] <= 10 * 1024 * budgets.low_watermark
+    assert usage["keys"] == len(keys) == 10 - usage["evicted"]
+    # Les premières échéances partent en premier
+    assert keys == [f"cve_advisory:cve_detail:CVE-{i}" for i in range(usage["evicted"], 10)]
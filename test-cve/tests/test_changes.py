@@ -0,0 +1,73 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import fakeredis
+
+from changes import CHANGES_LAST_CHECK_KEY, CHANGES_STATE_KEY, CHANGES_STREAM_KEY, MAX_RANGE_DAYS, ChangeFeed
+from redis_client import redis_client
+
+
+def test_observe_logs_each_change_once(fake_redis):
+    feed = ChangeFeed()
+
+    async def scenario():
+        first = await feed.observe([{"id": "CVE-2024-0001", "lastModified": "2024-01-01"}], "nvd")
+        again = await feed.observe([{"id": "CVE-2024-0001", "lastModified": "2024-01-01"}], "nvd")
+        changed = await feed.observe([{"id": "CVE-2024-0001", "lastModified": "2024-02-01"}], "nvd")
+        return first, again, changed, await redis_client.xrange_json(CHANGES_STREAM_KEY)
+
+    first, again, changed, rows = asyncio.run(scenario())
+    assert (first, again, changed) == (1, 0, 1)
+    assert [entry["changed"] for _, entry in rows] == [["new"], ["lastModified"]]
+
+
+def test_observe_retries_when_another_worker_wins(fake_redis, monkeypatch):
+    feed = ChangeFeed()
+    other_worker = fakeredis.FakeRedis(server=fake_redis.server, decode_responses=True)
+    diff = feed._diff
+    seen_states = []
+
+    def racing_diff(by_id, states, source, first_seen):
+        seen_states.append(states)
+        if len(seen_states) == 1:
+            # Un autre worker journalise la même modification entre la lecture et l'écriture
+            other_worker.hset(CHANGES_STATE_KEY, "CVE-2024-0001", json.dumps({"lastModified": "2024-02-01"}))
+            other_worker.xadd(CHANGES_STREAM_KEY, {"data": json.dumps({"cveId": "CVE-2024-0001"})})
+        return diff(by_id, states, source, first_seen)
+
+    async def scenario():
+        await feed.observe([{"id": "CVE-2024-0001", "lastModified": "2024-01-01"}], "nvd")
+        monkeypatch.setattr(feed, "_diff", racing_diff)
+        logged = await feed.observe([{"id": "CVE-2024-0001", "lastModified": "2024-02-01"}], "nvd")
+        return logged, await redis_client.xrange_json(CHANGES_STREAM_KEY)
+
+    logged, rows = asyncio.run(scenario())
+    assert logged == 0 and len(rows) == 2
+    assert [s[0]["lastModified"] for s in seen_states] == ["2024-01-01", "2024-02-01"]
+
+
+def test_run_cycle_splits_long_gaps(fake_redis):
+    feed = ChangeFeed()
+    ranges = []
+
+    async def fetch_page(params, start_index, size):
+        start, end = params["lastModStartDate"], params["lastModEndDate"]
+        ranges.append((start, end))
+        assert end - start <= timedelta(days=MAX_RANGE_DAYS)
+        return {"cves": [SimpleNamespace(id=f"CVE-2024-{len(ranges):04d}", lastModified=end.isoformat())], "total": 1}
+
+    feed.fetch_page = fetch_page
+    since = datetime.now(timezone.utc) - timedelta(days=300)
+
+    async def scenario():
+        await redis_client.set_json(CHANGES_LAST_CHECK_KEY, since.isoformat())
+        observed = await feed.run_cycle()
+        return observed, await redis_client.get_json(CHANGES_LAST_CHECK_KEY)
+
+    observed, last_check = asyncio.run(scenario())
+    assert observed == 3 and len(ranges) == 3
+    assert ranges[0][0] == since
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert last_check == ranges[-1][1].isoformat()
@@ -0,0 +1,62 @@
+import pytest
+
+from cpe_match import CpeIndex, compare_versions, parse_cpe, version_in_range
+
+
+def entry(cve_id: str, criteria: str, **ranges) -> dict:
+    return {"cveId": cve_id, "criteria": criteria, "cpe": parse_cpe(criteria), **ranges}
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("2.14.1", "2.15", -1),
+    ("2.15.0", "2.15", 0),
+    ("1.0", "1.0.0", 0),
+    ("1.0.1", "1.0", 1),
+    ("10.0", "9.9", 1),
+    ("1.0rc1", "1.0", -1),
+    ("2.0-beta", "2.0", -1),
+    ("1.0a", "1.0", -1),
+    ("1.0.0rc1", "1.0", -1),
+    ("1.0rc1", "1.0.0", -1),
+    ("1.0rc1", "1.0rc2", -1),
+    ("2.0-beta9", "2.0.0-beta9", 0),
+    ("2.0-alpha", "2.0-beta", -1),
+])
+def test_compare_versions(a, b, expected):
+    assert compare_versions(a, b) == expected
+    assert compare_versions(b, a) == -expected
+
+
+def test_pre_release_is_below_excluded_end():
+    criteria = entry("CVE-1", "cpe:2.3:a:acme:widget:*:*:*:*:*:*:*:*", versionEndExcluding="2.0")
+    assert version_in_range("2.0-beta9", criteria)
+    assert version_in_range("1.9.9", criteria)
+    assert not version_in_range("2.0", criteria)
+    assert not version_in_range("2.0.0", criteria)
+
+
+def test_version_in_range_bounds():
+    criteria = entry("CVE-1", "cpe:2.3:a:apache:log4j:*:*:*:*:*:*:*:*",
+                     versionStartIncluding="2.0", versionEndIncluding="2.14.1")
+    assert version_in_range("2.0", criteria)
+    assert version_in_range("2.14.1", criteria)
+    assert not version_in_range("2.0-beta9", criteria)
+    assert not version_in_range("2.15.0", criteria)
+
+    exact = entry("CVE-2", "cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*")
+    assert version_in_range("2.14.1.0", exact)
+    assert not version_in_range("2.14", exact)
+
+
+def test_index_matches_product_and_range():
+    index = CpeIndex()
+    index.add("CVE-1", [entry("CVE-1", "cpe:2.3:a:apache:log4j:*:*:*:*:*:*:*:*", versionEndExcluding="2.15.0")])
+    index.add("CVE-2", [entry("CVE-2", "cpe:2.3:a:apache:httpd:*:*:*:*:*:*:*:*")])
+
+    assert [e["cveId"] for e in index.match("cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*")] == ["CVE-1"]
+    assert index.match("cpe:2.3:a:apache:log4j:2.15.0:*:*:*:*:*:*:*") == []
+    # Version installée inconnue : tout critère du produit est candidat
+    assert len(index.match("cpe:2.3:a:apache:log4j:*:*:*:*:*:*:*:*")) == 1
+
+    index.remove("CVE-1")
+    assert index.match("cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*") == []
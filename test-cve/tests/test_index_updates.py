@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import cpe_match
+import text_index
+from cpe_match import CpeIndex, store_cpe_entries, sync_cpe_index
+from leader import leader
+from text_index import TextIndex, ingest_cves, load_index, store_documents, sync_index
+
+
+def cve(cve_id: str, description: str, criteria: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=cve_id, descriptions=[SimpleNamespace(lang="en", value=description)], cwe=[],
+        published="2024-01-01T00:00:00", sourceIdentifier="nvd@nist.gov", score=None,
+        cpe=[SimpleNamespace(vulnerable=True, criteria=criteria)],
+    )
+
+
+@pytest.fixture
+def fresh_indexes(fake_redis, monkeypatch):
+    monkeypatch.setattr(text_index, "text_index", TextIndex())
+    monkeypatch.setattr(cpe_match, "cpe_index", CpeIndex())
+    monkeypatch.setattr(leader, "worker_id", "worker-a")
+
+    def as_worker(worker_id):
+        monkeypatch.setattr(leader, "worker_id", worker_id)
+
+    return as_worker
+
+
+def test_offline_writes_reach_a_running_worker(fresh_indexes):
+    async def scenario():
+        await load_index()
+        await cpe_match.load_cpe_index()
+        # Ingestion hors ligne pendant que le worker tourne
+        fresh_indexes("ingest")
+        offline = [cve("CVE-2024-0001", "heap overflow in libfoo", "cpe:2.3:a:foo:libfoo:*:*:*:*:*:*:*:*")]
+        await store_documents(offline)
+        await store_cpe_entries(offline)
+        fresh_indexes("worker-a")
+        return await sync_index(), await sync_cpe_index(), await sync_index()
+
+    texts, cpes, again = asyncio.run(scenario())
+    assert (texts, cpes, again) == (1, 1, 0)
+    assert [d for d, _ in text_index.text_index.search("libfoo")] == ["CVE-2024-0001"]
+    assert [e["cveId"] for e in cpe_match.cpe_index.match("cpe:2.3:a:foo:libfoo:1.0:*:*:*:*:*:*:*")] == ["CVE-2024-0001"]
+
+
+def test_worker_skips_its_own_writes_and_applies_others(fresh_indexes):
+    async def scenario():
+        await load_index()
+        await ingest_cves([cve("CVE-2024-0002", "sql injection in bar", "cpe:2.3:a:bar:bar:*:*:*:*:*:*:*:*")])
+        own = await sync_index()
+        fresh_indexes("worker-b")
+        await store_documents([cve("CVE-2024-0003", "xss in baz", "cpe:2.3:a:baz:baz:*:*:*:*:*:*:*:*")])
+        fresh_indexes("worker-a")
+        return own, await sync_index()
+
+    own, others = asyncio.run(scenario())
+    assert (own, others) == (0, 1)
+    assert {d for d, _ in text_index.text_index.search("in")} == {"CVE-2024-0002", "CVE-2024-0003"}
+
+
+def test_sync_waits_for_the_initial_load(fresh_indexes):
+    async def scenario():
+        await store_documents([cve("CVE-2024-0004", "early write", "cpe:2.3:a:q:q:*:*:*:*:*:*:*:*")])
+        before = await sync_index()
+        loaded = await load_index()
+        return before, loaded, await sync_index()
+
+    assert asyncio.run(scenario()) == (0, 1, 0)
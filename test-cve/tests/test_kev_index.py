@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+
+from kev_index import CVE_NUMBER_SPAN, KevMembership, SnapshotRows, encode_cve_id
+
+CATALOG = {
+    "catalogVersion": "2024.06.01",
+    "dateReleased": "2024-06-01T00:00:00Z",
+    "vulnerabilities": [
+        {"cveID": "CVE-2021-44228", "vulnerabilityName": "Log4Shell"},
+        {"cveID": "CVE-2014-0160", "vulnerabilityName": "Heartbleed"},
+        {"cveID": "CVE-2023-1234567", "vulnerabilityName": "Long sequence"},
+        {"cveID": "CVE-2021-44228", "vulnerabilityName": "Log4Shell (duplicate)"},
+    ],
+}
+
+
+def test_encode_cve_id():
+    assert encode_cve_id("CVE-2021-44228") == 2021 * CVE_NUMBER_SPAN + 44228
+    assert encode_cve_id(" cve-2021-44228 ") == encode_cve_id("CVE-2021-44228")
+    assert encode_cve_id("CVE-2021-0001") < encode_cve_id("CVE-2021-0010") < encode_cve_id("CVE-2022-0001")
+    for invalid in ("", None, "GHSA-xxxx", "CVE-2021", "CVE-20X1-1234", "CVE-2021_1234"):
+        assert encode_cve_id(invalid) == -1
+
+
+def test_check_returns_catalog_rows():
+    kev = KevMembership()
+    kev.ensure(CATALOG)
+    rows = kev.check(["CVE-2014-0160", "CVE-2014-0161", "cve-2023-1234567", "not-a-cve", "CVE-2021-44228"])
+    assert rows[0] == 1 and rows[2] == 2 and rows[4] in (0, 3)
+    assert rows[1] == -1 and rows[3] == -1
+
+
+def test_lookup_returns_all_entries_of_an_id():
+    kev = KevMembership()
+    kev.ensure(CATALOG)
+    assert [v["vulnerabilityName"] for v in kev.lookup("CVE-2021-44228")] == ["Log4Shell", "Log4Shell (duplicate)"]
+    assert kev.lookup("CVE-2021-44229") == []
+    assert kev.lookup("garbage") == []
+
+
+def test_empty_catalog():
+    kev = KevMembership()
+    assert list(kev.check(["CVE-2021-44228"])) == [-1]
+    assert kev.lookup("CVE-2021-44228") == []
+
+
+def test_ensure_rebuilds_only_on_new_version():
+    kev = KevMembership()
+    kev.ensure(CATALOG)
+    codes = kev.codes
+    kev.ensure(dict(CATALOG))
+    assert kev.codes is codes
+    kev.ensure({**CATALOG, "catalogVersion": "2024.06.02", "vulnerabilities": CATALOG["vulnerabilities"][:1]})
+    assert len(kev) == 1 and kev.check(["CVE-2014-0160"])[0] == -1
+
+
+def test_snapshot_rows_decode_on_demand():
+    entries = [json.dumps(v).encode() for v in CATALOG["vulnerabilities"]]
+    offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in entries], out=offsets[1:])
+    rows = SnapshotRows(b"".join(entries), offsets)
+    assert len(rows) == 4
+    assert rows[np.int64(1)] == CATALOG["vulnerabilities"][1]
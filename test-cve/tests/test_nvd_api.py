@@ -0,0 +1,77 @@
+from nvdlib.classes import CVE
+
+from nvd_api import build_query, convert_raw
+
+
+def raw_cve() -> dict:
+    return {
+        "id": "CVE-2021-44228",
+        "sourceIdentifier": "security@apache.org",
+        "published": "2021-12-10T10:15:09.143",
+        "lastModified": "2024-04-03T17:01:00.000",
+        "vulnStatus": "Analyzed",
+        "descriptions": [{"lang": "en", "value": "Apache Log4j2 JNDI features do not protect against attacker controlled LDAP."}],
+        "metrics": {
+            "cvssMetricV31": [{
+                "source": "nvd@nist.gov",
+                "type": "Primary",
+                "cvssData": {
+                    "version": "3.1",
+                    "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:C/C:H/I:H/A:H",
+                    "attackVector": "NETWORK", "attackComplexity": "LOW", "privilegesRequired": "NONE",
+                    "userInteraction": "NONE", "scope": "CHANGED", "confidentialityImpact": "HIGH",
+                    "integrityImpact": "HIGH", "availabilityImpact": "HIGH",
+                    "baseScore": 10.0, "baseSeverity": "CRITICAL",
+                },
+                "exploitabilityScore": 3.9,
+                "impactScore": 6.0,
+            }],
+        },
+        "weaknesses": [{"source": "nvd@nist.gov", "type": "Primary", "description": [{"lang": "en", "value": "CWE-502"}]}],
+        "configurations": [{"nodes": [{"operator": "OR", "negate": False, "cpeMatch": [{
+            "vulnerable": True,
+            "criteria": "cpe:2.3:a:apache:log4j:*:*:*:*:*:*:*:*",
+            "versionStartIncluding": "2.0.1", "versionEndExcluding": "2.3.1",
+        }]}]}],
+        "references": [{"url": "https://logging.apache.org/log4j/2.x/security.html", "tags": ["Vendor Advisory"]}],
+    }
+
+
+def test_convert_raw_exposes_searchcve_attributes():
+    cve = convert_raw(raw_cve())
+
+    assert isinstance(cve, CVE)
+    assert cve.id == "CVE-2021-44228"
+    assert cve.url == "https://nvd.nist.gov/vuln/detail/CVE-2021-44228"
+    assert cve.score == ["V31", 10.0, "CRITICAL"]
+    assert (cve.v31vector, cve.v31exploitability, cve.v31impactScore) == (
+        "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:C/C:H/I:H/A:H", 3.9, 6.0)
+    assert cve.v31attackVector == "NETWORK"
+    assert [w.value for w in cve.cwe] == ["CWE-502"]
+    assert [m.criteria for m in cve.cpe] == ["cpe:2.3:a:apache:log4j:*:*:*:*:*:*:*:*"]
+    assert cve.references[0].url == "https://logging.apache.org/log4j/2.x/security.html"
+    assert cve.references[0].tags == ["Vendor Advisory"]
+    assert not hasattr(cve, "v30vector")
+
+
+def test_convert_raw_without_metrics_has_no_score():
+    raw = raw_cve()
+    raw["metrics"] = {}
+    cve = convert_raw(raw)
+
+    assert cve.score == [None, None, None]
+    assert not hasattr(cve, "v31vector")
+
+
+def test_convert_raw_does_not_share_the_raw_json():
+    raw = raw_cve()
+    convert_raw(raw).references[0].tags.append("Exploit")
+
+    assert raw["references"][0]["tags"] == ["Vendor Advisory"]
+
+
+def test_build_query_formats_flags_and_dates():
+    query = build_query({"keywordSearch": "log4j", "hasKev": True, "noRejected": False, "key": "secret",
+                         "pubStartDate": "2024-10-01 00:00"})
+
+    assert query == "keywordSearch=log4j&hasKev&pubStartDate=2024-10-01T00%3A00%3A00"
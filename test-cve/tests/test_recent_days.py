@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from recent_days import RecentPartitions
+
+
+class FakeNvd:
+    """CVE publiés toutes les `every_hours` heures sur les 60 derniers jours ; relève les plages demandées"""
+
+    def __init__(self, every_hours: int):
+        now = datetime.now(timezone.utc)
+        self.raws = []
+        for i in range(60 * 24 // every_hours, 0, -1):
+            published = now - timedelta(hours=i * every_hours, minutes=1)
+            self.raws.append({"id": f"CVE-{len(self.raws):05d}", "published": published.strftime("%Y-%m-%dT%H:%M:%S.000")})
+        self.ranges = []
+
+    async def fetch_page(self, params, start_index, size, raw_ttl=None):
+        start, end = params["pubStartDate"].strftime("%Y-%m-%dT%H:%M:%S"), params["pubEndDate"].strftime("%Y-%m-%dT%H:%M:%S")
+        if start_index == 0:
+            self.ranges.append((params["pubStartDate"].date(), params["pubEndDate"]))
+        matched = [r for r in self.raws if start <= r["published"][:19] < end]
+        return {"raw": matched[start_index:start_index + size], "total": len(matched)}
+
+    def expected(self, days: int, limit: int) -> list:
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S")
+        return [r["id"] for r in self.raws if r["published"][:19] >= since][-limit:]
+
+
+@pytest.fixture
+def partitions(fake_redis):
+    def make(every_hours: int):
+        recent = RecentPartitions()
+        recent.nvd = FakeNvd(every_hours)
+        recent.fetch_page = recent.nvd.fetch_page
+        return recent
+    return make
+
+
+def ids(window) -> list:
+    return [cve_id for cve_id, _ in window[2]]
+
+
+def test_cold_window_fetches_only_the_newest_days(partitions):
+    recent = partitions(every_hours=2)  # 12 CVE par jour
+    window = asyncio.run(recent.window(30, 5))
+    assert ids(window) == recent.nvd.expected(30, 5)
+    assert len(recent.nvd.ranges) == 1 and recent.fetched_days == 1
+
+
+def test_sparse_window_grows_ranges_until_the_page_is_full(partitions):
+    recent = partitions(every_hours=24 * 5)  # un CVE tous les 5 jours
+    window = asyncio.run(recent.window(60, 4))
+    assert ids(window) == recent.nvd.expected(60, 4)
+    # Plages de 1, 2, 4, 8... jours : bien moins de requêtes que de jours parcourus
+    assert len(recent.nvd.ranges) <= 5 and recent.fetched_days < 60
+
+
+def test_window_reuses_partitions_and_is_in_publication_order(partitions):
+    recent = partitions(every_hours=7)
+
+    async def scenario():
+        first = await recent.window(10, 1000)
+        fetched = len(recent.nvd.ranges)
+        second = await recent.window(10, 1000)
+        smaller = await recent.window(10, 20)
+        return first, second, smaller, fetched
+
+    first, second, smaller, fetched = asyncio.run(scenario())
+    assert ids(first) == recent.nvd.expected(10, 1000)
+    published = [p for _, p in first[2]]
+    assert published == sorted(published)
+    # Fenêtre chaude : toutes les partitions viennent du cache
+    assert ids(second) == ids(first) and len(recent.nvd.ranges) == fetched
+    assert ids(smaller) == ids(first)[-20:]
+
+
+def test_force_refresh_refetches_only_unfinished_days(partitions):
+    recent = partitions(every_hours=7)
+
+    async def scenario():
+        await recent.window(10, 1000)
+        fetched = len(recent.nvd.ranges)
+        refreshed = await recent.window(10, 1000, force_refresh=True)
+        return refreshed, recent.nvd.ranges[fetched:]
+
+    refreshed, ranges = asyncio.run(scenario())
+    assert ids(refreshed) == recent.nvd.expected(10, 1000)
+    assert 1 <= len(ranges) <= 2 and ranges[0][0] == datetime.now(timezone.utc).date()
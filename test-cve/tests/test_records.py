@@ -0,0 +1,37 @@
+from records import FULL_FIELDS, CVERecord, expand_wire, to_wire
+
+
+def full_doc(**fields):
+    doc = dict.fromkeys(FULL_FIELDS)
+    doc.update({"id": "CVE-2024-0001", "published": "2024-10-01T12:00:00.000", "isExploited": False, "cwe": []})
+    doc.update(fields)
+    return doc
+
+
+def test_record_keeps_only_present_fields_and_restores_full_shape():
+    doc = full_doc(v31vector="CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H")
+    record = CVERecord.from_dict(doc)
+
+    assert record.to_wire() == to_wire(doc)
+    assert "v30vector" not in record.to_wire()
+    assert record.to_dict() == doc
+    assert list(record.to_dict()) == list(doc)
+    # False et [] ne sont pas des champs absents
+    assert record.get("isExploited") is False and record.get("cwe") == []
+    assert record.get("v2vector") is None
+
+
+def test_record_keeps_fields_outside_full_fields():
+    doc = full_doc(newField={"a": 1})
+    record = CVERecord.from_dict(doc)
+
+    assert record.get("newField") == {"a": 1}
+    assert record.to_dict() == doc
+    assert expand_wire(record.to_wire()) == doc
+
+
+def test_records_with_same_fields_share_presence_tuple():
+    a = CVERecord.from_dict(full_doc())
+    b = CVERecord.from_dict(full_doc(id="CVE-2024-0002"))
+
+    assert a._present is b._present
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import rollups
+from evidence import evidence_registry
+from redis_client import redis_client
+from rollups import ROLLUP_LAST_CHECK_KEY, RollupStore
+
+
+def cve(cve_id: str, tag: str = None):
+    refs = [SimpleNamespace(url=f"https://example.com/{cve_id}", tags=[tag])] if tag else []
+    return SimpleNamespace(id=cve_id, score=["V31", 7.5, "HIGH"], references=refs,
+                           published="2024-10-01T12:00:00.000", lastModified="2024-10-02T08:00:00.000")
+
+
+def test_rollup_confidence_matches_per_cve_scoring(fake_redis, monkeypatch):
+    import main
+
+    cves = [
+        cve("CVE-2024-0001", tag="Patch"),  # référence NVD seule : pas un exploit public
+        cve("CVE-2024-0002", tag="Exploit"),
+        cve("CVE-2024-0003"),  # preuve Exploit-DB
+        cve("CVE-2024-0004"),  # KEV
+        cve("CVE-2024-0005"),
+    ]
+    epss = {c.id: {"epss_score": 0.9, "epss_percentile": 0.99} for c in cves}
+    epss["CVE-2024-0005"] = {"epss_score": 0.2, "epss_percentile": 0.5}
+    kev_ids = {"CVE-2024-0004"}
+
+    async def fetch_all_cves(params):
+        return cves
+
+    async def fetch_epss_scores(ids):
+        return {i: epss[i] for i in ids}
+
+    async def exploit_db(cve_obj):
+        return [{"source": "exploit-db", "url": "https://exploit-db.com/1"}] if cve_obj.id == "CVE-2024-0003" else []
+
+    monkeypatch.setattr(rollups, "fetch_all_cves", fetch_all_cves)
+    monkeypatch.setattr(rollups, "fetch_epss_scores", fetch_epss_scores)
+    monkeypatch.setattr(evidence_registry.sources["exploit_db"], "func", exploit_db)
+
+    async def scenario():
+        store = RollupStore()
+        await store.build_day("2024-10-01", kev_ids)
+        expected = {}
+        for c in cves:
+            info = await main.detect_public_exploit(c, {k: {} for k in kev_ids})
+            level = main.compute_confidence_level({
+                "isExploited": c.id in kev_ids, "epss_score": epss[c.id]["epss_score"], **info,
+            })
+            expected[level] = expected.get(level, 0) + 1
+        return rollups.vector_to_summary(store.days["2024-10-01"]["vector"])["byConfidence"], expected
+
+    by_confidence, expected = asyncio.run(scenario())
+    assert {k: v for k, v in by_confidence.items() if v} == expected
+    assert expected == {"High": 2, "Medium": 2, "Low": 1}
+
+
+def test_modified_days_checkpoint_survives_restart(fake_redis, monkeypatch):
+    since = datetime(2024, 10, 1, tzinfo=timezone.utc)
+    ranges = []
+
+    async def fetch_all_cves(params):
+        ranges.append((params["lastModStartDate"], params["lastModEndDate"]))
+        return [SimpleNamespace(id="CVE-2024-0001", published="2024-10-01T00:00:00.000",
+                                lastModified="2024-10-05T00:00:00.000")]
+
+    monkeypatch.setattr(rollups, "fetch_all_cves", fetch_all_cves)
+
+    async def scenario():
+        await redis_client.set_json(ROLLUP_LAST_CHECK_KEY, since.isoformat())
+        store = RollupStore()  # nouveau processus : rien en mémoire
+        store.days["2024-10-01"] = {"vector": None, "lastModified": "2024-10-02T00:00:00.000"}
+        now = since + timedelta(days=200)
+        dirty = await store._modified_days(now)
+        await store._save_modified_check(now)
+        return dirty, now, await redis_client.get_json(ROLLUP_LAST_CHECK_KEY)
+
+    dirty, now, saved = asyncio.run(scenario())
+    assert dirty == {"2024-10-01"}
+    assert ranges[0][0] == since and ranges[-1][1] == now
+    assert all(end - start <= timedelta(days=rollups.MAX_RANGE_DAYS) for start, end in ranges)
+    assert saved == now.isoformat()
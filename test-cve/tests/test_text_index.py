@@ -0,0 +1,166 @@
+import asyncio
+from datetime import date
+
+import httpx
+import pytest
+
+import main
+from text_index import TextIndex
+
+WORDS = ["privilege", "escalation", "overflow", "injection"]
+
+
+def build_index(n: int) -> TextIndex:
+    index = TextIndex()
+    for i in range(n):
+        words = " ".join(WORDS[j] for j in range(len(WORDS)) if (i >> j) & 1 or j == 1)
+        index.add(f"CVE-2024-{i:04d}", {"id": f"CVE-2024-{i:04d}", "description": f"{words} {'escalation ' * (i % 3)}"},
+                  {"published": f"2024-01-{1 + i % 28:02d}", "sourceIdentifier": "nvd@nist.gov"})
+    return index
+
+
+@pytest.fixture
+def local_search(monkeypatch):
+    index = build_index(60)
+    loaded = []
+
+    async def load_documents(cve_ids):
+        loaded.append(list(cve_ids))
+        return {c: {"id": c, "exploit_public": int(c[-4:]) % 4 == 0} for c in cve_ids}
+
+    monkeypatch.setattr(main, "text_index", index)
+    monkeypatch.setattr(main, "load_documents", load_documents)
+
+    def page(offset, limit, has_exploit=None):
+        plan = {"local": [], "pushed": ["has_exploit"] if has_exploit is not None else []}
+        return asyncio.run(main.search_local_index_page(
+            "escalation", None, None, None, plan, None, None, has_exploit, offset, limit, {}))
+
+    page.index = index
+    page.loaded = loaded
+    return page
+
+
+def test_search_ranks_phrase_and_prefix():
+    index = build_index(8)
+    ranked = [doc_id for doc_id, _ in index.search("escal*")]
+    assert len(ranked) == 8
+    assert ranked == [doc_id for doc_id, _ in index.search("escalation")]
+    assert {doc_id for doc_id, _ in index.search('"privilege escalation"')} == {f"CVE-2024-{i:04d}" for i in (1, 3, 5, 7)}
+
+
+def test_add_merges_fields_from_other_sources():
+    index = build_index(2)
+    index.add("CVE-2024-0000", {"id": "CVE-2024-0000", "kev": "known exploited"})
+    assert [d for d, _ in index.search("exploited")] == ["CVE-2024-0000"]
+    assert "CVE-2024-0000" in {d for d, _ in index.search("escalation")}
+
+
+def test_pages_cover_ranking_without_duplicates(local_search):
+    ranked = [doc_id for doc_id, _ in local_search.index.search("escalation")]
+    seen, offset = [], 0
+    while True:
+        cves, total, has_more, estimate = local_search(offset, 7)
+        assert total == len(ranked) and not estimate
+        seen.extend(c["id"] for c in cves)
+        offset += 7
+        if not has_more:
+            break
+    assert seen == ranked
+    # Seuls les identifiants de la page sont chargés depuis le magasin
+    assert all(len(ids) <= 7 for ids in local_search.loaded)
+
+
+def test_exploit_filter_pages_and_estimated_total(local_search):
+    expected = [d for d, _ in local_search.index.search("escalation") if int(d[-4:]) % 4 == 0]
+    cves, total, has_more, estimate = local_search(0, 3, has_exploit=True)
+    assert [c["id"] for c in cves] == expected[:3]
+    assert has_more and estimate and total < len(expected)
+
+    seen, offset = [], 0
+    while True:
+        cves, total, has_more, estimate = local_search(offset, 4, has_exploit=True)
+        seen.extend(c["id"] for c in cves)
+        offset += 4
+        if not has_more:
+            break
+    assert seen == expected
+    assert total == len(expected) and not estimate
+
+
+def kev_only_index() -> TextIndex:
+    """Index juste après le démarrage : catalogue KEV indexé, aucune ingestion hors ligne"""
+    index = TextIndex()
+    index.add("CVE-2021-44228", {"id": "CVE-2021-44228", "kev": "Apache Log4j2 Remote Code Execution"})
+    index.add("CVE-2014-0160", {"id": "CVE-2014-0160", "kev": "OpenSSL Heartbleed Information Disclosure"})
+    index.loaded = True
+    return index
+
+
+def test_covers_requires_offline_ingestion_of_the_whole_range():
+    today = date.today().isoformat()
+    index = kev_only_index()
+    assert not index.covers(None, None, today)
+
+    index.coverage = {"from": "1988-10-01", "to": today, "years": list(range(1988, date.today().year + 1))}
+    assert index.covers(None, None, today)
+    assert index.covers("2020-01-01", "2020-12-31", today)
+
+    index.coverage["years"].remove(2015)
+    assert not index.covers(None, None, today)
+    assert index.covers("2016-01-01", None, today)
+
+    # Ingestion ancienne : les publications récentes manquent
+    index.coverage = {"from": "2016-01-01", "to": "2020-06-30", "years": list(range(2016, 2021))}
+    assert index.covers("2017-01-01", "2020-06-01", today)
+    assert not index.covers("2017-01-01", None, today)
+    assert not index.covers("2015-01-01", "2016-06-01", today)
+
+
+@pytest.fixture
+def search_client(fake_redis, monkeypatch):
+    nvd_queries = []
+
+    async def fetch_kev_catalog(force_refresh=False):
+        return {"vulnerabilities": []}
+
+    async def fetch_nvd_page(search_params, start_index, results_per_page, raw_ttl=3600):
+        nvd_queries.append(search_params)
+        return {"cves": [], "raw": [], "total": 0}
+
+    async def load_documents(cve_ids):
+        return {c: {"id": c, "exploit_public": False} for c in cve_ids}
+
+    monkeypatch.setattr(main, "fetch_kev_catalog", fetch_kev_catalog)
+    monkeypatch.setattr(main, "fetch_nvd_page", fetch_nvd_page)
+    monkeypatch.setattr(main, "load_documents", load_documents)
+
+    def search(index, **params):
+        monkeypatch.setattr(main, "text_index", index)
+
+        async def call():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return (await client.get("/cves/search", params=params)).json()
+
+        return asyncio.run(call())
+
+    search.nvd_queries = nvd_queries
+    return search
+
+
+def test_kev_only_index_keyword_search_goes_to_nvd(search_client):
+    search_client(kev_only_index(), keyword="log4j")
+    assert [q.get("keywordSearch") for q in search_client.nvd_queries] == ["log4j"]
+
+
+def test_covered_index_falls_back_to_nvd_without_local_match(search_client):
+    index = kev_only_index()
+    today = date.today()
+    index.coverage = {"from": "1988-10-01", "to": today.isoformat(), "years": list(range(1988, today.year + 1))}
+
+    response = search_client(index, keyword="heartbleed")
+    assert response["queryPlan"]["keywordIndex"] == "local" and search_client.nvd_queries == []
+
+    search_client(index, keyword="nothing-indexed-matches-this")
+    assert [q.get("keywordSearch") for q in search_client.nvd_queries] == ["nothing-indexed-matches-this"]